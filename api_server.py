@@ -5,6 +5,45 @@ Endpoints:
 - GET  /health            -> health check
 - GET  /api/demo          -> run analysis on sample offers
 - POST /api/analyze       -> run analysis on posted offers and preferences
+- POST /api/analyze/batch -> run many analyses, streamed back as JSON lines
+- POST /api/rescore       -> re-rank a previous analysis under new preferences
+- GET  /metrics           -> Prometheus text-format metrics
+
+Analysis responses are serialized with orjson when installed and compressed
+(gzip/brotli) per Accept-Encoding. Pass ?dedupe=true to replace the offers
+repeated inside comparison_results with {"$ref": "#/offers/<i>"} pointers.
+/api/demo and /api/analyze accept ?fields=a.b,c and/or ?profile=summary|dashboard|full
+to return only part of the response; unrequested AI text and charts are not generated.
+Responses are written directly rather than through a response_model, so the
+AnalyzeResponse schema in the OpenAPI docs describes the full body only; with
+?dedupe or a field selection the body is that shape reduced as described.
+Analysis responses include llm_usage: calls, tokens, latency and estimated cost per node and model.
+POST /api/analyze takes optional deadline_seconds and token_budget (defaults:
+OFFERCOMPARE_ANALYSIS_DEADLINE / OFFERCOMPARE_ANALYSIS_TOKEN_BUDGET); when
+they run low the analysis skips optional LLM calls and falls back to local
+data, listing what it skipped in final_report["budget"].
+
+Analysis endpoints go through admission control: at most
+OFFERCOMPARE_MAX_CONCURRENT_ANALYSES run at once, further requests wait in a
+bounded queue and are shed with 503 + Retry-After when it is full; a client
+(X-Client-Id header, else remote address) with too many requests in flight
+gets 429. Admitted responses carry X-Queue-Wait-Ms.
+
+With OFFERCOMPARE_ENABLE_PROFILING=1, /api/demo and /api/analyze profile the
+analysis when asked to (X-Profile: 1 header or ?profiling=true): CPU profile
+and allocation report land in OFFERCOMPARE_PROFILE_DIR, named after the
+X-Request-Id header (generated if absent) plus a timestamp and random
+suffix; the id is echoed back along with X-Profile-Report. One profiled
+request runs at a time; others get 409. The profilers are process-wide, so
+the report also covers whatever else the server ran meanwhile: it is
+labeled as such (X-Profile-Scope: process) and lists how many other
+admitted requests were running when it started.
+
+Provider SDKs are imported and their clients built at startup
+(OFFERCOMPARE_PREWARM_PROVIDERS=0 to defer that to the first request).
+
+Logs are JSON lines on stderr at WARNING by default (OFFERCOMPARE_LOG_LEVEL,
+OFFERCOMPARE_LOG_FORMAT=text to change).
 
 Run:
   uvicorn api_server:app --reload --port 8000
@@ -12,23 +51,30 @@ Run:
 
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-
-from flow import get_sample_offers
-from nodes import (
-    MarketResearchNode,
-    COLAdjustmentNode,
-    MarketBenchmarkingNode,
-    PreferenceScoringNode,
-    AIAnalysisNode,
-    VisualizationPreparationNode,
-    ReportGenerationNode,
-)
-from pocketflow import Flow, AsyncFlow
-from utils.call_llm import get_provider_info
+from typing import List, Dict, Any, Literal, Optional
+
+from flow import get_sample_offers, prepare_analysis_input, run_analysis, run_batch_analysis, rescore_offers
+from utils.admission import AdmissionController, AdmissionRejected, AdmissionTicket
+from utils.analysis_store import AnalysisStore
+from utils.call_llm import get_provider_info, prewarm_providers
+from utils.config import get_config
+from utils import metrics
+from utils.log import configure_logging, get_logger
+from utils.profiling import ProfilerBusy, profile_run
+from utils.provider_health import provider_health
+from utils.response_fields import needs_ai_text, resolve_fields, select_fields, selected_charts
+from utils.serialization import dedupe_offer_refs, dumps, encode_json_body
 
 
 class Offer(BaseModel):
@@ -47,6 +93,16 @@ class Offer(BaseModel):
 class AnalyzeRequest(BaseModel):
     offers: List[Offer] = Field(default_factory=list)
     user_preferences: Dict[str, Any] = Field(default_factory=dict)
+    # "deterministic" skips all LLM work (research, AI market analysis, AI recommendations)
+    analysis_mode: Literal["full", "deterministic"] = "full"
+    # Per-request limits; past them the analysis degrades instead of overrunning
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    token_budget: Optional[int] = Field(default=None, gt=0)
+
+
+class BatchAnalyzeRequest(BaseModel):
+    requests: List[AnalyzeRequest] = Field(default_factory=list)
+    max_concurrency: int = Field(default=4, ge=1, le=32)
 
 
 class AnalyzeResponse(BaseModel):
@@ -55,9 +111,50 @@ class AnalyzeResponse(BaseModel):
     comparison_results: Dict[str, Any]
     visualization_data: Dict[str, Any]
     offers: List[Dict[str, Any]]
+    analysis_id: Optional[str] = None
+    llm_usage: Dict[str, Any] = Field(default_factory=dict)
 
 
-app = FastAPI(title="OfferCompare Pro API", version="1.0.0")
+class RescoreRequest(BaseModel):
+    # Either a previous analysis id or that analysis' enriched offers
+    analysis_id: Optional[str] = None
+    offers: Optional[List[Dict[str, Any]]] = None
+    user_preferences: Dict[str, Any] = Field(default_factory=dict)
+
+
+class RescoreResponse(BaseModel):
+    analysis_id: Optional[str] = None
+    comparison_results: Dict[str, Any]
+    scoring_weights: Dict[str, float]
+    visualization_data: Dict[str, Any]
+    offers: List[Dict[str, Any]]
+
+
+_config = get_config()
+logger = get_logger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # JSON logs via a background queue listener; progress lines are INFO, hidden by default.
+    # Set up here rather than at import so importing the app (tests, benchmarks) leaves logging alone
+    configure_logging("server")
+    if _config.prewarm_providers:
+        # SDK imports take hundreds of ms; pay them before the first request, off the event loop
+        warmed = await asyncio.to_thread(prewarm_providers)
+        logger.info("Provider clients prewarmed: %s", warmed, extra={"event": "llm_prewarm", "providers": warmed})
+    yield
+
+
+app = FastAPI(title="OfferCompare Pro API", version="1.0.0", lifespan=lifespan)
+
+analysis_store = AnalysisStore(_config.analysis_store_size, _config.analysis_store_ttl_seconds)
+admission = AdmissionController(
+    max_concurrent=_config.max_concurrent_analyses,
+    max_queue=_config.max_queued_analyses,
+    queue_timeout_seconds=_config.queue_timeout_seconds,
+    max_per_client=_config.max_requests_per_client,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -68,91 +165,251 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep series cardinality bounded
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route_path, status=str(status))
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route_path)
+
+
+@app.get("/metrics")
+def prometheus_metrics() -> Response:
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/health")
 def health() -> Dict[str, Any]:
     provider_info = get_provider_info()
-    return {"status": "ok", "providers": provider_info}
+    return {"status": "ok", "providers": provider_info, "provider_health": provider_health.snapshot(),
+            "admission": admission.stats()}
+
+
+async def _admit(request: Request, slots: int = 1) -> AdmissionTicket:
+    client_id = request.headers.get("x-client-id") or (request.client.host if request.client else "anonymous")
+    try:
+        return await admission.acquire(client_id, slots)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
+def _prepare_shared(req: AnalyzeRequest) -> Dict[str, Any]:
+    return prepare_analysis_input(req.model_dump())
+
+
+def _charge_queue_wait(shared: Dict[str, Any], ticket: AdmissionTicket) -> None:
+    """A client deadline counts from arrival, so time spent queued comes off it."""
+    if shared.get("deadline_seconds"):
+        shared["deadline_seconds"] = max(0.001, shared["deadline_seconds"] - ticket.wait_seconds)
 
 
-def _build_flow() -> AsyncFlow:
-    market_research = MarketResearchNode()
-    col_adjustment = COLAdjustmentNode()
-    market_benchmarking = MarketBenchmarkingNode()
-    preference_scoring = PreferenceScoringNode()
-    ai_analysis = AIAnalysisNode()
-    visualization_prep = VisualizationPreparationNode()
-    report_generation = ReportGenerationNode()
+def _response_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "executive_summary": result.get("executive_summary", ""),
+        "final_report": result.get("final_report", {}),
+        "comparison_results": result.get("comparison_results", {}),
+        "visualization_data": result.get("visualization_data", {}),
+        "offers": result.get("offers", []),
+        "llm_usage": result.get("llm_usage", {}),
+    }
+
+
+def _store_analysis(result: Dict[str, Any]) -> str:
+    return analysis_store.put({
+        "offers": result.get("offers", []),
+        "user_preferences": result.get("user_preferences", {}),
+    })
+
+
+def _resolve_selection(fields: Optional[str], profile: Optional[str]) -> Optional[List[str]]:
+    try:
+        return resolve_fields(fields, profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    market_research >> col_adjustment
-    col_adjustment >> market_benchmarking
-    market_benchmarking >> preference_scoring
-    preference_scoring >> ai_analysis
-    ai_analysis >> visualization_prep
-    visualization_prep >> report_generation
 
-    return AsyncFlow(start=market_research)
+def _apply_selection_hints(shared: Dict[str, Any], paths: Optional[List[str]]) -> None:
+    """Let the flow skip work whose output the client did not ask for."""
+    if paths is None:
+        return
+    shared["skip_ai_text"] = not needs_ai_text(paths)
+    shared["visualization_charts"] = selected_charts(paths)
 
 
-async def _run_analysis(shared: Dict[str, Any]) -> Dict[str, Any]:
-    flow = _build_flow()
-    await flow.run_async(shared)
-    return shared
+def _profile_request_id(request: Request, profiling: bool) -> Optional[str]:
+    """Request id to profile the analysis under, when the client asked and profiling is enabled."""
+    requested = profiling or request.headers.get("x-profile", "").strip().lower() in {"1", "true", "yes"}
+    if not (requested and _config.profiling_enabled):
+        return None
+    return request.headers.get("x-request-id") or uuid.uuid4().hex
 
 
-@app.get("/api/demo", response_model=AnalyzeResponse)
-async def run_demo() -> AnalyzeResponse:
+async def _run_profiled(shared: Dict[str, Any], request_id: Optional[str]) -> tuple:
+    """Run the analysis, under the profiler when request_id is set; returns (result, extra headers)."""
+    if request_id is None:
+        return await run_analysis(shared), {}
+    try:
+        # The profiled request is already admitted; "active" would count a batch's slots, not requests
+        labels = {"request_id": request_id,
+                  "other_requests_at_start": max(0, admission.stats()["admitted"] - 1)}
+        with profile_run(request_id, _config.profile_dir, labels=labels) as report:
+            result = await run_analysis(shared)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    return result, {"X-Request-Id": request_id, "X-Profile-Report": os.path.basename(report.report_path),
+                    "X-Profile-Scope": "process"}
+
+
+def _json_response(request: Request, payload: Dict[str, Any], dedupe: bool = False,
+                   paths: Optional[List[str]] = None, ticket: Optional[AdmissionTicket] = None,
+                   extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serialize a payload directly, skipping the response_model re-validation and jsonable_encoder pass."""
+    payload = select_fields(payload, paths)
+    if dedupe:
+        payload = dedupe_offer_refs(payload)
+    body, headers = encode_json_body(payload, request.headers.get("accept-encoding"), _config.compress_min_bytes)
+    if ticket is not None:
+        headers["X-Queue-Wait-Ms"] = str(ticket.wait_ms)
+    headers.update(extra_headers or {})
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Documented, not enforced: with dedupe or a field selection the body is a reduced AnalyzeResponse
+ANALYZE_RESPONSES: Dict[int, Dict[str, Any]] = {
+    200: {
+        "model": AnalyzeResponse,
+        "description": "The full analysis. With ?dedupe=true repeated offers are {\"$ref\": \"#/offers/<i>\"} "
+                       "pointers; with ?fields or ?profile only the selected fields are present.",
+    },
+}
+
+
+@app.get("/api/demo", responses=ANALYZE_RESPONSES)
+async def run_demo(request: Request, dedupe: bool = Query(False), fields: Optional[str] = Query(None),
+                   profile: Optional[str] = Query(None), profiling: bool = Query(False)) -> Response:
+    paths = _resolve_selection(fields, profile)
+    request_id = _profile_request_id(request, profiling)
     shared = get_sample_offers()
+    _apply_selection_hints(shared, paths)
 
     # Ensure totals are present
     for offer in shared["offers"]:
         offer.setdefault("total_compensation", offer.get("base_salary", 0) + offer.get("equity", 0) + offer.get("bonus", 0))
 
+    ticket = await _admit(request)
     try:
-        result = await _run_analysis(shared)
+        result, profile_headers = await _run_profiled(shared, request_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ticket.release()
 
-    return AnalyzeResponse(
-        executive_summary=result.get("executive_summary", ""),
-        final_report=result.get("final_report", {}),
-        comparison_results=result.get("comparison_results", {}),
-        visualization_data=result.get("visualization_data", {}),
-        offers=result.get("offers", []),
-    )
+    return _json_response(request, {**_response_payload(result), "analysis_id": _store_analysis(result)},
+                          dedupe, paths, ticket, profile_headers)
 
 
-@app.post("/api/analyze", response_model=AnalyzeResponse)
-async def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
+@app.post("/api/analyze", responses=ANALYZE_RESPONSES)
+async def analyze(req: AnalyzeRequest, request: Request, dedupe: bool = Query(False),
+                  fields: Optional[str] = Query(None), profile: Optional[str] = Query(None),
+                  profiling: bool = Query(False)) -> Response:
     if not req.offers:
         raise HTTPException(status_code=400, detail="Offers list cannot be empty")
 
-    # Prepare shared store
-    offers = []
-    for i, o in enumerate(req.offers, start=1):
-        data = o.model_dump()
-        data["id"] = data.get("id") or f"offer_{i}"
-        if data.get("total_compensation") is None:
-            data["total_compensation"] = data.get("base_salary", 0) + data.get("equity", 0) + data.get("bonus", 0)
-        offers.append(data)
-
-    shared = {
-        "offers": offers,
-        "user_preferences": req.user_preferences or {},
-    }
+    paths = _resolve_selection(fields, profile)
+    request_id = _profile_request_id(request, profiling)
+    shared = _prepare_shared(req)
+    _apply_selection_hints(shared, paths)
 
+    ticket = await _admit(request)
+    _charge_queue_wait(shared, ticket)
     try:
-        result = await _run_analysis(shared)
+        result, profile_headers = await _run_profiled(shared, request_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-    return AnalyzeResponse(
-        executive_summary=result.get("executive_summary", ""),
-        final_report=result.get("final_report", {}),
-        comparison_results=result.get("comparison_results", {}),
-        visualization_data=result.get("visualization_data", {}),
-        offers=result.get("offers", []),
-    )
-
+    finally:
+        ticket.release()
+
+    return _json_response(request, {**_response_payload(result), "analysis_id": _store_analysis(result)},
+                          dedupe, paths, ticket, profile_headers)
+
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(req: BatchAnalyzeRequest, request: Request, dedupe: bool = Query(False)) -> StreamingResponse:
+    """
+    Stream one JSON line per analysis, in completion order, tagged with its request index.
+
+    A batch holds one admission slot per flow it runs at once
+    (max_concurrency, capped at the batch size and the server-wide limit)
+    for as long as it streams.
+    """
+    if not req.requests:
+        raise HTTPException(status_code=400, detail="Batch cannot be empty")
+
+    batch = []
+    invalid = []
+    for index, item in enumerate(req.requests):
+        if item.offers:
+            batch.append((index, _prepare_shared(item)))
+        else:
+            invalid.append(index)
+
+    ticket = await _admit(request, min(req.max_concurrency, max(1, len(batch))))
+    for _, shared in batch:
+        _charge_queue_wait(shared, ticket)
+
+    async def lines():
+        try:
+            async for line in _batch_lines():
+                yield line
+        finally:
+            ticket.release()
+
+    async def _batch_lines():
+        for index in invalid:
+            yield dumps({"index": index, "status": "error", "error": "Offers list cannot be empty"}) + b"\n"
+        positions = [index for index, _ in batch]
+        async for i, result, error in run_batch_analysis([shared for _, shared in batch], ticket.slots):
+            if error is not None:
+                line = {"index": positions[i], "status": "error", "error": str(error)}
+            else:
+                payload = _response_payload(result)
+                line = {"index": positions[i], "status": "ok",
+                        "result": dedupe_offer_refs(payload) if dedupe else payload}
+            yield dumps(line) + b"\n"
+
+    # The background task covers clients that disconnect before the stream starts
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"X-Queue-Wait-Ms": str(ticket.wait_ms)},
+                             background=BackgroundTask(ticket.release))
+
+
+@app.post("/api/rescore", response_model=RescoreResponse)
+async def rescore(req: RescoreRequest, request: Request, dedupe: bool = Query(False)) -> Response:
+    """What-if scoring: rerun weighting, ranking and charts only, reusing prior research."""
+    if req.analysis_id:
+        stored = analysis_store.get(req.analysis_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired analysis_id")
+        offers = stored["offers"]
+    elif req.offers:
+        offers = req.offers
+    else:
+        raise HTTPException(status_code=400, detail="Provide analysis_id or offers")
+
+    result = rescore_offers(offers, req.user_preferences)
+    return _json_response(request, {"analysis_id": req.analysis_id, **result}, dedupe)
 
 
 if __name__ == "__main__":
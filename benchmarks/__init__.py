@@ -0,0 +1,11 @@
+"""
+OfferCompare Pro - Benchmark Suite
+
+Run with:
+  python -m benchmarks.pipeline --help   # end-to-end analyses with a fake LLM
+  python -m benchmarks.micro --help      # scoring/formatting utilities
+  python -m benchmarks.startup --help    # cold import time of the entry points
+
+Results are written as JSON and can be compared against a previous run
+(--compare baseline.json) to catch regressions between commits.
+"""
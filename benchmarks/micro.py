@@ -0,0 +1,194 @@
+"""
+Micro-benchmarks - per-call budgets for the pure-Python utilities
+
+Times the deterministic helpers every analysis goes through on synthetic
+inputs of 1, 10, 1k and 100k offers, and records for each case: throughput
+(offers processed per second), time per run and traced allocations (peak
+and total allocated blocks, from a separate tracemalloc pass).
+
+Usage:
+  python -m benchmarks.micro --sizes 1,10,1000,100000 --output micro.json \
+      [--compare baseline.json --threshold 0.15] [--only compare_offers]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from benchmarks.results import compare_results, environment_info, format_comparison, load_results, save_results
+from utils.col_calculator import calculate_col_adjustment
+from utils.market_data import calculate_market_percentile, get_compensation_insights
+from utils.offer_generator import iter_offers
+from utils.scoring import calculate_offer_score, compare_offers
+from utils.viz_formatter import create_visualization_package
+
+DEFAULT_SIZES = (1, 10, 1000, 100000)
+
+DIRECTIONS = {
+    "ops_per_s": "higher",
+    "peak_alloc_kb": "lower",
+}
+
+STAGES = ["startup", "growth", "public", "mature"]
+
+
+def synthetic_offers(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generated offers (utils.offer_generator) enriched the way the pipeline leaves them before scoring."""
+    rng = random.Random(seed)
+    offers = []
+    for offer in iter_offers(count, seed):
+        metrics = {
+            key: {"score": rng.randint(4, 10)}
+            for key in ("wlb_score", "growth_score", "culture_score", "benefits_score", "stability_score")
+        }
+        offer.update({
+            "market_analysis": {"market_percentile": rng.randint(20, 95)},
+            "total_comp_analysis": {"market_percentile": rng.randint(20, 95)},
+            "company_research": {"stage": rng.choice(STAGES), "metrics": metrics},
+        })
+        offers.append(offer)
+    return offers
+
+
+def _per_offer(fn: Callable[[Dict[str, Any]], Any]) -> Callable[[List[Dict[str, Any]]], None]:
+    def run(offers: List[Dict[str, Any]]) -> None:
+        for offer in offers:
+            fn(offer)
+    return run
+
+
+def _visualization_input(offers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return compare_offers(offers)["ranked_offers"]
+
+
+# name -> (setup(offers) -> input, run(input)); only run() is timed
+CASES: Dict[str, tuple] = {
+    "calculate_col_adjustment": (None, _per_offer(
+        lambda o: calculate_col_adjustment(o["base_salary"], o["location"]))),
+    "calculate_market_percentile": (None, _per_offer(
+        lambda o: calculate_market_percentile(o["base_salary"], o["position"], o["location"]))),
+    "get_compensation_insights": (None, _per_offer(
+        lambda o: get_compensation_insights(o["position"], o["base_salary"], o["equity"], o["bonus"],
+                                            o["location"], o["years_experience"]))),
+    "calculate_offer_score": (None, _per_offer(calculate_offer_score)),
+    "compare_offers": (None, compare_offers),
+    "create_visualization_package": (_visualization_input, create_visualization_package),
+}
+
+
+def _time_case(run: Callable, data: Any, min_time: float, max_repeats: int) -> List[float]:
+    """Repeat run(data) until min_time has elapsed (at least 3 runs unless one run exceeds it)."""
+    durations: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(durations) < max_repeats:
+        started = time.perf_counter()
+        run(data)
+        durations.append(time.perf_counter() - started)
+        if time.perf_counter() >= deadline and (len(durations) >= 3 or durations[0] >= min_time):
+            break
+    return durations
+
+
+def _allocations(run: Callable, data: Any) -> Dict[str, float]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        run(data)
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return {"peak_alloc_kb": round(peak / 1024, 1), "alloc_blocks": blocks}
+
+
+def run_micro_benchmarks(sizes: Iterable[int] = DEFAULT_SIZES, only: Optional[Iterable[str]] = None,
+                         min_time: float = 0.2, max_repeats: int = 1000, seed: int = 0,
+                         measure_memory: bool = True) -> Dict[str, Any]:
+    """
+    Run every case at every size and return a result document (see benchmarks.results).
+
+    Returns:
+        dict: {"suite", "meta", "results": {"<case>[<size>]": {...}}}
+    """
+    names = [name for name in CASES if only is None or name in set(only)]
+    results = {}
+    for size in sizes:
+        offers = synthetic_offers(size, seed)
+        for name in names:
+            setup, run = CASES[name]
+            data = setup(offers) if setup else offers
+            run(data)  # warm-up
+            durations = _time_case(run, data, min_time, max_repeats)
+            median = sorted(durations)[len(durations) // 2]
+            case = {
+                "offers": size,
+                "runs": len(durations),
+                "ms_per_run": round(median * 1000, 4),
+                "us_per_offer": round(median * 1e6 / size, 3),
+                "ops_per_s": round(size / median, 1) if median else 0.0,
+            }
+            if measure_memory:
+                case.update(_allocations(run, data))
+            results[f"{name}[{size}]"] = case
+
+    return {
+        "suite": "micro",
+        "meta": {**environment_info(), "sizes": list(sizes), "seed": seed},
+        "results": results,
+    }
+
+
+def _format_table(data: Dict[str, Any]) -> str:
+    lines = [f"{'case':<40}{'ms/run':>12}{'us/offer':>12}{'offers/s':>14}{'peak KB':>12}{'blocks':>10}"]
+    for case, r in data["results"].items():
+        lines.append(f"{case:<40}{r['ms_per_run']:>12}{r['us_per_offer']:>12}{r['ops_per_s']:>14}"
+                     f"{r.get('peak_alloc_kb', '-'):>12}{r.get('alloc_blocks', '-'):>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark OfferCompare's scoring and formatting utilities")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated offer counts")
+    parser.add_argument("--only", help="Comma-separated case names (default: all)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds spent timing each case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc allocation pass")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Regression threshold as a fraction")
+    args = parser.parse_args(argv)
+
+    only = [name.strip() for name in args.only.split(",")] if args.only else None
+    unknown = set(only or ()) - set(CASES)
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(sorted(unknown))}; choose from {', '.join(CASES)}")
+
+    data = run_micro_benchmarks(
+        sizes=[int(s) for s in args.sizes.split(",") if s.strip()],
+        only=only,
+        min_time=args.min_time,
+        seed=args.seed,
+        measure_memory=not args.no_memory,
+    )
+    print(_format_table(data))
+    if args.output:
+        save_results(args.output, data)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        report = compare_results(load_results(args.compare), data, DIRECTIONS, args.threshold)
+        print("\n" + format_comparison(report))
+        if any(row["regression"] for row in report):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Pipeline benchmark - end-to-end analyses driven by the fake LLM provider
+
+Runs the analysis flow (the same path as POST /api/analyze) against the
+deterministic fake provider at several concurrency levels and records, per
+level: latency percentiles, throughput, LLM calls, errors and peak traced
+memory.
+
+Usage:
+  python -m benchmarks.pipeline --analyses 20 --concurrency 1,4,8 --latency-ms 20 \
+      --output bench.json [--compare baseline.json --threshold 0.15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List
+
+from benchmarks.results import (compare_results, environment_info, format_comparison, load_results,
+                                percentiles, save_results)
+from flow import run_analysis
+from utils import fake_llm
+from utils.call_llm import AI_PROVIDERS
+from utils.offer_generator import generate_offer_set
+
+# Which way is better for each compared metric
+DIRECTIONS = {
+    "latency_ms.p50": "lower",
+    "latency_ms.p90": "lower",
+    "throughput_per_s": "higher",
+    "llm_calls_per_analysis": "lower",
+    "peak_memory_mb": "lower",
+    "errors": "lower",
+}
+
+
+@contextmanager
+def fake_llm_environment(**settings: Any) -> Iterator[fake_llm.FakeLLMSettings]:
+    """Route every LLM call to the fake provider (no real keys, no cache, no tracing) for the block."""
+    saved = dict(os.environ)
+    for provider, config in AI_PROVIDERS.items():
+        if provider != "fake":
+            os.environ.pop(config["env_key"], None)
+    os.environ.update({"OFFERCOMPARE_FAKE_LLM": "1", "DEFAULT_AI_PROVIDER": "fake", "OFFERCOMPARE_ENABLE_CACHE": "0"})
+    os.environ.pop("OFFERCOMPARE_TRACE_DIR", None)
+    try:
+        yield fake_llm.configure_fake_llm(**settings)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+async def _run_level(analyses: int, concurrency: int, analysis_mode: str, offers_per_analysis: int = 3,
+                     seed: int = 0) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        shared = generate_offer_set(offers_per_analysis, seed * 1_000_003 + index)
+        shared["analysis_mode"] = analysis_mode
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await run_analysis(shared)
+            except Exception:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    calls_before = fake_llm.call_count()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(analyses)))
+    elapsed = time.perf_counter() - started
+    calls = fake_llm.call_count() - calls_before
+
+    return {
+        "analyses": analyses,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_seconds": round(elapsed, 3),
+        "throughput_per_s": round((analyses - errors) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "llm_calls": calls,
+        "llm_calls_per_analysis": round(calls / analyses, 2) if analyses else 0.0,
+    }
+
+
+def _peak_memory_mb(concurrency: int, analysis_mode: str, offers_per_analysis: int, seed: int) -> float:
+    """Peak traced allocations while one wave of `concurrency` analyses runs (separate pass, so timing is unaffected)."""
+    tracemalloc.start()
+    try:
+        asyncio.run(_run_level(concurrency, concurrency, analysis_mode, offers_per_analysis, seed))
+        return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 3)
+    finally:
+        tracemalloc.stop()
+
+
+def run_pipeline_benchmark(analyses: int = 20, concurrency_levels: Iterable[int] = (1, 4, 8),
+                           latency_ms: float = 20.0, jitter_ms: float = 5.0, failure_rate: float = 0.0,
+                           seed: int = 0, analysis_mode: str = "full", measure_memory: bool = True,
+                           offers_per_analysis: int = 3) -> Dict[str, Any]:
+    """
+    Run the pipeline benchmark and return a result document (see benchmarks.results).
+
+    Analysis inputs come from utils.offer_generator, seeded per analysis, so
+    every run (and every concurrency level) sees the same offer sets.
+
+    Returns:
+        dict: {"suite", "meta", "results": {"concurrency_<n>": {...}}}
+    """
+    settings = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "failure_rate": failure_rate, "seed": seed}
+    results = {}
+    with fake_llm_environment(**settings):
+        # Warm-up: imports, company data and first-call overheads stay out of the numbers
+        asyncio.run(_run_level(1, 1, analysis_mode, offers_per_analysis, seed))
+        for concurrency in concurrency_levels:
+            fake_llm.configure_fake_llm(**settings)
+            level = asyncio.run(_run_level(analyses, concurrency, analysis_mode, offers_per_analysis, seed))
+            if measure_memory:
+                level["peak_memory_mb"] = _peak_memory_mb(concurrency, analysis_mode, offers_per_analysis, seed)
+            results[f"concurrency_{concurrency}"] = level
+
+    return {
+        "suite": "pipeline",
+        "meta": {**environment_info(), "fake_llm": settings, "analysis_mode": analysis_mode,
+                 "offers_per_analysis": offers_per_analysis},
+        "results": results,
+    }
+
+
+def _format_table(data: Dict[str, Any]) -> str:
+    lines = [f"{'case':<16}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'thru/s':>10}{'llm/an':>8}{'errors':>8}{'peak MB':>10}"]
+    for case, r in data["results"].items():
+        lat = r["latency_ms"]
+        lines.append(f"{case:<16}{lat.get('p50', 0):>10}{lat.get('p90', 0):>10}{lat.get('p99', 0):>10}"
+                     f"{r['throughput_per_s']:>10}{r['llm_calls_per_analysis']:>8}{r['errors']:>8}"
+                     f"{r.get('peak_memory_mb', '-'):>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the OfferCompare analysis pipeline with a fake LLM")
+    parser.add_argument("--analyses", type=int, default=20, help="Analyses per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--offers", type=int, default=3, help="Generated offers per analysis")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Fake LLM base latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Fake LLM latency jitter (+/-)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fake LLM failure probability")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=["full", "deterministic"], default="full", help="Analysis mode")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory pass")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Regression threshold as a fraction")
+    args = parser.parse_args(argv)
+
+    data = run_pipeline_benchmark(
+        analyses=args.analyses,
+        concurrency_levels=[int(c) for c in args.concurrency.split(",") if c.strip()],
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+        analysis_mode=args.mode,
+        measure_memory=not args.no_memory,
+        offers_per_analysis=args.offers,
+    )
+    print(_format_table(data))
+    if args.output:
+        save_results(args.output, data)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        report = compare_results(load_results(args.compare), data, DIRECTIONS, args.threshold)
+        print("\n" + format_comparison(report))
+        if any(row["regression"] for row in report):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
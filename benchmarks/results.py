@@ -0,0 +1,95 @@
+"""
+Benchmark result files - environment metadata, JSON I/O and regression comparison
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import platform
+import subprocess
+import time
+from typing import Any, Dict, Iterable, List
+
+
+def percentiles(values: Iterable[float], points: Iterable[int] = (50, 90, 99)) -> Dict[str, float]:
+    """Nearest-rank percentiles plus mean and max, rounded to 3 decimals."""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    stats = {f"p{p}": ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] for p in points}
+    stats["mean"] = sum(ordered) / len(ordered)
+    stats["max"] = ordered[-1]
+    return {key: round(value, 3) for key, value in stats.items()}
+
+
+def environment_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def save_results(path: str, data: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    directions: Dict[str, str], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Compare two result files case by case.
+
+    directions maps a metric (dotted path inside a case, e.g. "latency_ms.p90")
+    to "lower" or "higher" (which way is better). A change worse than
+    threshold (fraction) is reported as a regression.
+
+    Returns:
+        list: One entry per compared metric with baseline, current, change and regression flag
+    """
+    report = []
+    for case, current_case in current.get("results", {}).items():
+        baseline_case = baseline.get("results", {}).get(case)
+        if baseline_case is None:
+            continue
+        for metric, better in directions.items():
+            old, new = _lookup(baseline_case, metric), _lookup(current_case, metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else math.inf)
+            worse = change > threshold if better == "lower" else change < -threshold
+            report.append({
+                "case": case, "metric": metric, "baseline": old, "current": new,
+                "change": round(change, 4), "regression": worse,
+            })
+    return report
+
+
+def format_comparison(report: List[Dict[str, Any]]) -> str:
+    lines = []
+    for row in report:
+        marker = "REGRESSION" if row["regression"] else "ok"
+        lines.append(f"{marker:>10}  {row['case']:<24} {row['metric']:<28} "
+                     f"{row['baseline']:>12} -> {row['current']:<12} ({row['change']:+.1%})")
+    return "\n".join(lines)
+
+
+def _lookup(data: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
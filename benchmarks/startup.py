@@ -0,0 +1,125 @@
+"""
+Startup benchmark - import time of the CLI, API server and worker entry points
+
+Each module is imported in a fresh interpreter with -X importtime, so the
+numbers are cold-start costs: import_ms is the module's cumulative import
+time, process_ms the whole interpreter run (startup + import + exit). The
+heaviest imports (by self time) are listed to show where time goes.
+
+Usage:
+  python -m benchmarks.startup --runs 5 --output startup.json \
+      [--compare baseline.json --threshold 0.2] [--modules flow,api_server]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from benchmarks.results import compare_results, environment_info, format_comparison, load_results, save_results
+
+DEFAULT_MODULES = ("utils.call_llm", "nodes", "flow", "main", "api_server")
+
+DIRECTIONS = {
+    "import_ms": "lower",
+    "process_ms": "lower",
+}
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(output: str) -> List[Tuple[str, float, float]]:
+    """(module, self_ms, cumulative_ms) for each line of -X importtime output."""
+    rows = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)) / 1000, int(match.group(2)) / 1000))
+    return rows
+
+
+def _import_once(module: str) -> Tuple[float, List[Tuple[str, float, float]]]:
+    # The environment is passed through unchanged, as a real CLI/worker start would see it
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def measure_module(module: str, runs: int = 5, top_n: int = 5) -> Dict[str, Any]:
+    process_times, import_times = [], []
+    rows: List[Tuple[str, float, float]] = []
+    for _ in range(runs):
+        elapsed, rows = _import_once(module)
+        process_times.append(elapsed)
+        import_times.append(next((cumulative for name, _, cumulative in rows if name == module), 0.0))
+    heaviest = sorted(rows, key=lambda row: -row[1])[:top_n]
+    return {
+        "runs": runs,
+        "import_ms": round(statistics.median(import_times), 1),
+        "process_ms": round(statistics.median(process_times), 1),
+        "modules_imported": len(rows),
+        "heaviest": [{"module": name, "self_ms": round(own, 1), "cumulative_ms": round(cumulative, 1)}
+                     for name, own, cumulative in heaviest],
+    }
+
+
+def run_startup_benchmark(modules: Iterable[str] = DEFAULT_MODULES, runs: int = 5) -> Dict[str, Any]:
+    """
+    Import every module `runs` times in fresh interpreters and return a result document.
+
+    Returns:
+        dict: {"suite", "meta", "results": {"import[<module>]": {...}}}
+    """
+    modules = list(modules)
+    return {
+        "suite": "startup",
+        "meta": {**environment_info(), "modules": modules, "runs": runs},
+        "results": {f"import[{module}]": measure_module(module, runs) for module in modules},
+    }
+
+
+def _format_table(data: Dict[str, Any]) -> str:
+    lines = [f"{'case':<28}{'import ms':>12}{'process ms':>12}{'modules':>10}  heaviest (self ms)"]
+    for case, r in data["results"].items():
+        heaviest = ", ".join(f"{h['module']} {h['self_ms']}" for h in r["heaviest"][:3])
+        lines.append(f"{case:<28}{r['import_ms']:>12}{r['process_ms']:>12}{r['modules_imported']:>10}  {heaviest}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import time of OfferCompare's entry points")
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES), help="Comma-separated modules to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median reported)")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold as a fraction")
+    args = parser.parse_args(argv)
+
+    data = run_startup_benchmark([m.strip() for m in args.modules.split(",") if m.strip()], args.runs)
+    print(_format_table(data))
+    if args.output:
+        save_results(args.output, data)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        report = compare_results(load_results(args.compare), data, DIRECTIONS, args.threshold)
+        print("\n" + format_comparison(report))
+        if any(row["regression"] for row in report):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,22 @@ OfferCompare Pro - Main Flow Implementation
 Connects all 8 nodes for comprehensive job offer analysis and comparison
 """
 
+import asyncio
+import os
+import time
+import uuid
+from contextlib import nullcontext
 from pocketflow import Flow, AsyncFlow
+from utils.dedupe import SharedWork
+from utils.config import get_config
+from utils.metrics import ANALYSES, ANALYSES_IN_FLIGHT
+from utils.tracing import current_trace, start_trace
+from utils.usage import usage_ledger
+from utils.budget import RequestBudget
+from utils.batch_llm import batch_mode
+from utils.log import get_logger
+from utils.scoring import compare_offers, customize_weights
+from utils.viz_formatter import create_visualization_package
 from nodes import (
     OfferCollectionNode,
     MarketResearchNode,
@@ -15,15 +30,17 @@ from nodes import (
     ReportGenerationNode
 )
 
+logger = get_logger(__name__)
+
 def create_offer_comparison_flow():
     """
     Create and return the complete OfferCompare Pro flow using AsyncFlow.
     
     Flow Sequence:
     1. OfferCollection → Collect user offers and preferences (Regular Node)
-    2. MarketResearch → AI-powered company intelligence (AsyncBatchNode)
+    2. MarketResearch → AI-powered company intelligence (OfferBatchNode)
     3. COLAdjustment → Location-based compensation normalization (BatchNode)
-    4. MarketBenchmarking → Industry comparison and percentiles (AsyncBatchNode)
+    4. MarketBenchmarking → Industry comparison and percentiles (OfferBatchNode)
     5. PreferenceScoring → Personalized weighted scoring (BatchNode)
     6. AIAnalysis → Comprehensive AI recommendations (AsyncNode)
     7. VisualizationPreparation → Interactive chart data (Regular Node)
@@ -33,13 +50,13 @@ def create_offer_comparison_flow():
         AsyncFlow: Complete OfferCompare Pro workflow with async support
     """
     
-    print("🚀 Initializing OfferCompare Pro AsyncFlow...")
+    logger.info("🚀 Initializing OfferCompare Pro AsyncFlow...")
     
     # Create all nodes
     offer_collection = OfferCollectionNode()
-    market_research = MarketResearchNode()          # AsyncBatchNode
+    market_research = MarketResearchNode()          # OfferBatchNode
     col_adjustment = COLAdjustmentNode()            # BatchNode
-    market_benchmarking = MarketBenchmarkingNode()  # AsyncBatchNode
+    market_benchmarking = MarketBenchmarkingNode()  # OfferBatchNode
     preference_scoring = PreferenceScoringNode()    # BatchNode
     ai_analysis = AIAnalysisNode()                  # AsyncNode
     visualization_prep = VisualizationPreparationNode()  # Regular Node
@@ -57,9 +74,190 @@ def create_offer_comparison_flow():
     # Create AsyncFlow to handle async nodes
     flow = AsyncFlow(start=offer_collection)
     
-    print("✅ OfferCompare Pro AsyncFlow initialized successfully!")
+    logger.info("✅ OfferCompare Pro AsyncFlow initialized successfully!")
     return flow
 
+def create_analysis_flow():
+    """
+    Create the analysis flow for offers that were collected up front.
+    
+    Same sequence as create_offer_comparison_flow() minus OfferCollection;
+    used by the API server, the non-interactive demo and batch runs.
+    
+    Returns:
+        AsyncFlow: Analysis workflow starting at MarketResearch
+    """
+    market_research = MarketResearchNode()
+    col_adjustment = COLAdjustmentNode()
+    market_benchmarking = MarketBenchmarkingNode()
+    preference_scoring = PreferenceScoringNode()
+    ai_analysis = AIAnalysisNode()
+    visualization_prep = VisualizationPreparationNode()
+    report_generation = ReportGenerationNode()
+    
+    market_research >> col_adjustment
+    col_adjustment >> market_benchmarking
+    market_benchmarking >> preference_scoring
+    preference_scoring >> ai_analysis
+    ai_analysis >> visualization_prep
+    visualization_prep >> report_generation
+    
+    return AsyncFlow(start=market_research)
+
+def prepare_analysis_input(request):
+    """
+    Build the shared store for one analysis request (an API body or a batch file row).
+    
+    Offers without an id get "offer_<n>" and a missing total_compensation is
+    computed from base salary, equity and bonus, as the nodes expect both.
+    
+    Args:
+        request (dict): "offers", "user_preferences" and optionally
+            "analysis_mode", "deadline_seconds" and "token_budget"
+    
+    Returns:
+        dict: Shared store ready for run_analysis
+    """
+    offers = []
+    for i, offer in enumerate(request.get("offers") or [], start=1):
+        data = dict(offer)
+        data["id"] = data.get("id") or f"offer_{i}"
+        if data.get("total_compensation") is None:
+            data["total_compensation"] = data.get("base_salary", 0) + data.get("equity", 0) + data.get("bonus", 0)
+        offers.append(data)
+    
+    return {
+        "offers": offers,
+        "user_preferences": request.get("user_preferences") or {},
+        "analysis_mode": request.get("analysis_mode") or "full",
+        "deadline_seconds": request.get("deadline_seconds"),
+        "token_budget": request.get("token_budget"),
+    }
+
+async def run_analysis(shared):
+    """
+    Run the analysis flow on a prepared shared store.
+    
+    Args:
+        shared (dict): Shared store with "offers" and "user_preferences", and
+            optionally "deadline_seconds" / "token_budget" (defaults from config)
+    
+    Returns:
+        dict: The same shared store, enriched with analysis results and
+            "llm_usage" (tokens, latency and estimated cost per node/model)
+    """
+    flow = create_analysis_flow()
+    config = get_config()
+    # With OFFERCOMPARE_TRACE_DIR set, each analysis not already being traced writes its own trace file
+    trace_dir = config.trace_dir
+    tracing = start_trace("analysis", offers=len(shared.get("offers", [])),
+                          analysis_mode=shared.get("analysis_mode", "full")) \
+        if trace_dir and current_trace() is None else nullcontext()
+    trace = None
+    with ANALYSES_IN_FLIGHT.track_inprogress(), usage_ledger() as ledger:
+        shared["request_budget"] = RequestBudget(
+            shared.get("deadline_seconds") or config.analysis_deadline_seconds,
+            shared.get("token_budget") or config.analysis_token_budget,
+            ledger,
+        )
+        try:
+            with tracing as trace:
+                await flow.run_async(shared)
+        except Exception:
+            ANALYSES.inc(status="error")
+            raise
+        finally:
+            if trace is not None:
+                trace.write(os.path.join(trace_dir, f"analysis-{int(time.time())}-{uuid.uuid4().hex[:8]}.json"))
+            shared["llm_usage"] = ledger.summary()
+    ANALYSES.inc(status="ok")
+    usage = shared["llm_usage"]
+    logger.info("💸 LLM usage: %d calls (%d cached), %d in / %d out tokens, ~$%.4f",
+                usage["calls"], usage["cached_calls"], usage["input_tokens"], usage["output_tokens"],
+                usage["cost_usd"], extra={"event": "llm_usage", "llm_calls": usage["calls"],
+                                          "cost_usd": usage["cost_usd"]})
+    return shared
+
+async def run_batch_analysis(batch, max_concurrency=4, llm_batch=None):
+    """
+    Run many independent analyses with bounded concurrency.
+    
+    Research and benchmarking lookups for companies/positions shared
+    across the batch are performed once and reused by every analysis.
+    
+    Args:
+        batch (list): Shared stores, one per analysis
+        max_concurrency (int): Maximum number of analyses running at once
+        llm_batch (BatchCollector): Send the analyses' LLM calls through
+            provider batch jobs (utils.batch_llm); run them all at once
+            (max_concurrency=len(batch)) so each stage's calls share a job
+    
+    Yields:
+        tuple: (index, shared, error) in completion order; error is None on success
+    """
+    shared_work = SharedWork()
+    queue = asyncio.Queue()
+    results = asyncio.Queue()
+    for index, shared in enumerate(batch):
+        queue.put_nowait((index, shared))
+    
+    async def worker():
+        while True:
+            try:
+                index, shared = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            shared["shared_work"] = shared_work
+            try:
+                await run_analysis(shared)
+                error = None
+            except Exception as e:
+                error = e
+            finally:
+                shared.pop("shared_work", None)
+            await results.put((index, shared, error))
+    
+    # Workers copy the current context, so batch mode reaches every analysis they run
+    with batch_mode(llm_batch) if llm_batch is not None else nullcontext():
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(max_concurrency, len(batch))))]
+    try:
+        for _ in range(len(batch)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+def rescore_offers(offers, user_preferences):
+    """
+    Re-rank already enriched offers under new preferences.
+    
+    Only reruns weighting, scoring/comparison and the visualization package;
+    research, benchmarking and AI analysis from the original run are reused.
+    
+    Args:
+        offers (list): Enriched offers from a previous analysis
+        user_preferences (dict): New user preferences
+    
+    Returns:
+        dict: offers, comparison_results, scoring_weights and visualization_data
+    """
+    user_preferences = user_preferences or {}
+    weights = customize_weights(user_preferences)
+    # Shallow copies keep the cached offers untouched
+    offers = [dict(offer) for offer in offers]
+    comparison_results = compare_offers(offers, user_preferences, weights)
+    
+    for ranking in comparison_results["ranked_offers"]:
+        ranking["offer_data"]["score_data"] = ranking["score_breakdown"]
+    
+    return {
+        "offers": offers,
+        "comparison_results": comparison_results,
+        "scoring_weights": weights,
+        "visualization_data": create_visualization_package(comparison_results["ranked_offers"], weights)
+    }
+
 def create_demo_flow():
     """
     Create a simplified demo flow for testing with sample data.
@@ -130,5 +328,9 @@ def get_sample_offers():
     
     return sample_data
 
-# Main flow instance
-offer_comparison_flow = create_offer_comparison_flow()
\ No newline at end of file
+def __getattr__(name):
+    """Build the main flow instance on first access rather than at import (PEP 562)."""
+    if name == "offer_comparison_flow":
+        flow = globals()["offer_comparison_flow"] = create_offer_comparison_flow()
+        return flow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
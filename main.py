@@ -6,8 +6,13 @@ Intelligent job offer analysis and comparison system
 import os
 import sys
 import argparse
-from flow import create_offer_comparison_flow, get_sample_offers
+from contextlib import ExitStack
+from flow import create_offer_comparison_flow, create_analysis_flow, get_sample_offers
 from utils.call_llm import get_provider_info
+from utils.tracing import start_trace
+from utils.profiling import profile_run
+from utils.usage import usage_ledger
+from utils.log import configure_logging
 import json
 
 def main():
@@ -20,20 +25,40 @@ def main():
     3. Help and documentation
     """
     
+    # Friendly progress output on stdout (nodes log instead of printing)
+    configure_logging("cli")
+    
     # Lightweight CLI flags (non-interactive paths)
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument("--demo", action="store_true", help="Run non-interactive demo with sample data")
+    parser.add_argument("--deterministic", action="store_true", help="Skip all AI/LLM work (local data only)")
+    parser.add_argument("--trace", metavar="FILE", help="Write a Chrome trace of the demo run to FILE")
+    parser.add_argument("--profile", metavar="DIR", nargs="?", const=".profiles",
+                        help="Profile the demo run (CPU + allocations) and write reports to DIR")
+    parser.add_argument("--batch", metavar="FILE", help="Analyze every request in FILE using provider batch jobs")
+    parser.add_argument("--output", metavar="FILE", help="Where --batch writes its JSON lines (default stdout)")
     parser.add_argument("--help-cli", action="store_true", help="Show CLI help and exit")
     args, _ = parser.parse_known_args()
 
     if args.help_cli:
-        print("Usage: python main.py [--demo]")
-        print("  --demo      Run non-interactive demo using sample data")
+        print("Usage: python main.py [--demo] [--deterministic] [--trace FILE] [--profile [DIR]]")
+        print("       python main.py --batch FILE [--output FILE]")
+        print("  --demo           Run non-interactive demo using sample data")
+        print("  --deterministic  Skip all AI/LLM work; scores use local company data")
+        print("  --trace FILE     Write a Chrome trace (chrome://tracing, Perfetto) of the demo run")
+        print("  --profile [DIR]  Profile the demo run; writes .prof/.txt reports to DIR (default .profiles)")
+        print("  --batch FILE     Offline bulk run: analyze each request in FILE (JSON list or JSON lines of")
+        print("                   {offers, user_preferences}) with LLM calls sent as provider batch jobs")
+        print("  --output FILE    Write --batch results there as JSON lines (default stdout)")
         sys.exit(0)
 
+    if args.batch:
+        return run_batch_file(args.batch, args.output)
+
     # Non-interactive demo path
     if args.demo:
-        return run_demo_analysis(ask_confirm=False)
+        return run_demo_analysis(ask_confirm=False, deterministic=args.deterministic, trace_path=args.trace,
+                                 profile_dir=args.profile)
 
     print("\n" + "="*80)
     print("🎯 WELCOME TO OFFERCOMPARE PRO")
@@ -132,14 +157,21 @@ def run_full_analysis():
         if "API" in str(e):
             print("💡 Tip: Make sure your API keys are properly configured in .env file")
 
-def run_demo_analysis(ask_confirm: bool = True):
-    """Run demo analysis with sample data. If ask_confirm is False, runs non-interactively."""
+def run_demo_analysis(ask_confirm: bool = True, deterministic: bool = False, trace_path: str = None,
+                      profile_dir: str = None):
+    """
+    Run demo analysis with sample data. If ask_confirm is False, runs non-interactively.
+    With trace_path, the run is traced and written there in Chrome trace format.
+    With profile_dir, the run is profiled (cProfile/pyinstrument + tracemalloc) and reports written there.
+    """
     
     print("\n📊 Running Demo Analysis with Sample Data...")
     print("This showcases the full capabilities with pre-loaded offers.")
     
     # Use sample data
     shared = get_sample_offers()
+    if deterministic:
+        shared["analysis_mode"] = "deterministic"
     
     print(f"\n📋 Demo includes {len(shared['offers'])} sample offers:")
     for offer in shared['offers']:
@@ -150,33 +182,9 @@ def run_demo_analysis(ask_confirm: bool = True):
         if proceed != 'y':
             return main()
     
-    # Create flow (skip offer collection for demo)
-    from nodes import (
-        MarketResearchNode, COLAdjustmentNode, MarketBenchmarkingNode,
-        PreferenceScoringNode, AIAnalysisNode, VisualizationPreparationNode,
-        ReportGenerationNode
-    )
-    from pocketflow import AsyncFlow
+    # Create demo flow (skip offer collection, start from market research)
     import asyncio
-    
-    # Create demo flow (starting from market research)
-    market_research = MarketResearchNode()
-    col_adjustment = COLAdjustmentNode()
-    market_benchmarking = MarketBenchmarkingNode()
-    preference_scoring = PreferenceScoringNode()
-    ai_analysis = AIAnalysisNode()
-    visualization_prep = VisualizationPreparationNode()
-    report_generation = ReportGenerationNode()
-    
-    # Connect nodes
-    market_research >> col_adjustment
-    col_adjustment >> market_benchmarking
-    market_benchmarking >> preference_scoring
-    preference_scoring >> ai_analysis
-    ai_analysis >> visualization_prep
-    visualization_prep >> report_generation
-    
-    demo_flow = AsyncFlow(start=market_research)
+    demo_flow = create_analysis_flow()
     
     try:
         print("\n" + "="*60)
@@ -184,7 +192,26 @@ def run_demo_analysis(ask_confirm: bool = True):
         print("="*60)
         
         # Run async flow
-        asyncio.run(demo_flow.run_async(shared))
+        trace = profile = None
+        with ExitStack() as stack:
+            if trace_path:
+                trace = stack.enter_context(
+                    start_trace("demo_analysis", analysis_mode=shared.get("analysis_mode", "full")))
+            if profile_dir:
+                profile = stack.enter_context(profile_run("demo", profile_dir))
+            ledger = stack.enter_context(usage_ledger())
+            asyncio.run(demo_flow.run_async(shared))
+        usage = ledger.summary()
+        if usage["calls"]:
+            print(f"💸 LLM usage: {usage['calls']} calls ({usage['cached_calls']} cached), "
+                  f"{usage['input_tokens']:,} in / {usage['output_tokens']:,} out tokens, ~${usage['cost_usd']:.4f}"
+                  + (" (estimated)" if usage["estimated"] else ""))
+        if trace:
+            trace.write(trace_path)
+            print(f"🧭 Trace written to {trace_path} ({len(trace.spans)} spans)")
+        if profile:
+            print(f"🔬 Profile written to {profile.profile_path} (report: {profile.report_path}, "
+                  f"{profile.wall_ms} ms, peak {profile.peak_alloc_kb} KiB)")
         
         print("\n" + "="*60)
         print("✅ DEMO COMPLETE!")
@@ -542,6 +569,58 @@ def test_company_db():
     input("\nPress Enter to continue...")
     test_utilities()
 
+def run_batch_file(input_path: str, output_path: str = None):
+    """
+    Offline bulk comparisons: run every analysis in input_path at once, with the
+    LLM calls they make collected into provider batch jobs (utils.batch_llm).
+    
+    Rows are normalized like API requests (flow.prepare_analysis_input); rows
+    without offers are reported as errors without running. Results are written
+    as JSON lines {"index", "status", "result"|"error"} in completion order.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from flow import prepare_analysis_input, run_batch_analysis
+    from utils.batch_llm import BatchCollector
+    
+    with open(input_path) as f:
+        text = f.read().strip()
+    requests = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+    positions = [index for index, r in enumerate(requests) if r.get("offers")]
+    batch = [prepare_analysis_input(requests[index]) for index in positions]
+    
+    async def run(out):
+        # Each waiting LLM call holds a worker thread until its batch job finishes
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=min(1024, 16 * len(batch) + 8), thread_name_prefix="batch-analysis"))
+        failed = 0
+        for index in sorted(set(range(len(requests))) - set(positions)):
+            failed += 1
+            out.write(json.dumps({"index": index, "status": "error", "error": "Offers list cannot be empty"}) + "\n")
+        async for i, shared, error in run_batch_analysis(batch, len(batch), llm_batch=collector):
+            index = positions[i]
+            if error is not None:
+                failed += 1
+                line = {"index": index, "status": "error", "error": str(error)}
+            else:
+                line = {"index": index, "status": "ok", "result": {
+                    key: shared.get(key) for key in ("executive_summary", "final_report", "comparison_results",
+                                                     "offers", "llm_usage")}}
+            out.write(json.dumps(line, default=str) + "\n")
+            out.flush()
+        return failed
+    
+    collector = BatchCollector.from_config()
+    try:
+        with ExitStack() as stack:
+            out = stack.enter_context(open(output_path, "w")) if output_path else sys.stdout
+            failed = asyncio.run(run(out))
+    finally:
+        collector.close()
+    print(f"📦 {len(requests) - failed}/{len(requests)} analyses complete using {collector.jobs_submitted} batch jobs",
+          file=sys.stderr)
+    return 1 if failed else 0
+
 def save_results(shared):
     """Optionally save analysis results to file."""
     
@@ -568,4 +647,4 @@ def save_results(shared):
             print(f"❌ Error saving results: {e}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
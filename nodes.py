@@ -5,17 +5,90 @@ Complete set of nodes for intelligent job offer analysis and comparison
 
 from pocketflow import Node, BatchNode, AsyncNode, AsyncBatchNode
 from utils.call_llm import call_llm, call_llm_structured, call_llm_async, call_llm_structured_async
-from utils.web_research import research_company, get_market_sentiment, research_company_async, get_market_sentiment_async
+from utils.web_research import (research_company, get_market_sentiment, research_company_async, get_market_sentiment_async,
+                                research_company_offline)
 from utils.col_calculator import calculate_col_adjustment, get_location_insights
 from utils.market_data import (get_compensation_insights, calculate_market_percentile, ai_market_analysis,
                               get_compensation_insights_async, calculate_market_percentile_async, ai_market_analysis_async)
 from utils.scoring import calculate_offer_score, compare_offers, customize_weights
 from utils.viz_formatter import create_visualization_package
 from utils.company_db import get_company_data, enrich_company_data
+from utils.dedupe import run_shared
+from utils.metrics import NODE_LATENCY
+from utils.tracing import span, traced
+from utils.usage import node_scope
+from utils.budget import run_within_budget
+from utils.compaction import clip, compact_prompt, format_fields
+from utils.batch_llm import current_batch
+from utils.log import get_logger
 import json
 import asyncio
 
-class OfferCollectionNode(Node):
+logger = get_logger(__name__)
+
+# Analysis modes (shared["analysis_mode"]); deterministic skips every LLM call
+FULL_MODE = "full"
+DETERMINISTIC_MODE = "deterministic"
+ANALYSIS_MODES = (FULL_MODE, DETERMINISTIC_MODE)
+
+# Output cap for the shortened AI analysis used when the request budget runs low
+CONCISE_ANALYSIS_MAX_TOKENS = 500
+
+# Node lifecycle methods wrapped in tracing spans by InstrumentedNode
+TRACED_METHODS = ("prep", "exec", "post", "prep_async", "exec_async", "post_async")
+
+def _item_attributes(node, item=None, *args, **kwargs):
+    """Span attributes (offer_id, company) taken from a batch item or exec input."""
+    if not isinstance(item, dict):
+        return {}
+    source = item.get("offer") if isinstance(item.get("offer"), dict) else item
+    attributes = {}
+    offer_id = source.get("offer_id", source.get("id"))
+    if isinstance(offer_id, str):
+        attributes["offer_id"] = offer_id
+    if isinstance(source.get("company"), str):
+        attributes["company"] = source["company"]
+    return attributes
+
+class InstrumentedNode:
+    """
+    Mixin recording each node run (prep + exec + post) in the node latency
+    histogram, wrapping the run and its lifecycle methods in tracing spans and
+    attributing the LLM usage of the run to the node.
+    """
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method in TRACED_METHODS:
+            fn = cls.__dict__.get(method)
+            if fn is not None:
+                name = f"{cls.__name__}.{method.replace('_async', '')}"
+                attributes = _item_attributes if method.startswith("exec") else None
+                setattr(cls, method, traced(name, attributes)(fn))
+    
+    def _run(self, shared):
+        name = type(self).__name__
+        with NODE_LATENCY.time(node=name), span(name, node=name), node_scope(name):
+            return super()._run(shared)
+    
+    async def _run_async(self, shared):
+        name = type(self).__name__
+        with NODE_LATENCY.time(node=name), span(name, node=name), node_scope(name):
+            return await super()._run_async(shared)
+
+class OfferBatchNode(AsyncBatchNode):
+    """
+    AsyncBatchNode that runs its per-offer items concurrently in batch LLM mode,
+    so one stage's calls for every offer share a batch job instead of waiting
+    for a job each. Interactive runs keep the sequential order.
+    """
+    
+    async def _exec(self, items):
+        if current_batch() is None:
+            return await super()._exec(items)
+        return await asyncio.gather(*(super(AsyncBatchNode, self)._exec(item) for item in items))
+
+class OfferCollectionNode(InstrumentedNode, Node):
     """
     Collect and validate comprehensive offer data from user input.
     Handles multiple job offers with detailed information.
@@ -140,15 +213,17 @@ class OfferCollectionNode(Node):
         except ValueError:
             return default if default is not None else 0
 
-class MarketResearchNode(AsyncBatchNode):
+class MarketResearchNode(InstrumentedNode, OfferBatchNode):
     """
     Gather comprehensive market intelligence for each company using AI agents.
-    Uses AsyncBatchNode for efficient parallel I/O operations.
+    Uses OfferBatchNode so batch LLM runs research every company in one job.
     """
     
     async def prep_async(self, shared):
         """Extract company and position details for research."""
         offers = shared.get("offers", [])
+        shared_work = shared.get("shared_work")
+        analysis_mode = shared.get("analysis_mode", FULL_MODE)
         research_items = []
         
         for offer in offers:
@@ -156,7 +231,10 @@ class MarketResearchNode(AsyncBatchNode):
                 "offer_id": offer.get("id"),
                 "company": offer.get("company", "Unknown"),
                 "position": offer.get("position", "Unknown"),
-                "location": offer.get("location", "Unknown")
+                "location": offer.get("location", "Unknown"),
+                "shared_work": shared_work,
+                "analysis_mode": analysis_mode,
+                "budget": shared.get("request_budget")
             })
         
         return research_items
@@ -166,11 +244,40 @@ class MarketResearchNode(AsyncBatchNode):
         Conduct AI-powered research for a single company.
         Uses async I/O for parallel processing.
         """
-        print(f"\n🔍 Conducting market research for {research_item['company']}...")
+        logger.info("🔍 Conducting market research for %s...", research_item['company'],
+                    extra={"event": "market_research", "offer_id": research_item.get("offer_id"), "company": research_item['company']})
         
-        # Parallel async calls for research data
-        company_research = await research_company_async(research_item["company"], research_item["position"])
-        market_sentiment = await get_market_sentiment_async(research_item["company"], research_item["position"])
+        company = research_item["company"]
+        position = research_item["position"]
+        shared_work = research_item.get("shared_work")
+        
+        if research_item.get("analysis_mode") == DETERMINISTIC_MODE:
+            # Local company data only, no LLM research or sentiment
+            company_research = research_company_offline(company, position)
+            market_sentiment = {"company_name": company, "sentiment_analysis": "", "analysis_timestamp": "2024-01-01"}
+        else:
+            # Async research calls (deduplicated across a batch); within the request
+            # budget, falling back to local company data and skipping sentiment
+            budget = research_item.get("budget")
+            company_research = await run_within_budget(
+                budget, "MarketResearchNode", "offline_research",
+                lambda: run_shared(shared_work, ("research", company, position),
+                                   lambda: research_company_async(company, position)),
+                lambda: research_company_offline(company, position),
+                company=company
+            )
+            skipped_sentiment = {"company_name": company, "sentiment_analysis": "", "analysis_timestamp": "2024-01-01"}
+            if budget is not None and budget.low():
+                budget.degrade("MarketResearchNode", "skip_sentiment", "budget low", company=company)
+                market_sentiment = skipped_sentiment
+            else:
+                market_sentiment = await run_within_budget(
+                    budget, "MarketResearchNode", "skip_sentiment",
+                    lambda: run_shared(shared_work, ("sentiment", company, position),
+                                       lambda: get_market_sentiment_async(company, position)),
+                    lambda: skipped_sentiment,
+                    company=company
+                )
         
         # These are local operations, so keep sync for now
         company_db_data = get_company_data(research_item["company"])
@@ -200,10 +307,10 @@ class MarketResearchNode(AsyncBatchNode):
                 offer["company_db_data"] = research_data["company_db_data"]
                 offer["enriched_data"] = research_data["enriched_data"]
         
-        print(f"✅ Market research completed for {len(exec_res_list)} companies")
+        logger.info("✅ Market research completed for %d companies", len(exec_res_list), extra={"event": "market_research_done"})
         return "default"
 
-class COLAdjustmentNode(BatchNode):
+class COLAdjustmentNode(InstrumentedNode, BatchNode):
     """
     Apply location-based compensation normalization for fair comparison.
     Calculates cost of living adjustments for each offer.
@@ -229,7 +336,8 @@ class COLAdjustmentNode(BatchNode):
     
     def exec(self, adjustment_item):
         """Calculate cost of living adjustments for a single offer."""
-        print(f"\n💰 Calculating cost of living adjustment for {adjustment_item['company']} ({adjustment_item['location']})...")
+        logger.info("💰 Calculating cost of living adjustment for %s (%s)...", adjustment_item['company'], adjustment_item['location'],
+                    extra={"event": "col_adjustment", "offer_id": adjustment_item.get("offer_id"), "company": adjustment_item['company']})
         
         salary_adjustment = calculate_col_adjustment(
             adjustment_item["base_salary"],
@@ -267,22 +375,27 @@ class COLAdjustmentNode(BatchNode):
                 # Alias expected by some tests
                 offer["col_analysis"] = adjustment_data["salary_adjustment"]
         
-        print("✅ Cost of living adjustments completed")
+        logger.info("✅ Cost of living adjustments completed", extra={"event": "col_adjustment_done"})
         return "default"
 
-class MarketBenchmarkingNode(AsyncBatchNode):
+class MarketBenchmarkingNode(InstrumentedNode, OfferBatchNode):
     """
     Compare each offer against industry market standards.
-    Uses AsyncBatchNode for parallel market data API calls.
+    Uses OfferBatchNode so batch LLM runs benchmark every offer in one job.
     """
     
     async def prep_async(self, shared):
         """Extract offer data for market comparison."""
         offers = shared.get("offers", [])
+        shared_work = shared.get("shared_work")
+        analysis_mode = shared.get("analysis_mode", FULL_MODE)
         benchmark_items = []
         
         for offer in offers:
             benchmark_items.append({
+                "shared_work": shared_work,
+                "analysis_mode": analysis_mode,
+                "budget": shared.get("request_budget"),
                 "offer_id": offer["id"],
                 "company": offer["company"],
                 "position": offer["position"],
@@ -298,40 +411,66 @@ class MarketBenchmarkingNode(AsyncBatchNode):
     
     async def exec_async(self, benchmark_item):
         """Perform market benchmarking for a single offer using async calls."""
-        print(f"\n📊 Performing market benchmarking analysis for {benchmark_item['company']} {benchmark_item['position']}...")
-        
-        # Parallel async calls for market data
-        compensation_insights = await get_compensation_insights_async(
-            benchmark_item["position"],
-            benchmark_item["base_salary"],
-            benchmark_item["equity"],
-            benchmark_item["bonus"],
-            benchmark_item["location"]
+        logger.info("📊 Performing market benchmarking analysis for %s %s...", benchmark_item['company'], benchmark_item['position'],
+                    extra={"event": "market_benchmarking", "offer_id": benchmark_item.get("offer_id"), "company": benchmark_item['company']})
+        
+        if benchmark_item.get("analysis_mode") == DETERMINISTIC_MODE:
+            return self._benchmark_locally(benchmark_item)
+        
+        shared_work = benchmark_item.get("shared_work")
+        position = benchmark_item["position"]
+        location = benchmark_item["location"]
+        salary_key = (benchmark_item["base_salary"], benchmark_item["equity"],
+                      benchmark_item["bonus"], benchmark_item["total_compensation"])
+        
+        # Parallel async calls for market data (deduplicated across a batch)
+        compensation_insights = await run_shared(
+            shared_work, ("insights", position, location, salary_key),
+            lambda: get_compensation_insights_async(
+                position,
+                benchmark_item["base_salary"],
+                benchmark_item["equity"],
+                benchmark_item["bonus"],
+                location
+            )
         )
         
-        base_percentile = await calculate_market_percentile_async(
-            benchmark_item["base_salary"],
-            benchmark_item["position"],
-            benchmark_item["location"]
+        base_percentile = await run_shared(
+            shared_work, ("percentile", position, location, benchmark_item["base_salary"]),
+            lambda: calculate_market_percentile_async(benchmark_item["base_salary"], position, location)
         )
         
-        total_percentile = await calculate_market_percentile_async(
-            benchmark_item["total_compensation"],
-            benchmark_item["position"],
-            benchmark_item["location"]
+        total_percentile = await run_shared(
+            shared_work, ("percentile", position, location, benchmark_item["total_compensation"]),
+            lambda: calculate_market_percentile_async(benchmark_item["total_compensation"], position, location)
         )
         
-        ai_analysis = await ai_market_analysis_async(
-            benchmark_item["position"],
-            benchmark_item["company"],
-            benchmark_item["location"],
-            {
-                "base_salary": benchmark_item["base_salary"],
-                "equity_value": benchmark_item["equity"],
-                "bonus": benchmark_item["bonus"],
-                "total_compensation": benchmark_item["total_compensation"]
-            }
-        )
+        # Optional AI commentary: skipped when the request budget runs low
+        budget = benchmark_item.get("budget")
+        if budget is not None and budget.low():
+            budget.degrade("MarketBenchmarkingNode", "skip_ai_market_analysis", "budget low",
+                           company=benchmark_item["company"])
+            ai_analysis = None
+        else:
+            ai_analysis = await run_within_budget(
+                budget, "MarketBenchmarkingNode", "skip_ai_market_analysis",
+                lambda: run_shared(
+                    shared_work, ("ai_market", position, benchmark_item["company"], location, salary_key),
+                    lambda: ai_market_analysis_async(
+                        position,
+                        benchmark_item["company"],
+                        location,
+                        {
+                            "base_salary": benchmark_item["base_salary"],
+                            "equity_value": benchmark_item["equity"],
+                            "bonus": benchmark_item["bonus"],
+                            "total_compensation": benchmark_item["total_compensation"]
+                        }
+                    )
+                ),
+                lambda: None,
+                company=benchmark_item["company"]
+            )
         
         # Include alias keys expected by tests
         return {
@@ -345,6 +484,31 @@ class MarketBenchmarkingNode(AsyncBatchNode):
             "ai_analysis": ai_analysis
         }
     
+    def _benchmark_locally(self, benchmark_item):
+        """Pure-table benchmarking, run inline without executor hops or AI analysis."""
+        position = benchmark_item["position"]
+        location = benchmark_item["location"]
+        compensation_insights = get_compensation_insights(
+            position,
+            benchmark_item["base_salary"],
+            benchmark_item["equity"],
+            benchmark_item["bonus"],
+            location
+        )
+        base_percentile = calculate_market_percentile(benchmark_item["base_salary"], position, location)
+        total_percentile = calculate_market_percentile(benchmark_item["total_compensation"], position, location)
+        
+        return {
+            "offer_id": benchmark_item["offer_id"],
+            "compensation_insights": compensation_insights,
+            "market_insights": compensation_insights,
+            "base_percentile": base_percentile,
+            "market_analysis": base_percentile,
+            "total_percentile": total_percentile,
+            "total_comp_analysis": total_percentile,
+            "ai_analysis": None
+        }
+    
     async def post_async(self, shared, prep_res, exec_res_list):
         """Add market benchmarking data to offers."""
         benchmark_lookup = {r.get("offer_id"): r for r in exec_res_list if isinstance(r, dict)}
@@ -357,10 +521,10 @@ class MarketBenchmarkingNode(AsyncBatchNode):
                 offer["compensation_insights"] = benchmark_data["compensation_insights"]
                 offer["ai_market_analysis"] = benchmark_data["ai_analysis"]
         
-        print("✅ Market benchmarking completed")
+        logger.info("✅ Market benchmarking completed", extra={"event": "market_benchmarking_done"})
         return "default"
 
-class PreferenceScoringNode(BatchNode):
+class PreferenceScoringNode(InstrumentedNode, BatchNode):
     """
     Calculate personalized scores based on user-defined weightings.
     Uses BatchNode to process each offer individually with user preferences.
@@ -378,7 +542,8 @@ class PreferenceScoringNode(BatchNode):
         """Calculate score for a single offer with user preferences."""
         offer, user_preferences = offer_with_prefs
         
-        print(f"\n🎯 Calculating personalized score for {offer.get('company', 'Unknown')}...")
+        logger.info("🎯 Calculating personalized score for %s...", offer.get('company', 'Unknown'),
+                    extra={"event": "preference_scoring", "offer_id": offer.get("id"), "company": offer.get('company', 'Unknown')})
         
         # Customize weights based on user priorities  
         weights = customize_weights(user_preferences)
@@ -410,10 +575,10 @@ class PreferenceScoringNode(BatchNode):
         shared["comparison_results"] = comparison_results
         shared["scoring_weights"] = weights
         
-        print("✅ Personalized scoring completed")
+        logger.info("✅ Personalized scoring completed", extra={"event": "preference_scoring_done"})
         return "default"
 
-class AIAnalysisNode(AsyncNode):
+class AIAnalysisNode(InstrumentedNode, AsyncNode):
     """
     Generate comprehensive AI-powered recommendations and risk assessments.
     Provides detailed analysis and career trajectory insights.
@@ -425,38 +590,82 @@ class AIAnalysisNode(AsyncNode):
             "offers": shared.get("offers", []),
             "comparison_results": shared.get("comparison_results", {}),
             "user_preferences": shared.get("user_preferences", {}),
-            "scoring_weights": shared.get("scoring_weights", {})
+            "scoring_weights": shared.get("scoring_weights", {}),
+            "analysis_mode": shared.get("analysis_mode", FULL_MODE),
+            # Set when the caller will not return any AI-written text
+            "skip_ai_text": shared.get("skip_ai_text", False),
+            "budget": shared.get("request_budget")
         }
     
     async def exec_async(self, prep_data):
-        """Generate comprehensive AI analysis using async LLM calls."""
+        """Generate comprehensive AI analysis using async LLM calls, within the request budget."""
         offers = prep_data["offers"]
         comparison_results = prep_data["comparison_results"]
         user_preferences = prep_data["user_preferences"]
+        budget = prep_data.get("budget")
         
-        print(f"\n🤖 Generating AI-powered analysis and recommendations...")
+        if prep_data.get("analysis_mode") == DETERMINISTIC_MODE or prep_data.get("skip_ai_text"):
+            return self._deterministic_analysis(offers)
         
-        # Prepare comprehensive data for AI analysis
-        analysis_prompt = self._build_analysis_prompt(offers, comparison_results, user_preferences)
+        if budget is not None and budget.exhausted():
+            budget.degrade("AIAnalysisNode", "deterministic_analysis", budget.exhaustion_reason())
+            return self._deterministic_analysis(offers)
         
-        # Get comprehensive AI analysis with async LLM call
-        ai_analysis = await call_llm_async(
-            analysis_prompt,
-            temperature=0.3,
-            system_prompt="You are an expert career advisor and compensation analyst providing comprehensive job offer analysis."
-        )
+        # Low budget: one short analysis call; recommendations come from scores
+        concise = budget is not None and budget.low()
+        if concise:
+            budget.degrade("AIAnalysisNode", "short_analysis", "budget low")
         
-        # Generate specific recommendations for each offer (async)
-        offer_recommendations = []
-        for offer in offers:
-            recommendation = await self._generate_offer_recommendation_async(offer, user_preferences)
-            offer_recommendations.append({
-                "offer_id": offer["id"],
-                "recommendation": recommendation
-            })
+        logger.info("🤖 Generating AI-powered analysis and recommendations...", extra={"event": "ai_analysis"})
+        
+        # Prepare comprehensive data for AI analysis
+        analysis_prompt = self._build_analysis_prompt(offers, comparison_results, user_preferences, concise)
         
-        # Generate decision framework (async)
-        decision_framework = await self._generate_decision_framework_async(offers, comparison_results)
+        # Get comprehensive AI analysis with async LLM call
+        async def comprehensive_analysis():
+            return await run_within_budget(
+                budget, "AIAnalysisNode", "skip_comprehensive_analysis",
+                lambda: call_llm_async(
+                    analysis_prompt,
+                    temperature=0.3,
+                    max_tokens=CONCISE_ANALYSIS_MAX_TOKENS if concise else None,
+                    system_prompt="You are an expert career advisor and compensation analyst providing comprehensive job offer analysis.",
+                    purpose="analysis"
+                ),
+                lambda: ""
+            )
+        
+        # Specific recommendation for one offer (async)
+        async def recommend(offer):
+            if concise:
+                return self._score_recommendation(offer)
+            return await run_within_budget(
+                budget, "AIAnalysisNode", "score_based_recommendation",
+                lambda: self._generate_offer_recommendation_async(offer, user_preferences),
+                lambda: self._score_recommendation(offer),
+                offer_id=offer["id"]
+            )
+        
+        # Decision framework (async)
+        async def decision_framework_text():
+            if concise:
+                return ""
+            return await run_within_budget(
+                budget, "AIAnalysisNode", "skip_decision_framework",
+                lambda: self._generate_decision_framework_async(offers, comparison_results),
+                lambda: ""
+            )
+        
+        if current_batch() is None:
+            ai_analysis = await comprehensive_analysis()
+            recommendations = [await recommend(offer) for offer in offers]
+            decision_framework = await decision_framework_text()
+        else:
+            # The calls are independent: batch LLM runs send them all in one job
+            ai_analysis, decision_framework, *recommendations = await asyncio.gather(
+                comprehensive_analysis(), decision_framework_text(), *(recommend(offer) for offer in offers))
+        offer_recommendations = [{"offer_id": offer["id"], "recommendation": recommendation}
+                                 for offer, recommendation in zip(offers, recommendations)]
         
         return {
             "comprehensive_analysis": ai_analysis,
@@ -480,28 +689,71 @@ class AIAnalysisNode(AsyncNode):
         shared["ai_analysis"] = exec_res["comprehensive_analysis"]
         shared["decision_framework"] = exec_res["decision_framework"]
         
-        print("✅ AI analysis completed")
+        logger.info("✅ AI analysis completed", extra={"event": "ai_analysis_done"})
         return "default"
     
-    def _build_analysis_prompt(self, offers, comparison_results, user_preferences):
-        """Build comprehensive prompt for AI analysis."""
+    def _score_recommendation(self, offer):
+        """Recommendation derived from an offer's rating and strongest factors."""
+        rating_recommendations = {
+            "Excellent": "Strongly Recommended",
+            "Very Good": "Recommended",
+            "Good": "Recommended with Conditions",
+            "Fair": "Neutral/Consider Carefully"
+        }
+        score_data = offer.get("score_data", {})
+        recommendation = rating_recommendations.get(score_data.get("rating"), "Not Recommended")
+        strengths = ", ".join(f["factor"].replace("_", " ") for f in score_data.get("top_strengths", []))
+        if strengths:
+            recommendation += f" (strongest factors: {strengths})"
+        return recommendation
+    
+    def _deterministic_analysis(self, offers):
+        """Score-based recommendations used when LLM analysis is skipped."""
+        offer_recommendations = [
+            {"offer_id": offer["id"], "recommendation": self._score_recommendation(offer)}
+            for offer in offers
+        ]
+        
+        return {
+            "comprehensive_analysis": "",
+            "offer_recommendations": offer_recommendations,
+            "decision_framework": "",
+            "ai_analysis": "",
+            "recommendation": offer_recommendations[0]["recommendation"] if offer_recommendations else ""
+        }
+    
+    def _build_analysis_prompt(self, offers, comparison_results, user_preferences, concise=False):
+        """Build comprehensive prompt for AI analysis (a shorter brief when concise)."""
         prompt = f"""
         Analyze these {len(offers)} job offers and provide comprehensive insights:
 
-        USER PRIORITIES: {user_preferences}
+        USER PRIORITIES:
+        {format_fields(user_preferences)}
 
         OFFERS SUMMARY:
         """
         
         for offer in offers:
             prompt += f"""
-        {offer.get('company', 'Unknown')} - {offer.get('position', 'Unknown')} ({offer.get('location', 'Unknown')})
+        {clip(offer.get('company', 'Unknown'), 80)} - {clip(offer.get('position', 'Unknown'), 80)} ({clip(offer.get('location', 'Unknown'), 80)})
         - Base Salary: ${offer.get('base_salary', 0):,}
         - Total Comp: ${offer.get('total_compensation', offer.get('base_salary', 0) + offer.get('equity', 0) + offer.get('bonus', 0)):,}
         - Market Percentile: {offer.get('market_analysis', {}).get('market_percentile', 'N/A')}
         - Score: {offer.get('score_data', {}).get('total_score', 'N/A')}
         """
         
+        if concise:
+            prompt += f"""
+        
+        TOP CHOICE: {comparison_results.get('top_offer', {}).get('company', 'N/A')}
+        
+        In under 250 words, provide:
+        1. Executive summary of the offer comparison
+        2. Final recommendation with reasoning
+        3. The single biggest risk to check before deciding
+        """
+            return compact_prompt(prompt, "analysis_concise")
+        
         prompt += f"""
         
         TOP CHOICE: {comparison_results.get('top_offer', {}).get('company', 'N/A')}
@@ -519,15 +771,15 @@ class AIAnalysisNode(AsyncNode):
         Focus on actionable insights for decision-making.
         """
         
-        return prompt
+        return compact_prompt(prompt, "analysis")
     
     async def _generate_offer_recommendation_async(self, offer, user_preferences):
         """Generate specific recommendation for an individual offer using async LLM."""
         prompt = f"""
         Provide a focused recommendation for this specific offer:
         
-        Company: {offer.get('company', 'Unknown')}
-        Position: {offer.get('position', 'Unknown')}
+        Company: {clip(offer.get('company', 'Unknown'), 80)}
+        Position: {clip(offer.get('position', 'Unknown'), 80)}
         Total Score: {offer.get('score_data', {}).get('total_score', offer.get('total_score', 'N/A'))}
         
         Based on the analysis, should this offer be:
@@ -539,7 +791,8 @@ class AIAnalysisNode(AsyncNode):
         Provide 2-3 key reasons for your recommendation.
         """
         
-        return await call_llm_async(prompt, temperature=0.3)
+        return await call_llm_async(compact_prompt(prompt, "recommendation"), temperature=0.3,
+                                    purpose="offer_recommendation")
     
     async def _generate_decision_framework_async(self, offers, comparison_results):
         """Generate a decision-making framework using async LLM."""
@@ -556,9 +809,10 @@ class AIAnalysisNode(AsyncNode):
         Keep it practical and actionable.
         """
         
-        return await call_llm_async(prompt, temperature=0.3)
+        return await call_llm_async(compact_prompt(prompt, "decision_framework"), temperature=0.3,
+                                    purpose="recommendation")
 
-class VisualizationPreparationNode(Node):
+class VisualizationPreparationNode(InstrumentedNode, Node):
     """
     Prepare data for interactive charts and comparison visualizations.
     Creates Chart.js compatible data structures.
@@ -568,7 +822,8 @@ class VisualizationPreparationNode(Node):
         """Prepare scored offers and weights for visualization."""
         return {
             "comparison_results": shared.get("comparison_results", {}),
-            "scoring_weights": shared.get("scoring_weights", {})
+            "scoring_weights": shared.get("scoring_weights", {}),
+            "charts": shared.get("visualization_charts")
         }
     
     def exec(self, prep_data):
@@ -576,12 +831,12 @@ class VisualizationPreparationNode(Node):
         comparison_results = prep_data["comparison_results"]
         scoring_weights = prep_data["scoring_weights"]
         
-        print(f"\n📊 Preparing interactive visualizations...")
+        logger.info("📊 Preparing interactive visualizations...", extra={"event": "visualization"})
         
         ranked_offers = comparison_results.get("ranked_offers", [])
         
         # Create comprehensive visualization package
-        viz_package = create_visualization_package(ranked_offers, scoring_weights)
+        viz_package = create_visualization_package(ranked_offers, scoring_weights, prep_data.get("charts"))
         
         return {
             "visualization_data": viz_package,
@@ -593,10 +848,11 @@ class VisualizationPreparationNode(Node):
         """Store visualization data."""
         shared["visualization_data"] = exec_res["visualization_data"]
         
-        print(f"✅ Prepared {exec_res['chart_count']} interactive visualizations")
+        logger.info("✅ Prepared %d interactive visualizations", exec_res['chart_count'],
+                    extra={"event": "visualization_done", "chart_count": exec_res['chart_count']})
         return "default"
 
-class ReportGenerationNode(Node):
+class ReportGenerationNode(InstrumentedNode, Node):
     """
     Generate final comprehensive comparison report with actionable insights.
     Creates structured report with recommendations and visualizations.
@@ -610,12 +866,13 @@ class ReportGenerationNode(Node):
             "ai_analysis": shared.get("ai_analysis", ""),
             "decision_framework": shared.get("decision_framework", ""),
             "visualization_data": shared.get("visualization_data", {}),
-            "user_preferences": shared.get("user_preferences", {})
+            "user_preferences": shared.get("user_preferences", {}),
+            "budget": shared.get("request_budget")
         }
     
     def exec(self, prep_data):
         """Generate comprehensive final report."""
-        print(f"\n📋 Generating comprehensive comparison report...")
+        logger.info("📋 Generating comprehensive comparison report...", extra={"event": "report"})
         
         # Create structured report
         report = self._generate_structured_report(prep_data)
@@ -645,13 +902,10 @@ class ReportGenerationNode(Node):
         shared["action_items"] = exec_res["action_items"]
         
         # Display executive summary
-        print("\n" + "="*80)
-        print("🎯 OFFERCOMPARE PRO - EXECUTIVE SUMMARY")
-        print("="*80)
-        print(exec_res["executive_summary"])
-        print("\n" + "="*80)
-        
-        print("✅ Comprehensive analysis completed!")
+        banner = "=" * 80
+        logger.info("\n%s\n🎯 OFFERCOMPARE PRO - EXECUTIVE SUMMARY\n%s\n%s\n\n%s", banner, banner, exec_res["executive_summary"], banner,
+                    extra={"event": "executive_summary"})
+        logger.info("✅ Comprehensive analysis completed!", extra={"event": "report_done"})
         return "default"
     
     def _generate_structured_report(self, data):
@@ -697,6 +951,10 @@ class ReportGenerationNode(Node):
             "visualization_summary": data["visualization_data"].get("summary_stats", {})
         }
         
+        # Deadline/token budget and whatever was skipped or shortened to stay within it
+        if data.get("budget") is not None:
+            report["budget"] = data["budget"].to_dict()
+        
         return report
     
     def _generate_executive_summary(self, data):
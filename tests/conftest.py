@@ -39,6 +39,14 @@ def pytest_collection_modifyitems(config, items):
             item.add_marker(pytest.mark.unit)
 
 
+@pytest.fixture(autouse=True)
+def reset_provider_health():
+    """Start every test with closed provider circuits."""
+    from utils.provider_health import provider_health
+    provider_health.reset()
+    yield
+
+
 # Core fixtures
 @pytest.fixture
 def sample_offer() -> Dict[str, Any]:
@@ -228,6 +236,24 @@ def mock_api_calls(mock_llm_response, mock_structured_llm_response):
         yield
 
 
+@pytest.fixture
+def mock_flow_llm(mock_llm_response, mock_structured_llm_response):
+    """Mock every LLM entry point (including async wrappers) so full flows run offline."""
+    # Executor-based async wrappers pass arguments positionally
+    text = lambda prompt="", *args, **kwargs: mock_llm_response(prompt)
+    structured = lambda prompt="", *args, **kwargs: mock_structured_llm_response(prompt)
+    with patch('utils.call_llm.call_llm', side_effect=text) as core_llm, \
+         patch('utils.web_research.call_llm', side_effect=text) as research_llm, \
+         patch('utils.web_research.call_llm_structured', side_effect=structured) as research_structured, \
+         patch('utils.market_data.call_llm', side_effect=text) as market_llm:
+        yield {
+            "core": core_llm,
+            "research": research_llm,
+            "research_structured": research_structured,
+            "market": market_llm,
+        }
+
+
 # Temporary file fixtures
 @pytest.fixture
 def temp_dir():
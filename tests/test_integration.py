@@ -380,5 +380,581 @@ class TestPerformanceBenchmarks:
         assert avg_time < 0.005
 
 
+class TestBatchAnalysis:
+    """Test batch analysis entry points and research deduplication."""
+    
+    def _batch(self):
+        batch = []
+        for i in range(3):
+            data = get_sample_offers()
+            for offer in data["offers"]:
+                offer["base_salary"] += i * 1000
+            batch.append(data)
+        return batch
+    
+    def test_run_batch_analysis_dedupes_research(self, mock_flow_llm):
+        """Shared companies are researched once for the whole batch."""
+        import asyncio
+        from flow import run_batch_analysis
+        
+        async def collect():
+            return [item async for item in run_batch_analysis(self._batch(), max_concurrency=2)]
+        
+        results = asyncio.run(collect())
+        
+        assert sorted(index for index, _, _ in results) == [0, 1, 2]
+        assert all(error is None for _, _, error in results)
+        for _, shared, _ in results:
+            assert "final_report" in shared
+            assert "shared_work" not in shared
+        
+        # 3 unique companies: one research + one sentiment call each
+        assert mock_flow_llm["research"].call_count == 6
+        assert mock_flow_llm["research_structured"].call_count == 3
+    
+    def test_batch_file_accepts_api_shaped_rows(self, tmp_path):
+        """CLI batch rows get ids and totals like API requests; empty rows fail up front and set the exit code."""
+        import sys
+        from main import main
+
+        offers = [{k: v for k, v in offer.items() if k not in ("id", "total_compensation")}
+                  for offer in get_sample_offers()["offers"][:2]]
+        source, output = tmp_path / "requests.jsonl", tmp_path / "results.jsonl"
+        source.write_text(json.dumps({"offers": offers}) + "\n" + json.dumps({"offers": []}) + "\n")
+        env = {"OFFERCOMPARE_FAKE_LLM": "1", "OFFERCOMPARE_BATCH_FLUSH_SECONDS": "0.02",
+               "OFFERCOMPARE_BATCH_POLL_SECONDS": "0.01"}
+        with patch.dict(os.environ, env), \
+             patch.object(sys, "argv", ["main.py", "--batch", str(source), "--output", str(output)]):
+            assert main() == 1
+
+        lines = {line["index"]: line for line in map(json.loads, output.read_text().splitlines())}
+        assert lines[1] == {"index": 1, "status": "error", "error": "Offers list cannot be empty"}
+        assert lines[0]["status"] == "ok"
+        assert [offer["id"] for offer in lines[0]["result"]["offers"]] == ["offer_1", "offer_2"]
+        assert all(offer["total_compensation"] > offer["base_salary"] for offer in lines[0]["result"]["offers"])
+
+    def test_llm_batch_jobs_do_not_grow_with_offers(self):
+        """Each stage's per-offer calls share one batch job, however many offers an analysis has."""
+        import asyncio
+        from flow import prepare_analysis_input, run_batch_analysis
+        from utils.batch_llm import BatchCollector, LocalBatchBackend
+        
+        def jobs_for(offer_count):
+            data = get_sample_offers()
+            data["offers"] = data["offers"][:offer_count]
+            collector = BatchCollector({"fake": LocalBatchBackend()}, flush_seconds=0.2, poll_seconds=0.01)
+            
+            async def collect():
+                return [item async for item in run_batch_analysis([prepare_analysis_input(data)], 1,
+                                                                  llm_batch=collector)]
+            
+            results = asyncio.run(collect())
+            collector.close()
+            assert results[0][2] is None
+            return collector.jobs_submitted
+        
+        with patch.dict(os.environ, {"OFFERCOMPARE_FAKE_LLM": "1"}):
+            # research, structured research, sentiment, market analysis, AI analysis text
+            assert jobs_for(1) == 5
+            assert jobs_for(3) == 5
+    
+    def test_batch_endpoint_streams_json_lines(self, mock_flow_llm):
+        """Batch endpoint returns one JSON line per request, including invalid ones."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        client = TestClient(app)
+        payload = {"requests": self._batch()[:2] + [{"offers": []}], "max_concurrency": 2}
+        response = client.post("/api/analyze/batch", json=payload)
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        assert sorted(line["index"] for line in lines) == [0, 1, 2]
+        by_index = {line["index"]: line for line in lines}
+        assert by_index[2]["status"] == "error"
+        assert by_index[0]["status"] == "ok"
+        assert "executive_summary" in by_index[0]["result"]
+    
+    def test_batch_endpoint_rejects_empty_batch(self):
+        """Empty batches are rejected up front."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        response = TestClient(app).post("/api/analyze/batch", json={"requests": []})
+        assert response.status_code == 400
+
+    def test_batch_items_are_charged_queue_wait(self):
+        """Time the batch waited for admission comes off each item's deadline, as for single analyses."""
+        from unittest.mock import AsyncMock
+        from fastapi.testclient import TestClient
+        import api_server
+
+        seen = []
+
+        async def run_batch(batch, max_concurrency):
+            seen.extend(shared["deadline_seconds"] for shared in batch)
+            for i, shared in enumerate(batch):
+                yield i, shared, ValueError("not run")
+
+        ticket = MagicMock(wait_seconds=2.0, wait_ms=2000, slots=2)
+        requests = [dict(get_sample_offers(), deadline_seconds=10), dict(get_sample_offers(), deadline_seconds=30)]
+        with patch.object(api_server, "_admit", AsyncMock(return_value=ticket)), \
+             patch.object(api_server, "run_batch_analysis", run_batch):
+            response = TestClient(api_server.app).post("/api/analyze/batch", json={"requests": requests})
+
+        assert response.status_code == 200
+        assert seen == [8.0, 28.0]
+
+
+class TestRescore:
+    """Test re-scoring of a prior analysis under new preferences."""
+    
+    def _analyze(self, client):
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        response = client.post("/api/analyze", json=payload)
+        assert response.status_code == 200
+        return response.json()
+    
+    def test_rescore_by_analysis_id(self):
+        """New preferences re-rank cached offers without rerunning research."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        client = TestClient(app)
+        analysis = self._analyze(client)
+        assert analysis["analysis_id"]
+        
+        with patch('api_server.run_analysis', side_effect=AssertionError("flow must not run")):
+            response = client.post("/api/rescore", json={
+                "analysis_id": analysis["analysis_id"],
+                "user_preferences": {"salary_focused": True}
+            })
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["scoring_weights"]["base_salary"] > analysis["comparison_results"]["weights_used"]["base_salary"]
+        assert len(data["comparison_results"]["ranked_offers"]) == 3
+        assert "radar_chart" in data["visualization_data"]
+    
+    def test_rescore_with_offers_and_errors(self):
+        """Rescore accepts cached offers directly and validates its input."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        client = TestClient(app)
+        analysis = self._analyze(client)
+        
+        response = client.post("/api/rescore", json={"offers": analysis["offers"], "user_preferences": {}})
+        assert response.status_code == 200
+        
+        assert client.post("/api/rescore", json={"analysis_id": "missing"}).status_code == 404
+        assert client.post("/api/rescore", json={}).status_code == 400
+    
+    def test_rescore_offers_leaves_input_untouched(self):
+        """rescore_offers works on copies of the cached offers."""
+        from flow import rescore_offers
+        
+        offers = [{"id": "a", "company": "A", "base_salary": 100000, "score_data": {"total_score": 1}}]
+        result = rescore_offers(offers, {"balance_focused": True})
+        
+        assert offers[0]["score_data"] == {"total_score": 1}
+        assert result["offers"][0]["score_data"]["total_score"] != 1
+
+
+class TestResponseEncoding:
+    """Test compressed and deduplicated analysis responses."""
+    
+    def test_analyze_response_is_compressed_and_deduped(self):
+        """Large responses are gzipped and dedupe shrinks the body."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        client = TestClient(app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        
+        full = client.post("/api/analyze", json=payload, headers={"Accept-Encoding": "gzip"})
+        deduped = client.post("/api/analyze?dedupe=true", json=payload, headers={"Accept-Encoding": "gzip"})
+        
+        assert full.status_code == deduped.status_code == 200
+        assert full.headers["content-encoding"] == "gzip"
+        assert len(deduped.content) < len(full.content)
+        
+        data = deduped.json()
+        ranked = data["comparison_results"]["ranked_offers"]
+        for ranking in ranked:
+            index = int(ranking["offer_data"]["$ref"].rsplit("/", 1)[1])
+            assert data["offers"][index]["id"] == ranking["offer_id"]
+        assert full.json()["comparison_results"]["ranked_offers"][0]["offer_data"]["company"]
+    
+    def test_uncompressed_when_not_accepted(self):
+        """Clients that do not accept gzip get plain JSON."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        client = TestClient(app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        
+        response = client.post("/api/analyze", json=payload, headers={"Accept-Encoding": "identity"})
+        
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert response.json()["analysis_id"]
+
+
+class TestResponseProfiles:
+    """Test fields/profile selection on /api/analyze."""
+    
+    def test_summary_profile_skips_ai_text(self, mock_flow_llm):
+        """A summary response is pruned and the AI analysis calls are not made."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        client = TestClient(app)
+        response = client.post("/api/analyze?profile=summary", json=get_sample_offers())
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"analysis_id", "executive_summary", "comparison_results"}
+        assert set(data["comparison_results"]["ranked_offers"][0]) == {"offer_id", "company", "position", "total_score", "rating"}
+        assert mock_flow_llm["core"].call_count == 0
+        
+        client.post("/api/analyze", json=get_sample_offers())
+        assert mock_flow_llm["core"].call_count > 0
+    
+    def test_fields_select_charts(self):
+        """Only the requested charts are produced."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        
+        client = TestClient(app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        
+        response = client.post("/api/analyze?fields=visualization_data.radar_chart,executive_summary", json=payload)
+        
+        assert response.status_code == 200
+        assert set(response.json()["visualization_data"]) == {"radar_chart"}
+        assert "Score range" in response.json()["executive_summary"]
+        assert client.post("/api/analyze?profile=nope", json=payload).status_code == 400
+
+    def test_openapi_documents_full_shape_without_enforcing_it(self):
+        """AnalyzeResponse is documented for 200 along with the reduced shapes."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+
+        schema = TestClient(app).get("/openapi.json").json()
+        for path, method in (("/api/analyze", "post"), ("/api/demo", "get")):
+            ok = schema["paths"][path][method]["responses"]["200"]
+            assert ok["content"]["application/json"]["schema"]["$ref"].endswith("/AnalyzeResponse")
+            assert "?fields" in ok["description"] and "dedupe" in ok["description"]
+
+
+class TestAdmissionControl:
+    """Test load shedding on the analysis endpoints."""
+    
+    def test_overloaded_server_returns_503_with_retry_after(self):
+        """With no free slot and no queue room, requests are shed immediately."""
+        from fastapi.testclient import TestClient
+        import api_server
+        from utils.admission import AdmissionController
+        
+        client = TestClient(api_server.app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        
+        with patch.object(api_server, "admission", AdmissionController(max_concurrent=0, max_queue=0)), \
+             patch("api_server.run_analysis", side_effect=AssertionError("flow must not run")):
+            response = client.post("/api/analyze", json=payload)
+            batch = client.post("/api/analyze/batch", json={"requests": [payload]})
+        
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+        assert batch.status_code == 503
+    
+    def test_admitted_request_reports_queue_wait(self):
+        """Admitted responses carry the queue wait and release their slot."""
+        from fastapi.testclient import TestClient
+        import api_server
+        from utils.admission import AdmissionController
+        
+        client = TestClient(api_server.app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        
+        with patch.object(api_server, "admission", controller):
+            first = client.post("/api/analyze", json=payload)
+            batch = client.post("/api/analyze/batch", json={"requests": [payload]})
+            second = client.post("/api/analyze", json=payload)
+        
+        assert first.status_code == batch.status_code == second.status_code == 200
+        assert int(first.headers["x-queue-wait-ms"]) >= 0
+        assert controller.stats()["active"] == 0
+
+
+class TestMetricsEndpoint:
+    """Test the Prometheus /metrics endpoint."""
+    
+    def test_metrics_after_analysis(self):
+        """Requests, analyses and one latency series per node class are exported."""
+        from fastapi.testclient import TestClient
+        from api_server import app
+        import nodes
+        
+        client = TestClient(app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        assert client.post("/api/analyze", json=payload).status_code == 200
+        
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert 'offercompare_http_requests_total{method="POST",route="/api/analyze",status="200"}' in text
+        assert 'offercompare_analyses_total{status="ok"}' in text
+        assert "offercompare_analyses_in_flight 0" in text
+        for node in ["MarketResearchNode", "COLAdjustmentNode", "MarketBenchmarkingNode", "PreferenceScoringNode",
+                     "AIAnalysisNode", "VisualizationPreparationNode", "ReportGenerationNode"]:
+            assert f'offercompare_node_duration_seconds_count{{node="{node}"}}' in text
+
+
+class TestTracingIntegration:
+    """Test trace files written for analyses."""
+    
+    def test_trace_dir_writes_analysis_trace(self, temp_dir):
+        """Node lifecycle and LLM spans are linked parent to child, through worker threads."""
+        import asyncio
+        from flow import run_analysis
+        
+        env = {"OPENAI_API_KEY": "test", "OFFERCOMPARE_TRACE_DIR": temp_dir}
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value="Mocked analysis"):
+            asyncio.run(run_analysis(get_sample_offers()))
+        
+        files = os.listdir(temp_dir)
+        assert len(files) == 1
+        with open(os.path.join(temp_dir, files[0])) as f:
+            events = json.load(f)["traceEvents"]
+        
+        by_id = {e["args"]["span_id"]: e for e in events}
+        names = {e["name"] for e in events}
+        for expected in ["analysis", "MarketResearchNode", "MarketResearchNode.prep", "MarketResearchNode.exec",
+                         "ReportGenerationNode.post", "call_llm", "llm_request:openai"]:
+            assert expected in names
+        
+        research_llm = [e for e in events if e["name"] == "call_llm"
+                        and by_id[e["args"]["parent_id"]]["name"] == "MarketResearchNode.exec"]
+        assert research_llm
+        assert by_id[research_llm[0]["args"]["parent_id"]]["args"]["company"] in {"Google", "Microsoft", "Stripe"}
+        assert research_llm[0]["args"]["provider"] == "openai"
+
+
+class TestProfilingEndpoint:
+    """Test opt-in per-request profiling on the analysis endpoints."""
+    
+    def test_profiled_request_writes_artifacts(self, temp_dir):
+        """X-Profile produces a process-wide profile named after the (sanitized) request id."""
+        from dataclasses import replace
+        from fastapi.testclient import TestClient
+        import api_server
+        
+        client = TestClient(api_server.app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        config = replace(api_server._config, profiling_enabled=True, profile_dir=temp_dir)
+        
+        with patch.object(api_server, "_config", config):
+            response = client.post("/api/analyze", json=payload,
+                                   headers={"X-Profile": "1", "X-Request-Id": "../req 42"})
+            plain = client.get("/api/demo?profile=summary")
+        
+        assert response.status_code == 200
+        assert response.headers["x-request-id"] == "../req 42"
+        report_name = response.headers["x-profile-report"]
+        assert report_name.startswith("req_42-") and report_name.endswith(".txt")
+        assert response.headers["x-profile-scope"] == "process"
+        assert sorted(os.listdir(temp_dir)) == [report_name[:-4] + ".prof", report_name]
+        with open(os.path.join(temp_dir, report_name)) as f:
+            report = f.read()
+        assert "allocation sites" in report and "run_analysis" in report
+        assert "scope: process-wide" in report and "other_requests_at_start: 0" in report
+        assert "x-profile-report" not in plain.headers
+    
+    def test_profiling_disabled_or_busy(self, temp_dir):
+        """The flag is ignored unless enabled, and a concurrent profile gets 409."""
+        from dataclasses import replace
+        from fastapi.testclient import TestClient
+        import api_server
+        from utils.profiling import profile_run
+        
+        client = TestClient(api_server.app)
+        payload = get_sample_offers()
+        payload["analysis_mode"] = "deterministic"
+        
+        ignored = client.post("/api/analyze?profiling=true", json=payload)
+        assert ignored.status_code == 200
+        assert "x-profile-report" not in ignored.headers
+        
+        config = replace(api_server._config, profiling_enabled=True, profile_dir=temp_dir)
+        with patch.object(api_server, "_config", config), profile_run("other", temp_dir, memory=False):
+            busy = client.post("/api/analyze?profiling=true", json=payload)
+        assert busy.status_code == 409
+        assert api_server.admission.stats()["active"] == 0
+
+
+class TestUsageIntegration:
+    """Test LLM usage attached to analyses."""
+    
+    def test_analysis_reports_usage_per_node(self):
+        """The analyze response carries token/cost totals broken down by node."""
+        from fastapi.testclient import TestClient
+        import api_server
+        
+        client = TestClient(api_server.app)
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value="Mocked analysis"):
+            response = client.post("/api/analyze", json=get_sample_offers())
+            deterministic = client.post("/api/analyze", json={**get_sample_offers(), "analysis_mode": "deterministic"})
+        
+        assert response.status_code == 200
+        usage = response.json()["llm_usage"]
+        assert usage["calls"] > 0 and usage["estimated"]
+        assert {"MarketResearchNode", "AIAnalysisNode"} <= set(usage["by_node"])
+        assert usage["input_tokens"] == sum(n["input_tokens"] for n in usage["by_node"].values())
+        assert usage["cost_usd"] > 0
+        assert deterministic.json()["llm_usage"]["calls"] == 0
+
+
+class TestBudgetIntegration:
+    """Test per-request budgets on the analyze endpoint."""
+    
+    def test_spent_budget_degrades_gracefully(self):
+        """A spent token budget still yields a full report, listing what was skipped."""
+        from fastapi.testclient import TestClient
+        import api_server
+        
+        client = TestClient(api_server.app)
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value="Mocked analysis"):
+            response = client.post("/api/analyze", json={**get_sample_offers(), "token_budget": 1})
+            unlimited = client.post("/api/analyze", json=get_sample_offers())
+            invalid = client.post("/api/analyze", json={**get_sample_offers(), "deadline_seconds": 0})
+        
+        assert response.status_code == 200
+        body = response.json()
+        budget = body["final_report"]["budget"]
+        actions = {d["action"] for d in budget["degradations"]}
+        assert budget["degraded"] and budget["token_budget"] == 1
+        assert {"offline_research", "skip_sentiment", "deterministic_analysis"} <= actions
+        assert body["comparison_results"]["ranked_offers"]
+        assert body["llm_usage"]["calls"] < unlimited.json()["llm_usage"]["calls"]
+        assert not unlimited.json()["final_report"]["budget"]["degraded"]
+        assert invalid.status_code == 422
+
+
+class TestPipelineBenchmark:
+    """Test the pipeline benchmark suite."""
+    
+    def test_pipeline_benchmark_smoke(self, temp_dir):
+        """A tiny run reports every metric and does not leak the fake environment."""
+        from benchmarks.pipeline import run_pipeline_benchmark, main
+        
+        before = dict(os.environ)
+        data = run_pipeline_benchmark(analyses=2, concurrency_levels=(1, 2), latency_ms=0, jitter_ms=0)
+        
+        assert dict(os.environ) == before
+        assert set(data["results"]) == {"concurrency_1", "concurrency_2"}
+        level = data["results"]["concurrency_2"]
+        assert level["errors"] == 0
+        assert level["llm_calls_per_analysis"] > 0
+        assert level["latency_ms"]["p50"] > 0
+        assert level["peak_memory_mb"] > 0
+        
+        baseline = os.path.join(temp_dir, "baseline.json")
+        args = ["--analyses", "1", "--concurrency", "1", "--latency-ms", "0", "--jitter-ms", "0", "--no-memory"]
+        assert main(args + ["--output", baseline]) == 0
+        assert main(args + ["--compare", baseline, "--threshold", "1000"]) == 0
+    
+    def test_compare_results_flags_regressions(self):
+        """Changes in the wrong direction beyond the threshold are regressions."""
+        from benchmarks.results import compare_results
+        
+        baseline = {"results": {"c1": {"latency_ms": {"p50": 100}, "throughput_per_s": 10, "errors": 0}}}
+        current = {"results": {"c1": {"latency_ms": {"p50": 105}, "throughput_per_s": 5, "errors": 1},
+                               "new_case": {"throughput_per_s": 1}}}
+        directions = {"latency_ms.p50": "lower", "throughput_per_s": "higher", "errors": "lower"}
+        
+        report = {row["metric"]: row for row in compare_results(baseline, current, directions, threshold=0.1)}
+        
+        assert not report["latency_ms.p50"]["regression"]
+        assert report["throughput_per_s"]["regression"]
+        assert report["errors"]["regression"]
+        assert len(report) == 3
+
+
+class TestMicroBenchmarks:
+    """Test the micro-benchmark harness for the pure-Python utilities."""
+    
+    def test_micro_benchmark_smoke(self):
+        """Every case runs at each size and reports throughput and allocations."""
+        from benchmarks.micro import CASES, run_micro_benchmarks, synthetic_offers
+        
+        assert synthetic_offers(5, seed=1) == synthetic_offers(5, seed=1)
+        data = run_micro_benchmarks(sizes=(1, 10), min_time=0)
+        
+        assert set(data["results"]) == {f"{name}[{size}]" for name in CASES for size in (1, 10)}
+        for case in data["results"].values():
+            assert case["ops_per_s"] > 0
+            assert case["peak_alloc_kb"] > 0
+    
+    def test_micro_benchmark_regression_gate(self, temp_dir):
+        """--compare exits non-zero when a case slows down beyond the threshold."""
+        from benchmarks.micro import main
+        from benchmarks.results import load_results, save_results
+        
+        baseline = os.path.join(temp_dir, "micro.json")
+        args = ["--sizes", "10", "--only", "compare_offers", "--min-time", "0", "--no-memory"]
+        assert main(args + ["--output", baseline]) == 0
+        
+        data = load_results(baseline)
+        data["results"]["compare_offers[10]"]["ops_per_s"] *= 100
+        save_results(baseline, data)
+        assert main(args + ["--compare", baseline]) == 1
+
+
+class TestStartupBenchmark:
+    """Test the cold-start import benchmark and lazy module-level work."""
+    
+    def test_startup_benchmark_smoke(self):
+        """Modules are imported in fresh interpreters and their import time is reported."""
+        from benchmarks.startup import parse_importtime, run_startup_benchmark
+        
+        rows = parse_importtime("import time: self [us] | cumulative | imported package\n"
+                                "import time:       120 |        450 |   utils.config\n")
+        assert rows == [("utils.config", 0.12, 0.45)]
+        
+        data = run_startup_benchmark(["flow"], runs=1)
+        result = data["results"]["import[flow]"]
+        assert data["suite"] == "startup"
+        assert 0 < result["import_ms"] <= result["process_ms"]
+        assert result["heaviest"] and result["modules_imported"] > 10
+    
+    def test_flow_instance_is_built_lazily(self):
+        """Importing flow builds no flow; the module attribute is created on first access."""
+        import flow
+        
+        flow.__dict__.pop("offer_comparison_flow", None)
+        assert "offer_comparison_flow" not in vars(flow)
+        instance = flow.offer_comparison_flow
+        assert flow.offer_comparison_flow is instance
+        with pytest.raises(AttributeError):
+            flow.not_a_flow
+
+
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"]) 
\ No newline at end of file
+    pytest.main([__file__, "-v"])
@@ -500,6 +500,48 @@ class TestNodeIntegration:
         assert offer["company_research"]["analysis"] == "test"
 
 
+class TestDeterministicMode:
+    """Test the LLM-free deterministic analysis mode."""
+    
+    @patch('utils.call_llm.call_llm', side_effect=AssertionError("LLM must not be called"))
+    @patch('utils.web_research.call_llm', side_effect=AssertionError("LLM must not be called"))
+    @patch('utils.market_data.call_llm', side_effect=AssertionError("LLM must not be called"))
+    def test_full_analysis_without_llm(self, *_mocks):
+        """Deterministic mode completes the whole analysis without any LLM call."""
+        import asyncio
+        import time
+        from flow import get_sample_offers, run_analysis
+        
+        shared = get_sample_offers()
+        shared["analysis_mode"] = "deterministic"
+        
+        start_time = time.perf_counter()
+        asyncio.run(run_analysis(shared))
+        elapsed = time.perf_counter() - start_time
+        
+        assert elapsed < 1.0
+        ranked = shared["comparison_results"]["ranked_offers"]
+        assert len(ranked) == 3
+        assert shared["ai_analysis"] == ""
+        assert "radar_chart" in shared["visualization_data"]
+        for offer in shared["offers"]:
+            assert offer["company_research"]["data_source"] in ("company database", "industry defaults")
+            assert offer["ai_market_analysis"] is None
+            assert offer["ai_recommendation"]
+    
+    def test_deterministic_recommendation_follows_rating(self):
+        """Recommendations are derived from the offer rating."""
+        node = AIAnalysisNode()
+        result = node._deterministic_analysis([
+            {"id": "a", "score_data": {"rating": "Excellent", "top_strengths": [{"factor": "career_growth", "score": 90}]}},
+            {"id": "b", "score_data": {"rating": "Below Average"}}
+        ])
+        
+        assert result["offer_recommendations"][0]["recommendation"].startswith("Strongly Recommended")
+        assert "career growth" in result["offer_recommendations"][0]["recommendation"]
+        assert result["offer_recommendations"][1]["recommendation"] == "Not Recommended"
+
+
 # Test fixtures
 @pytest.fixture
 def sample_shared_data():
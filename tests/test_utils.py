@@ -3,6 +3,7 @@ OfferCompare Pro - Utility Functions Tests
 Comprehensive test coverage for all utility modules
 """
 
+import asyncio
 import pytest
 import json
 import os
@@ -42,7 +43,14 @@ from utils.viz_formatter import (
     format_comparison_table,
     generate_colors
 )
-from utils.web_research import research_company, get_market_sentiment
+from utils.web_research import research_company, get_market_sentiment, research_company_offline
+from utils import serialization
+from utils.metrics import Registry, CACHE_REQUESTS, LLM_ERRORS, LLM_LATENCY
+from utils.tracing import start_trace, span, set_attributes, current_trace
+from utils.log import configure_logging, get_logger, JsonFormatter
+from utils import fake_llm
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.response_fields import resolve_fields, select_fields, needs_ai_text, selected_charts
 
 
 class TestCallLLM:
@@ -391,6 +399,15 @@ class TestVizFormatter:
         assert "salary_comparison" in result
         assert "comparison_table" in result
         assert "summary_stats" in result
+    
+    def test_create_visualization_package_chart_subset(self):
+        """Only requested charts are built; summary stats are always present."""
+        offers = [{"company": "Company A", "base_salary": 150000, "total_score": 85, "factor_scores": {}}]
+        
+        result = create_visualization_package(offers, charts=["radar_chart"])
+        
+        assert set(result) == {"radar_chart", "summary_stats"}
+        assert set(create_visualization_package(offers, charts=[])) == {"summary_stats"}
 
 
 class TestWebResearch:
@@ -441,6 +458,1203 @@ class TestWebResearch:
         assert "analysis_timestamp" in result
 
 
+class TestOfflineResearch:
+    """Test LLM-free company research."""
+    
+    def test_known_company_uses_database(self):
+        """Known companies take scores from the company database."""
+        result = research_company_offline("Google", "Software Engineer")
+        
+        assert result["data_source"] == "company database"
+        assert result["metrics"]["wlb_score"]["score"] == get_company_data("Google")["culture_metrics"]["work_life_balance"]
+        assert result["metrics"]["stability_score"]["score"] == 9
+        for key in ["culture_score", "growth_score", "benefits_score", "key_strengths"]:
+            assert key in result["metrics"]
+    
+    def test_unknown_company_uses_defaults(self):
+        """Unknown companies fall back to stage default metrics."""
+        result = research_company_offline("Unknown Startup XYZ")
+        
+        assert result["data_source"] == "industry defaults"
+        assert 1 <= result["metrics"]["culture_score"]["score"] <= 10
+        assert result["metrics"]["potential_concerns"] == ["Limited data available"]
+
+
+class TestSerialization:
+    """Test API response serialization, compression and offer dedupe."""
+    
+    def test_dumps_with_and_without_orjson(self):
+        """Both encoders produce equivalent compact JSON."""
+        data = {"a": 1.5, "b": [1, "x"], "c": None}
+        fast = serialization.dumps(data)
+        with patch.object(serialization, "orjson", None):
+            plain = serialization.dumps(data)
+        
+        assert json.loads(fast) == json.loads(plain) == data
+        assert b" " not in plain
+    
+    def test_negotiate_encoding(self):
+        """gzip is chosen when accepted; brotli only when the module is installed."""
+        assert serialization.negotiate_encoding(None) is None
+        assert serialization.negotiate_encoding("identity") is None
+        assert serialization.negotiate_encoding("gzip;q=0, deflate") is None
+        with patch.object(serialization, "brotli", None):
+            assert serialization.negotiate_encoding("br, gzip") == "gzip"
+        with patch.object(serialization, "brotli", MagicMock()):
+            assert serialization.negotiate_encoding("gzip, br;q=1.0") == "br"
+    
+    def test_encode_json_body_compresses_large_payloads(self):
+        """Bodies under min_size are sent as-is."""
+        import gzip
+        
+        small, headers = serialization.encode_json_body({"a": 1}, "gzip", min_size=1024)
+        assert small == b'{"a":1}' and "Content-Encoding" not in headers
+        
+        data = {"text": "x" * 5000}
+        body, headers = serialization.encode_json_body(data, "gzip", min_size=1024)
+        assert headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(body)) == data
+    
+    def test_dedupe_offer_refs(self):
+        """Ranked offers point back at payload offers and the input is untouched."""
+        offers = [{"id": "a", "company": "A"}, {"id": "b", "company": "B"}]
+        ranked = [
+            {"offer_id": "b", "offer_data": offers[1]},
+            {"offer_id": "a", "offer_data": offers[0]},
+        ]
+        payload = {"offers": offers, "comparison_results": {"ranked_offers": ranked, "top_offer": ranked[0]}}
+        
+        result = serialization.dedupe_offer_refs(payload)
+        
+        assert result["comparison_results"]["ranked_offers"][0]["offer_data"] == {"$ref": "#/offers/1"}
+        assert result["comparison_results"]["ranked_offers"][1]["offer_data"] == {"$ref": "#/offers/0"}
+        assert result["comparison_results"]["top_offer"] == {"$ref": "#/comparison_results/ranked_offers/0"}
+        assert payload["comparison_results"]["ranked_offers"][0]["offer_data"] is offers[1]
+
+
+class TestResponseFields:
+    """Test response field selection and the work it lets the flow skip."""
+    
+    def test_resolve_fields(self):
+        """Profiles and field lists combine; full and empty mean everything."""
+        assert resolve_fields() is None
+        assert resolve_fields(profile="full") is None
+        assert resolve_fields("executive_summary, offers.company") == ["executive_summary", "offers.company", "analysis_id"]
+        assert "comparison_results.ranked_offers.total_score" in resolve_fields("offers", "summary")
+        with pytest.raises(ValueError):
+            resolve_fields(profile="tiny")
+    
+    def test_select_fields_traverses_lists(self):
+        """Nested paths prune every list element and ignore missing keys."""
+        payload = {
+            "executive_summary": "s",
+            "final_report": {"detailed_analysis": "long"},
+            "comparison_results": {"ranked_offers": [{"company": "A", "total_score": 1, "offer_data": {}}]},
+        }
+        
+        result = select_fields(payload, ["executive_summary", "comparison_results.ranked_offers.company", "missing"])
+        
+        assert result == {"executive_summary": "s", "comparison_results": {"ranked_offers": [{"company": "A"}]}}
+        assert select_fields(payload, None) is payload
+    
+    def test_selection_hints(self):
+        """AI text and charts are only needed when a selected path reaches them."""
+        assert needs_ai_text(None)
+        assert needs_ai_text(["final_report"])
+        assert needs_ai_text(["offers.ai_recommendation"])
+        assert not needs_ai_text(resolve_fields(profile="dashboard"))
+        
+        assert selected_charts(None) is None
+        assert selected_charts(["visualization_data"]) is None
+        assert selected_charts(["visualization_data.radar_chart.data", "offers"]) == ["radar_chart"]
+        assert selected_charts(["executive_summary"]) == []
+
+
+class TestAdmissionController:
+    """Test concurrency caps, the bounded wait queue and per-client limits."""
+    
+    def test_queued_request_gets_released_slot(self):
+        """A waiting request is admitted when a running one releases, and reports its wait."""
+        import asyncio
+        
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout_seconds=1)
+            first = await controller.acquire("a")
+            waiting = asyncio.ensure_future(controller.acquire("b"))
+            await asyncio.sleep(0.02)
+            assert controller.stats()["queued"] == 1
+            
+            with pytest.raises(AdmissionRejected) as rejected:
+                await controller.acquire("c")
+            assert rejected.value.status_code == 503
+            assert rejected.value.retry_after >= 1
+            
+            first.release()
+            first.release()  # idempotent
+            second = await waiting
+            assert second.wait_ms >= 10
+            assert controller.stats()["active"] == 1
+            second.release()
+            return controller.stats()
+        
+        stats = asyncio.run(scenario())
+        assert stats["active"] == 0 and stats["queued"] == 0 and stats["rejected"] == 1
+    
+    def test_queue_timeout_and_client_limit(self):
+        """Waiting too long gives 503; too many requests from one client gives 429."""
+        import asyncio
+        
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout_seconds=0.01, max_per_client=1)
+            ticket = await controller.acquire("a")
+            
+            with pytest.raises(AdmissionRejected) as limited:
+                await controller.acquire("a")
+            assert limited.value.status_code == 429
+            
+            with pytest.raises(AdmissionRejected) as timed_out:
+                await controller.acquire("b")
+            assert timed_out.value.status_code == 503
+            
+            ticket.release()
+            (await controller.acquire("b")).release()
+            return controller.stats()
+        
+        stats = asyncio.run(scenario())
+        assert stats["active"] == 0 and stats["queued"] == 0
+
+    def test_multi_slot_request_counts_in_full(self):
+        """A batch holding several slots blocks others until it releases them all; FIFO is kept."""
+        import asyncio
+
+        async def scenario():
+            controller = AdmissionController(max_concurrent=4, max_queue=4, queue_timeout_seconds=1)
+            batch = await controller.acquire("b", slots=3)
+            assert batch.slots == 3 and controller.stats()["active"] == 3
+            wide = asyncio.ensure_future(controller.acquire("c", slots=2))
+            await asyncio.sleep(0.01)
+            narrow = asyncio.ensure_future(controller.acquire("d"))
+            await asyncio.sleep(0.01)
+            # One slot is free, but the wide request is ahead of the narrow one
+            assert controller.stats()["queued"] == 2 and not narrow.done()
+
+            batch.release()
+            wide_ticket, narrow_ticket = await wide, await narrow
+            assert wide_ticket.slots == 2 and controller.stats()["active"] == 3
+            assert controller.stats()["admitted"] == 2
+            wide_ticket.release()
+            narrow_ticket.release()
+
+            capped = await controller.acquire("e", slots=32)
+            assert capped.slots == 4
+            capped.release()
+            return controller.stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["active"] == 0 and stats["queued"] == 0
+
+
+class TestMetrics:
+    """Test the Prometheus text-format metrics registry and its instrumentation."""
+    
+    def test_render_counter_gauge_histogram(self):
+        """Metrics render with HELP/TYPE lines, labels and cumulative buckets."""
+        registry = Registry()
+        requests = registry.counter("test_requests_total", "Requests.", ["route"])
+        in_flight = registry.gauge("test_in_flight", "In flight.")
+        latency = registry.histogram("test_latency_seconds", "Latency.", ["node"], buckets=(0.1, 1.0))
+        
+        requests.inc(route="/a")
+        requests.inc(2, route="/a")
+        in_flight.inc()
+        latency.observe(0.1, node="N")
+        latency.observe(0.5, node="N")
+        latency.observe(5, node="N")
+        
+        text = registry.render()
+        assert "# TYPE test_requests_total counter" in text
+        assert 'test_requests_total{route="/a"} 3' in text
+        assert "test_in_flight 1" in text
+        assert 'test_latency_seconds_bucket{node="N",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{node="N",le="1"} 2' in text
+        assert 'test_latency_seconds_bucket{node="N",le="+Inf"} 3' in text
+        assert 'test_latency_seconds_count{node="N"} 3' in text
+        
+        with pytest.raises(ValueError):
+            requests.inc(path="/a")
+        with pytest.raises(ValueError):
+            registry.counter("test_requests_total", "Duplicate.")
+    
+    def test_cache_lookups_are_counted(self, temp_dir):
+        """cached_call records a miss then a hit for the same key."""
+        from utils.cache import cached_call
+        
+        namespace = "metrics_test"
+        with patch.dict(os.environ, {"OFFERCOMPARE_CACHE_DIR": temp_dir}):
+            for _ in range(2):
+                cached_call(namespace, 60, ["key"])(lambda: "value")()
+        
+        assert CACHE_REQUESTS.value(namespace=namespace, result="miss") == 1
+        assert CACHE_REQUESTS.value(namespace=namespace, result="hit") == 1
+    
+    def test_llm_latency_and_errors_by_provider(self):
+        """Provider calls are timed and failures counted per provider and model."""
+        env = {"OPENAI_API_KEY": "test"}
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value="ok"):
+            call_llm("hi", model="metrics-model")
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", side_effect=Exception("boom")):
+            with pytest.raises(Exception):
+                call_llm("hi", model="metrics-model")
+        
+        assert LLM_LATENCY.count(provider="openai", model="metrics-model") == 2
+        assert LLM_ERRORS.value(provider="openai", model="metrics-model") == 1
+
+
+class TestTracing:
+    """Test tracing spans and their export."""
+    
+    def test_spans_nest_and_export(self):
+        """Spans record parents, attributes and errors; exports include every span."""
+        with start_trace("run", offers=2) as trace:
+            with span("outer", company="A"):
+                with span("inner") as inner:
+                    inner.set(cache_hit=True)
+                with pytest.raises(ValueError):
+                    with span("failing"):
+                        raise ValueError("bad")
+                set_attributes(note="outer")
+        
+        spans = {s["name"]: s for s in trace.to_dict()["spans"]}
+        assert spans["outer"]["parent_id"] == spans["run"]["span_id"]
+        assert spans["inner"]["parent_id"] == spans["outer"]["span_id"]
+        assert spans["inner"]["attributes"] == {"cache_hit": True}
+        assert spans["outer"]["attributes"] == {"company": "A", "note": "outer"}
+        assert spans["failing"]["attributes"]["error"] == "ValueError: bad"
+        
+        events = trace.to_chrome_trace()["traceEvents"]
+        assert {e["name"] for e in events} == {"run", "outer", "inner", "failing"}
+        assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    
+    def test_noop_without_trace_and_async_propagation(self):
+        """span() is inert outside a trace; spans in worker threads keep their parent."""
+        import asyncio
+        
+        assert current_trace() is None
+        with span("ignored") as ignored:
+            ignored.set(x=1)
+        
+        def work():
+            with span("in_thread"):
+                pass
+        
+        async def run():
+            with span("parent"):
+                await asyncio.to_thread(work)
+        
+        with start_trace("async") as trace:
+            asyncio.run(run())
+        
+        spans = {s["name"]: s for s in trace.to_dict()["spans"]}
+        assert spans["in_thread"]["parent_id"] == spans["parent"]["span_id"]
+
+
+class TestLogging:
+    """Test CLI and server logging configuration."""
+    
+    def teardown_method(self):
+        import logging
+        from utils import log
+        log._stop_listener()
+        logging.getLogger(log.ROOT_LOGGER).handlers.clear()
+    
+    def test_json_formatter_includes_extra_fields(self):
+        """Structured records carry their extra fields."""
+        import logging
+        record = logging.LogRecord("offercompare.nodes", logging.INFO, __file__, 1, "Research for %s", ("Google",), None)
+        record.company = "Google"
+        
+        data = json.loads(JsonFormatter().format(record))
+        
+        assert data["message"] == "Research for Google"
+        assert data["level"] == "INFO"
+        assert data["company"] == "Google"
+    
+    def test_cli_mode_prints_plain_messages(self, capsys):
+        """The CLI keeps friendly, unadorned progress lines on stdout."""
+        configure_logging("cli")
+        get_logger("nodes").info("✅ Done %d", 3, extra={"event": "done"})
+        
+        assert capsys.readouterr().out == "✅ Done 3\n"
+    
+    def test_server_mode_is_queued_json_and_filters_info(self, capsys):
+        """Server logs go through the queue listener as JSON; INFO is off by default."""
+        from utils import log
+        
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("OFFERCOMPARE_LOG_LEVEL", None)
+            os.environ.pop("OFFERCOMPARE_LOG_FORMAT", None)
+            logger = configure_logging("server")
+        assert any(type(h).__name__ == "QueueHandler" for h in logger.handlers)
+        
+        get_logger("nodes").info("progress")
+        get_logger("call_llm").warning("fallback", extra={"provider": "openai"})
+        log._stop_listener()  # flushes the queue
+        
+        lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+        assert lines == [{"ts": lines[0]["ts"], "level": "WARNING", "logger": "offercompare.call_llm",
+                          "message": "fallback", "provider": "openai"}]
+
+    def test_api_server_configures_logging_at_startup_not_import(self):
+        """Importing the app leaves logging as the importer set it; server startup installs server logging."""
+        import subprocess
+        import sys
+        from dataclasses import replace
+        from fastapi.testclient import TestClient
+
+        script = ("import logging, api_server; from utils.log import ROOT_LOGGER; "
+                  "print(len(logging.getLogger(ROOT_LOGGER).handlers))")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        imported = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True)
+        assert imported.stdout.strip() == "0"
+
+        import api_server
+        with patch.object(api_server, "_config", replace(api_server._config, prewarm_providers=False)), \
+             patch("api_server.configure_logging") as configure:
+            with TestClient(api_server.app):
+                pass
+        configure.assert_called_once_with("server")
+
+
+class TestFakeLLM:
+    """Test the deterministic fake LLM provider."""
+    
+    def teardown_method(self):
+        fake_llm.configure_fake_llm()
+    
+    def test_deterministic_responses(self):
+        """Same prompt, same answer; JSON prompts get parseable research metrics."""
+        fake_llm.configure_fake_llm()
+        
+        assert fake_llm.call_llm_fake("hello") == fake_llm.call_llm_fake("hello")
+        assert fake_llm.call_llm_fake("hello") != fake_llm.call_llm_fake("other")
+        metrics = json.loads(fake_llm.call_llm_fake("Return culture_score in JSON"))
+        assert 1 <= metrics["culture_score"]["score"] <= 10
+        assert fake_llm.call_count() == 5
+    
+    def test_latency_and_failures(self):
+        """Configured latency is applied and failure_rate=1 always raises."""
+        import time
+        
+        fake_llm.configure_fake_llm(latency_ms=20)
+        started = time.perf_counter()
+        fake_llm.call_llm_fake("slow")
+        assert time.perf_counter() - started >= 0.02
+        
+        fake_llm.configure_fake_llm(failure_rate=1.0)
+        with pytest.raises(Exception, match="simulated"):
+            fake_llm.call_llm_fake("fail")
+    
+    def test_registered_as_provider(self):
+        """call_llm routes to the fake provider when it is enabled and selected."""
+        fake_llm.configure_fake_llm()
+        with patch.dict(os.environ, {"OFFERCOMPARE_FAKE_LLM": "1", "DEFAULT_AI_PROVIDER": "fake"}, clear=True):
+            assert "fake" in get_provider_info()["available_providers"]
+            assert "Simulated analysis" in call_llm("hi")
+
+    def test_real_keys_are_ignored_while_enabled(self):
+        """With API keys also set, calls (even failing ones) never reach a real provider."""
+        fake_llm.configure_fake_llm(failure_rate=1.0)
+        env = {"OPENAI_API_KEY": "test", "GEMINI_API_KEY": "test", "OFFERCOMPARE_FAKE_LLM": "1",
+               "OFFERCOMPARE_LLM_MAX_RETRIES": "0"}
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value="online") as openai, \
+             patch("utils.call_llm.call_llm_gemini", return_value="online") as gemini:
+            assert get_provider_info()["available_providers"] == ["fake"]
+            with pytest.raises(Exception, match="simulated"):
+                call_llm("hi", provider="openai")
+        assert not openai.called and not gemini.called
+
+
+class TestOfferGenerator:
+    """Test the synthetic offer generator."""
+    
+    def test_seeded_and_drawn_from_reference_data(self):
+        """Same seed, same offers; fields come from the market, COL and company tables."""
+        from utils.offer_generator import generate_offers, LOCATIONS, POSITIONS, KNOWN_COMPANIES
+        
+        offers = generate_offers(300, seed=7)
+        assert offers == generate_offers(300, seed=7)
+        assert offers != generate_offers(300, seed=8)
+        
+        unknown = [o for o in offers if o["company"] not in KNOWN_COMPANIES]
+        assert 0 < len(unknown) < len(offers)
+        for offer in offers:
+            assert offer["position"] in POSITIONS
+            assert offer["location"] in LOCATIONS
+            assert offer["base_salary"] > 0
+            assert offer["total_compensation"] == offer["base_salary"] + offer["equity"] + offer["bonus"]
+        assert len({o["id"] for o in offers}) == len(offers)
+    
+    def test_jsonl_export(self, tmp_path):
+        """The CLI writes one analysis input per line that reads back unchanged."""
+        from utils.offer_generator import main, read_jsonl, iter_offer_sets
+        
+        path = str(tmp_path / "sets.jsonl")
+        assert main(["--sets", "5", "--offers-per-set", "2", "--seed", "3", "--output", path]) == 0
+        
+        records = list(read_jsonl(path))
+        assert records == list(iter_offer_sets(5, 2, seed=3))
+        assert all(len(r["offers"]) == 2 and "user_preferences" in r for r in records)
+
+
+class TestProfiling:
+    """Test the profile_run context manager."""
+    
+    def test_profile_run_writes_reports(self, tmp_path):
+        """cProfile stats and a text report are written; tracemalloc is left as found."""
+        import pstats
+        import tracemalloc
+        from utils.profiling import ProfilerBusy, profile_run
+        
+        with profile_run("unit/test", str(tmp_path), top_n=5, engine="cprofile") as report:
+            compare_offers([{"company": "A", "location": "Remote"}, {"company": "B"}])
+            with pytest.raises(ProfilerBusy):
+                with profile_run("nested", str(tmp_path)):
+                    pass
+        
+        assert report.tag == "unit_test" and report.name.startswith("unit_test-")
+        assert report.wall_ms > 0 and report.peak_alloc_kb > 0
+        assert pstats.Stats(report.profile_path).total_calls > 0
+        with open(report.report_path) as f:
+            assert "compare_offers" in f.read()
+        assert not tracemalloc.is_tracing()
+        
+        with pytest.raises(ValueError):
+            with profile_run("x", str(tmp_path), engine="nonexistent"):
+                pass
+        
+        # A reused tag gets new artifacts instead of overwriting the previous ones
+        with profile_run("unit/test", str(tmp_path), engine="cprofile", memory=False) as again:
+            pass
+        assert again.report_path != report.report_path and os.path.exists(report.report_path)
+
+
+class TestUsageAccounting:
+    """Test the per-analysis LLM usage ledger."""
+    
+    def test_reported_usage_and_cost(self):
+        """Provider-reported tokens are priced per model and attributed to the current node."""
+        from utils.usage import node_scope, report_provider_usage, usage_ledger
+        from utils.metrics import LLM_TOKENS
+        
+        def fake_openai(prompt, model, *args):
+            report_provider_usage(1000, 500)
+            return "answer"
+        
+        before = LLM_TOKENS.value(provider="openai", model="gpt-4o", node="ScoringNode", direction="input")
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), \
+             patch("utils.call_llm.call_llm_openai", side_effect=fake_openai), \
+             usage_ledger() as outer, usage_ledger() as inner, node_scope("ScoringNode"):
+            call_llm("prompt")
+        
+        summary = inner.summary(include_records=True)
+        assert summary["calls"] == 1 and not summary["estimated"]
+        assert summary["input_tokens"] == 1000 and summary["output_tokens"] == 500
+        assert summary["cost_usd"] == pytest.approx((1000 * 2.5 + 500 * 10) / 1e6)
+        assert list(summary["by_node"]) == ["ScoringNode"]
+        assert list(summary["by_model"]) == ["openai/gpt-4o"]
+        assert outer.summary()["calls"] == 1
+        assert LLM_TOKENS.value(provider="openai", model="gpt-4o", node="ScoringNode",
+                                direction="input") == before + 1000
+    
+    def test_estimates_errors_and_cache_hits(self, tmp_path):
+        """Unreported usage is estimated, failures are counted and cache hits cost nothing."""
+        from utils.usage import usage_ledger
+        
+        env = {"OPENAI_API_KEY": "test", "OFFERCOMPARE_ENABLE_CACHE": "1", "OFFERCOMPARE_CACHE_DIR": str(tmp_path)}
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value="x" * 40), usage_ledger() as ledger:
+            call_llm("a" * 400)
+            call_llm("a" * 400)
+        
+        summary = ledger.summary()
+        assert summary["calls"] == 2 and summary["cached_calls"] == 1
+        assert summary["estimated"]
+        assert summary["input_tokens"] == 100 and summary["output_tokens"] == 10
+        assert summary["by_node"]["unknown"]["calls"] == 2
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), \
+             patch("utils.call_llm.call_llm_openai", side_effect=Exception("boom")), usage_ledger() as failed:
+            with pytest.raises(Exception):
+                call_llm("prompt")
+        assert failed.summary()["errors"] == 1
+
+
+class TestRequestBudget:
+    """Test per-analysis deadline and token budgets."""
+    
+    def test_token_budget_from_ledger(self):
+        """Billed tokens count against the budget; cache hits do not."""
+        from utils.budget import RequestBudget
+        from utils.usage import UsageLedger, UsageRecord
+        
+        ledger = UsageLedger()
+        budget = RequestBudget(token_budget=100, ledger=ledger)
+        assert budget.limited and not budget.low() and not budget.exhausted()
+        
+        ledger.add(UsageRecord("openai", "gpt-4o", "n", 500, 500, 1.0, 0.0, cached=True))
+        ledger.add(UsageRecord("openai", "gpt-4o", "n", 40, 20, 1.0, 0.0))
+        assert budget.tokens_used() == 60 and budget.low() and not budget.exhausted()
+        
+        ledger.add(UsageRecord("openai", "gpt-4o", "n", 40, 0, 1.0, 0.0))
+        assert budget.exhaustion_reason() == "token budget spent"
+        assert not RequestBudget().limited and not RequestBudget().low()
+    
+    def test_run_within_budget_falls_back(self):
+        """Calls past the deadline return the fallback and record the degradation."""
+        from utils.budget import RequestBudget, run_within_budget
+        
+        async def slow():
+            await asyncio.sleep(1)
+            return "llm"
+        
+        budget = RequestBudget(deadline_seconds=0.05)
+        result = asyncio.run(run_within_budget(budget, "Node", "use_default", slow, lambda: "default", offer_id="o1"))
+        assert result == "default"
+        assert budget.exhausted()
+        
+        skipped = asyncio.run(run_within_budget(budget, "Node", "use_default", slow, lambda: "again"))
+        assert skipped == "again"
+        report = budget.to_dict()
+        assert report["degraded"] and len(report["degradations"]) == 2
+        assert report["degradations"][0]["offer_id"] == "o1"
+        assert report["degradations"][0]["reason"] == "deadline reached"
+        assert asyncio.run(run_within_budget(None, "Node", "x", slow, lambda: "unused")) == "llm"
+
+
+class TestProviderHealth:
+    """Test the provider circuit breaker and health-based fallback order."""
+    
+    def test_open_circuit_routes_to_fallback(self):
+        """After enough failures the failing provider is skipped without being called."""
+        from utils.provider_health import OPEN, provider_health
+        
+        env = {"OPENAI_API_KEY": "test", "GEMINI_API_KEY": "test"}
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", side_effect=Exception("timeout")) as openai, \
+             patch("utils.call_llm.call_llm_gemini", return_value="from gemini") as gemini:
+            results = [call_llm("prompt", provider="openai") for _ in range(7)]
+        
+        assert results == ["from gemini"] * 7
+        assert openai.call_count == provider_health.min_calls
+        assert gemini.call_count == 7
+        # Fallback uses its own default model, not the failed provider's
+        assert gemini.call_args[0][1] == "gemini-2.5-flash"
+        assert provider_health.state("openai") == OPEN
+        snapshot = provider_health.snapshot()
+        assert snapshot["openai"]["trips"] == 1 and snapshot["gemini"]["error_rate"] == 0
+    
+    def test_half_open_probe_and_scores(self):
+        """One probe is let through after the cooldown; its outcome closes or reopens the circuit."""
+        import time
+        from utils.provider_health import CLOSED, HALF_OPEN, OPEN, ProviderHealthRegistry
+        
+        registry = ProviderHealthRegistry(window=4, min_calls=2, error_threshold=0.5, cooldown_seconds=0.05)
+        for _ in range(2):
+            registry.record("openai", False, 0.1)
+        assert registry.state("openai") == OPEN and not registry.allow("openai")
+        
+        time.sleep(0.06)
+        assert registry.allow("openai") and registry.state("openai") == HALF_OPEN
+        assert not registry.allow("openai")
+        registry.record("openai", False, 0.1)
+        assert registry.state("openai") == OPEN
+        
+        time.sleep(0.06)
+        assert registry.allow("openai")
+        registry.record("openai", True, 0.1)
+        assert registry.state("openai") == CLOSED and registry.allow("openai")
+        
+        registry.record("gemini", True, 20.0)
+        registry.record("anthropic", True, 0.5)
+        assert registry.candidates("openai", ["gemini", "anthropic", "openai"]) == ["openai", "anthropic", "gemini"]
+
+
+class TestHedging:
+    """Test hedged requests across providers."""
+    
+    def test_slow_primary_is_hedged(self):
+        """A backup provider answers when the primary is slower than the hedge delay."""
+        import time
+        from utils.hedging import HedgeThrottle
+        from utils.metrics import LLM_HEDGES
+        
+        def slow_openai(*args):
+            time.sleep(0.3)
+            return "slow answer"
+        
+        env = {"OPENAI_API_KEY": "test", "GEMINI_API_KEY": "test",
+               "OFFERCOMPARE_HEDGE_REQUESTS": "1", "OFFERCOMPARE_HEDGE_DELAY": "0.05"}
+        before = LLM_HEDGES.value(provider="gemini", winner="backup")
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.hedging.hedge_throttle", HedgeThrottle(max_ratio=0.0, burst=1.0)), \
+             patch("utils.call_llm.call_llm_openai", side_effect=slow_openai), \
+             patch("utils.call_llm.call_llm_gemini", return_value="fast answer") as gemini:
+            started = time.perf_counter()
+            hedged = call_llm("prompt", provider="openai")
+            elapsed = time.perf_counter() - started
+            # The throttle allowed one hedge only; the next slow call just waits
+            unhedged = call_llm("another prompt", provider="openai")
+        
+        assert hedged == "fast answer" and elapsed < 0.3
+        assert unhedged == "slow answer"
+        assert gemini.call_count == 1
+        assert LLM_HEDGES.value(provider="gemini", winner="backup") == before + 1
+    
+    def test_hedged_call_outcomes(self):
+        """Fast primaries are never hedged; a failed hedge surfaces an error."""
+        import time
+        from utils.hedging import BACKUP, PRIMARY, HedgeThrottle, hedged_call
+        
+        throttle = HedgeThrottle(max_ratio=1.0, burst=1.0)
+        backup = MagicMock(return_value="backup")
+        assert hedged_call(lambda cancel: "primary", backup, 1.0, throttle) == ("primary", PRIMARY)
+        assert not backup.called
+        
+        def slow_failure(cancel):
+            time.sleep(0.05)
+            raise ValueError("primary down")
+        
+        assert hedged_call(slow_failure, lambda cancel: "backup", 0.01, throttle) == ("backup", BACKUP)
+        with pytest.raises(ValueError):
+            hedged_call(slow_failure, MagicMock(side_effect=ValueError("backup down")), 0.01, throttle)
+        
+        empty = HedgeThrottle(max_ratio=0.5, burst=1.0)
+        assert empty.try_acquire() and not empty.try_acquire()
+        empty.on_call()
+        empty.on_call()
+        assert empty.try_acquire()
+
+    def test_hedge_delay_starts_when_primary_runs(self):
+        """Time spent waiting for a free worker does not trigger a hedge."""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from utils.hedging import PRIMARY, HedgeThrottle, hedged_call
+
+        backup = MagicMock(return_value="backup")
+        with patch("utils.hedging._executor", ThreadPoolExecutor(max_workers=1)) as pool:
+            pool.submit(time.sleep, 0.2)
+            result = hedged_call(lambda cancel: "primary", backup, 0.05, HedgeThrottle(max_ratio=1.0, burst=1.0))
+        assert result == ("primary", PRIMARY) and not backup.called
+
+    def test_losing_provider_stops_retrying(self):
+        """Once the backup has answered, the primary makes no further attempts."""
+        import time
+        from utils.call_llm import LLMProviderError
+        from utils.hedging import HedgeThrottle
+
+        def failing_openai(*args):
+            time.sleep(0.05)
+            raise LLMProviderError("OpenAI API error: 503", "openai", 503, retryable=True)
+
+        env = {"OPENAI_API_KEY": "test", "GEMINI_API_KEY": "test", "OFFERCOMPARE_HEDGE_REQUESTS": "1",
+               "OFFERCOMPARE_HEDGE_DELAY": "0.01", "OFFERCOMPARE_LLM_MAX_RETRIES": "5",
+               "OFFERCOMPARE_LLM_BACKOFF_BASE": "0.05"}
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.hedging.hedge_throttle", HedgeThrottle(max_ratio=1.0, burst=1.0)), \
+             patch("utils.call_llm.call_llm_openai", side_effect=failing_openai) as openai, \
+             patch("utils.call_llm.call_llm_gemini", return_value="backup answer"):
+            assert call_llm("prompt", provider="openai") == "backup answer"
+            time.sleep(0.3)
+        # Only the attempt already in flight when the backup won
+        assert openai.call_count == 1
+
+
+class TestLLMRetries:
+    """Test timeouts, retries with backoff and deadlines in the LLM interface."""
+    
+    def teardown_method(self):
+        fake_llm.configure_fake_llm()
+    
+    def test_retryable_errors_are_retried(self):
+        """429/5xx are retried with backoff; other errors fail at once."""
+        from types import SimpleNamespace
+        from utils.call_llm import LLMProviderError, _classify_error
+        from utils.metrics import LLM_RETRIES
+        
+        env = {"OPENAI_API_KEY": "test", "OFFERCOMPARE_LLM_BACKOFF_BASE": "0.001"}
+        before = LLM_RETRIES.value(provider="openai")
+        unavailable = LLMProviderError("OpenAI API error: 503", "openai", 503, retryable=True)
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", side_effect=[unavailable, "recovered"]) as openai:
+            assert call_llm("prompt") == "recovered"
+        assert openai.call_count == 2
+        assert LLM_RETRIES.value(provider="openai") == before + 1
+        
+        bad_request = LLMProviderError("OpenAI API error: 400", "openai", 400)
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", side_effect=bad_request) as openai:
+            with pytest.raises(LLMProviderError):
+                call_llm("prompt")
+        assert openai.call_count == 1
+        
+        rate_limited = Exception("slow down")
+        rate_limited.status_code = 429
+        rate_limited.response = SimpleNamespace(headers={"retry-after": "2"})
+        assert _classify_error(rate_limited) == (429, True, 2.0)
+        assert _classify_error(TimeoutError("read timed out"))[1]
+        assert not _classify_error(ValueError("bad json"))[1]
+    
+    def test_timeouts_and_deadlines(self):
+        """Provider requests get the configured timeout, and nothing is retried past the deadline."""
+        import time
+        from utils.budget import deadline_scope
+        from utils.call_llm import LLMDeadlineExceeded
+        
+        fake_llm.configure_fake_llm(latency_ms=500)
+        env = {"OFFERCOMPARE_FAKE_LLM": "1", "OFFERCOMPARE_LLM_TIMEOUT": "0.02",
+               "OFFERCOMPARE_LLM_MAX_RETRIES": "1", "OFFERCOMPARE_LLM_BACKOFF_BASE": "0.001"}
+        with patch.dict(os.environ, env, clear=True):
+            started = time.perf_counter()
+            with pytest.raises(TimeoutError):
+                call_llm("hung socket")
+            assert time.perf_counter() - started < 0.4
+            assert fake_llm.call_count() == 2
+            
+            with deadline_scope(time.monotonic() - 1):
+                with pytest.raises(LLMDeadlineExceeded):
+                    call_llm("too late")
+            with pytest.raises(LLMDeadlineExceeded):
+                call_llm("too late", deadline=time.monotonic())
+        assert fake_llm.call_count() == 2
+
+
+class TestModelRouting:
+    """Test purpose-based model tier routing."""
+    
+    def _model_used(self, env, **kwargs):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test", **env}, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value="ok") as openai:
+            call_llm("prompt", **kwargs)
+        return openai.call_args[0][1]
+    
+    def test_purpose_selects_tier(self):
+        """Simple purposes get the fast model, analysis the strong one; explicit models win."""
+        assert self._model_used({}, purpose="extraction") == "gpt-4o-mini"
+        assert self._model_used({}, purpose="recommendation") == "gpt-4o-mini"
+        assert self._model_used({}, purpose="offer_recommendation") == "gpt-4o-mini"
+        assert self._model_used({}, purpose="analysis") == "gpt-4o"
+        assert self._model_used({}, purpose="market_analysis") == "gpt-4o"
+        assert self._model_used({}) == "gpt-4o"
+        assert self._model_used({}, purpose="extraction", model="gpt-4-turbo") == "gpt-4-turbo"
+    
+    def test_config_overrides_and_fallback(self):
+        """Routing is configurable, and fallbacks use their own model for the tier."""
+        from utils.call_llm import get_provider_info
+        
+        assert self._model_used({"OFFERCOMPARE_MODEL_ROUTING": "extraction=strong"}, purpose="extraction") == "gpt-4o"
+        assert self._model_used({"OFFERCOMPARE_MODEL_ROUTING": "off"}, purpose="sentiment") == "gpt-4o"
+        assert self._model_used({"OFFERCOMPARE_MODEL_ROUTING": "analysis=fast"}, purpose="analysis") == "gpt-4o-mini"
+        
+        env = {"OPENAI_API_KEY": "test", "ANTHROPIC_API_KEY": "test"}
+        with patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm.call_llm_openai", side_effect=Exception("bad request")), \
+             patch("utils.call_llm.call_llm_anthropic", return_value="ok") as anthropic:
+            call_llm("prompt", provider="openai", purpose="sentiment")
+            routing = get_provider_info()["model_routing"]
+        assert anthropic.call_args[0][1] == "claude-3-haiku-20240307"
+        assert routing["extraction"] == "fast" and routing["analysis"] == "strong"
+
+
+class TestProviderClients:
+    """Test lazily created, shared provider SDK clients."""
+    
+    def test_clients_created_once_per_key(self):
+        """get_client builds a provider's client on first use and reuses it."""
+        from utils import call_llm as llm
+        
+        with patch.dict(llm._clients, clear=True), \
+             patch.dict(os.environ, {"OPENAI_API_KEY": "key-1"}, clear=True), \
+             patch("utils.call_llm._create_client", side_effect=lambda provider, key: object()) as create:
+            first = llm.get_client("openai")
+            assert llm.get_client("openai") is first
+            os.environ["OPENAI_API_KEY"] = "key-2"
+            assert llm.get_client("openai") is not first
+        assert create.call_count == 2
+    
+    def test_prewarm_reports_per_provider(self):
+        """Prewarming times each available SDK provider and reports failures instead of raising."""
+        from utils import call_llm as llm
+        
+        def create(provider, key):
+            if provider == "gemini":
+                raise ImportError("No module named 'google'")
+            return object()
+        
+        env = {"OPENAI_API_KEY": "test", "GEMINI_API_KEY": "test"}
+        with patch.dict(llm._clients, clear=True), patch.dict(os.environ, env, clear=True), \
+             patch("utils.call_llm._create_client", side_effect=create):
+            warmed = llm.prewarm_providers()
+            # Offline mode uses no real provider, so there is nothing to prewarm
+            with patch.dict(os.environ, {"OFFERCOMPARE_FAKE_LLM": "1"}):
+                assert llm.prewarm_providers() == {}
+        
+        assert set(warmed) == {"openai", "gemini"}
+        assert isinstance(warmed["openai"], float)
+        assert warmed["gemini"].startswith("error:")
+
+
+class TestStructuredOutput:
+    """Test JSON extraction, schema validation and repair of structured responses."""
+    
+    SCHEMA = {
+        "type": "object",
+        "properties": {"score": {"type": "number", "minimum": 1, "maximum": 10},
+                       "tags": {"type": "array", "items": {"type": "string"}}},
+        "required": ["score"],
+    }
+    
+    def test_validate_reports_violations(self):
+        """validate() lists type, range and required-field errors with their paths."""
+        from utils.structured import validate
+        
+        assert validate({"score": 7, "tags": ["a"]}, self.SCHEMA) == []
+        errors = validate({"score": 12, "tags": ["a", 3]}, self.SCHEMA)
+        assert "$.score: 12 > maximum 10" in errors
+        assert any(e.startswith("$.tags[1]: expected string") for e in errors)
+        assert validate({}, self.SCHEMA) == ["$.score: required"]
+        assert validate({"score": True}, self.SCHEMA) == ["$.score: expected number, got bool"]
+    
+    def test_local_and_model_repair(self):
+        """Fenced, comma-trailing JSON is fixed locally; invalid data goes to the repair callback once."""
+        from utils.metrics import LLM_STRUCTURED
+        from utils.structured import StructuredOutputError, extract_json, parse_structured
+        
+        assert extract_json('Sure!\n```json\n{"score": 7, "tags": ["a",],}\n```\nDone.') == {"score": 7, "tags": ["a"]}
+        
+        before = LLM_STRUCTURED.value(purpose="test", result="repaired")
+        assert parse_structured('```{"score": 7,}```', self.SCHEMA, purpose="test") == {"score": 7}
+        assert LLM_STRUCTURED.value(purpose="test", result="repaired") == before + 1
+        
+        repair = MagicMock(return_value='{"score": 9}')
+        assert parse_structured('{"score": 42}', self.SCHEMA, repair=repair, purpose="test") == {"score": 9}
+        assert repair.call_args[0][1] == ["$.score: 42 > maximum 10"]
+        
+        failed = LLM_STRUCTURED.value(purpose="test", result="failed")
+        with pytest.raises(StructuredOutputError) as excinfo:
+            parse_structured("no json here", self.SCHEMA, repair=MagicMock(return_value="still none"), purpose="test")
+        assert excinfo.value.raw == "still none"
+        assert LLM_STRUCTURED.value(purpose="test", result="failed") == failed + 1
+    
+    def test_structured_request_uses_native_json_mode(self):
+        """A schema becomes the provider's response_format and the reply comes back normalized."""
+        from utils.call_llm import call_llm_structured
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), \
+             patch("utils.call_llm.call_llm_openai", return_value='```json\n{"score": 8,}\n```') as openai:
+            result = call_llm_structured("Rate the offer (structured test)", schema=self.SCHEMA)
+        assert json.loads(result) == {"score": 8}
+        response_format = openai.call_args[0][6]
+        assert response_format["type"] == "json_schema"
+        assert response_format["json_schema"]["schema"] == self.SCHEMA
+    
+    def test_openai_downgrades_schema_mode_for_older_models(self):
+        """Models without json_schema support are asked for a plain JSON object."""
+        from utils import call_llm as llm
+        
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content="{}"))]
+        with patch.object(llm, "get_client", return_value=client):
+            llm.call_llm_openai("p", "gpt-4-turbo", 0.3, None, None, None,
+                                {"type": "json_schema", "json_schema": {"name": "x", "schema": {}}})
+        assert client.chat.completions.create.call_args.kwargs["response_format"] == {"type": "json_object"}
+
+
+class TestPromptCompaction:
+    """Test prompt size bounds and field selection for LLM prompts."""
+    
+    def test_truncation_policies(self):
+        """Over-budget text keeps its start (and end) within the estimated token bound."""
+        from utils.compaction import compact_text, squeeze_whitespace, truncate_text
+        
+        text = "Summary first.\n" + "Filler sentence here. " * 500 + "\nConclusion last."
+        assert truncate_text(text, 0) == text
+        head_tail = truncate_text(text, 100)
+        assert len(head_tail) <= 400
+        assert head_tail.startswith("Summary first.") and head_tail.endswith("Conclusion last.")
+        assert "[...]" in head_tail
+        head = truncate_text(text, 100, policy="head")
+        assert head.startswith("Summary first.") and "Conclusion" not in head
+        assert squeeze_whitespace("    a   b\n\n\n\n    c  ") == "a b\n\nc"
+        assert compact_text(None) == ""
+    
+    def test_fields_and_prompt_bound(self):
+        """Only set fields are rendered (False and 0 count as set), values clipped; compact_prompt counts what it removed."""
+        from utils.compaction import compact_prompt, format_fields
+        from utils.metrics import PROMPT_TOKENS_TRIMMED
+        
+        rendered = format_fields({"salary_focused": True, "mixed": False, "notes": "x" * 500, "city": None,
+                                  "bonus": 0, "equity": 0.0, "tags": []})
+        assert rendered.splitlines()[0] == "salary_focused: yes"
+        assert "mixed: no" in rendered and "bonus: 0" in rendered and "equity: 0.0" in rendered
+        assert "city" not in rendered and "tags" not in rendered
+        notes = next(line for line in rendered.splitlines() if line.startswith("notes: "))
+        assert len(notes) <= len("notes: ") + 120
+        assert format_fields({}) == "none"
+        
+        before = PROMPT_TOKENS_TRIMMED.value(prompt="test")
+        prompt = compact_prompt("        Instructions\n" + "data " * 2000 + "\n        Answer in JSON.", "test", 200)
+        assert len(prompt) <= 800 and prompt.endswith("Answer in JSON.")
+        assert PROMPT_TOKENS_TRIMMED.value(prompt="test") > before
+    
+    def test_analysis_prompt_is_bounded(self):
+        """The analysis prompt renders preferences as fields and stays bounded for verbose inputs."""
+        from nodes import AIAnalysisNode
+        
+        offers = [{"company": "Acme " * 100, "position": "Engineer", "base_salary": 150000}]
+        prefs = {"growth_focused": True, "salary_focused": False, "notes": "long " * 1000}
+        with patch.dict(os.environ, {"OFFERCOMPARE_PROMPT_MAX_TOKENS": "600"}):
+            prompt = AIAnalysisNode()._build_analysis_prompt(offers, {"top_offer": {"company": "Acme"}}, prefs)
+        assert "growth_focused: yes" in prompt and "salary_focused: no" in prompt
+        assert "{'growth_focused'" not in prompt
+        assert len(prompt) <= 600 * 4
+
+
+class TestBatchMode:
+    """Test collecting LLM calls into provider batch jobs."""
+    
+    def _collector(self, backend, flush_seconds=0.05, **kwargs):
+        from utils.batch_llm import BatchCollector
+        return BatchCollector({"openai": backend}, flush_seconds=flush_seconds, poll_seconds=0.01, **kwargs)
+    
+    def test_concurrent_calls_share_one_job(self):
+        """Calls waiting in batch mode are submitted together and each gets its own answer."""
+        import contextvars
+        from concurrent.futures import ThreadPoolExecutor
+        from utils.batch_llm import LocalBatchBackend, batch_mode
+        from utils.usage import estimate_cost, usage_ledger
+        
+        backend = LocalBatchBackend(completion_seconds=0.05)
+        # Flush on the fourth request, not on a quiet period a loaded test run can hit early
+        collector = self._collector(backend, flush_seconds=5, max_requests=4)
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), \
+             patch("utils.call_llm.call_llm_openai") as interactive, \
+             usage_ledger() as ledger, batch_mode(collector):
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, call_llm, f"batched prompt {i}")
+                           for i in range(4)]
+                responses = [future.result(timeout=5) for future in futures]
+        collector.close()
+        
+        assert interactive.call_count == 0
+        assert collector.jobs_submitted == 1
+        assert len(set(responses)) == 4
+        assert all(r.batched and r.cost_usd > 0 for r in ledger.records)
+        full_price = sum(estimate_cost(r.model, r.input_tokens, r.output_tokens) for r in ledger.records)
+        assert ledger.summary()["cost_usd"] == pytest.approx(full_price * 0.5, abs=1e-6)
+    
+    def test_failed_results_raise_provider_errors(self):
+        """A request the batch job failed surfaces as an LLMProviderError with its status."""
+        from utils.batch_llm import BatchBackend, BatchResult, batch_mode
+        from utils.call_llm import LLMProviderError
+        
+        class RejectingBackend(BatchBackend):
+            def submit(self, requests):
+                self.ids = [r.custom_id for r in requests]
+                return "job-1"
+            
+            def poll(self, job_id):
+                return {custom_id: BatchResult(error="invalid model", status_code=400) for custom_id in self.ids}
+        
+        collector = self._collector(RejectingBackend())
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), batch_mode(collector):
+            with pytest.raises(LLMProviderError) as excinfo:
+                call_llm("rejected batch prompt")
+        collector.close()
+        assert excinfo.value.status_code == 400 and not excinfo.value.retryable
+
+    
+    def test_wait_ends_at_the_call_deadline(self):
+        """A call still queued at its deadline is withdrawn and fails like any deadline miss."""
+        import time
+        from utils.batch_llm import batch_mode
+        from utils.call_llm import LLMDeadlineExceeded
+        
+        backend = MagicMock()
+        collector = self._collector(backend, flush_seconds=5)
+        started = time.monotonic()
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), batch_mode(collector):
+            with pytest.raises(LLMDeadlineExceeded):
+                call_llm("queued batch prompt", deadline=started + 0.1)
+        collector.close()
+        
+        assert time.monotonic() - started < 2
+        assert backend.submit.call_count == 0 and collector.jobs_submitted == 0
+
+class TestReplayProvider:
+    """Test recording real provider responses and replaying them offline."""
+    
+    def test_record_then_replay(self, tmp_path):
+        """Recorded responses are served by the replay provider with their token usage and set latency."""
+        import time
+        from utils import replay_llm
+        from utils.usage import usage_ledger
+        
+        corpus = str(tmp_path / "corpus.jsonl")
+        try:
+            with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}, clear=True), \
+                 patch("utils.call_llm.call_llm_openai", return_value="recorded answer"):
+                replay_llm.configure_replay_llm(corpus_path=corpus, record=True)
+                assert call_llm("replayable prompt", provider="openai", system_prompt="sys") == "recorded answer"
+            
+            with patch.dict(os.environ, {"OFFERCOMPARE_REPLAY_LLM": "1"}, clear=True), usage_ledger() as ledger:
+                replay_llm.configure_replay_llm(corpus_path=corpus, latency_ms=30)
+                assert replay_llm.corpus_size() == 1
+                started = time.perf_counter()
+                assert call_llm("replayable prompt", system_prompt="sys") == "recorded answer"
+                assert time.perf_counter() - started >= 0.03
+            assert ledger.records[0].provider == "replay"
+        finally:
+            replay_llm.configure_replay_llm()
+    
+    def test_misses(self, tmp_path):
+        """Unrecorded prompts raise (without retries) unless configured to fall back to the fake provider."""
+        from utils import replay_llm
+        from utils.metrics import LLM_REPLAY
+        
+        try:
+            with patch.dict(os.environ, {"OFFERCOMPARE_REPLAY_LLM": "1"}, clear=True):
+                replay_llm.configure_replay_llm(corpus_path=str(tmp_path / "empty.jsonl"))
+                misses = LLM_REPLAY.value(result="miss")
+                with pytest.raises(replay_llm.ReplayMissError):
+                    call_llm("never recorded")
+                assert LLM_REPLAY.value(result="miss") == misses + 1
+                
+                replay_llm.configure_replay_llm(corpus_path=str(tmp_path / "empty.jsonl"), on_miss="fake")
+                assert "Simulated" in call_llm("never recorded")
+        finally:
+            replay_llm.configure_replay_llm()
+    
+    def test_stays_offline_with_real_keys_set(self, tmp_path):
+        """With API keys set, replay is still the default, named real providers are not called and a miss is final."""
+        from utils import replay_llm
+        from utils.call_llm import get_available_providers, get_default_provider
+        
+        env = {"OPENAI_API_KEY": "test", "ANTHROPIC_API_KEY": "test", "OFFERCOMPARE_FAKE_LLM": "1",
+               "OFFERCOMPARE_REPLAY_LLM": "1", "OFFERCOMPARE_HEDGE_REQUESTS": "1", "DEFAULT_AI_PROVIDER": "openai"}
+        try:
+            with patch.dict(os.environ, env, clear=True), \
+                 patch("utils.call_llm.call_llm_openai", return_value="online") as openai, \
+                 patch("utils.call_llm.call_llm_anthropic", return_value="online") as anthropic:
+                replay_llm.configure_replay_llm(corpus_path=str(tmp_path / "empty.jsonl"))
+                assert get_default_provider() == "replay"
+                assert get_available_providers() == ["replay", "fake"]
+                for provider in (None, "replay", "openai"):
+                    with pytest.raises(replay_llm.ReplayMissError):
+                        call_llm("never recorded", provider=provider)
+            assert not openai.called and not anthropic.called
+        finally:
+            replay_llm.configure_replay_llm()
+
+
+class TestSemanticCache:
+    """Test near-duplicate prompt reuse of LLM responses."""
+    
+    def test_canonical_form(self):
+        """Aliases, legal suffixes, case, whitespace and amounts are normalized; years are kept."""
+        from utils.semantic_cache import canonicalize
+        
+        a = canonicalize("Company: Facebook\n   Base Salary: $152,300  Score: 88.3 (2024)")
+        b = canonicalize("company: Meta Platforms Inc.\nBase Salary: $148,900 Score: 88.4 (2024)")
+        assert a == b == "company: meta\nbase salary: $150000 score: 88 (2024)"
+        assert canonicalize("Score 7.5 of 10") == "score 7.5 of 10"
+    
+    def test_near_duplicate_prompts_share_a_response(self):
+        """With the cache on, covered purposes reuse a response; other purposes still call the provider."""
+        from utils.semantic_cache import semantic_cache
+        
+        env = {"OPENAI_API_KEY": "test", "OFFERCOMPARE_SEMANTIC_CACHE": "1"}
+        semantic_cache.clear()
+        try:
+            with patch.dict(os.environ, env, clear=True), \
+                 patch("utils.call_llm.call_llm_openai", return_value="analysis") as openai:
+                first = call_llm("Analyze Stripe offer, base $152,300, score 81.2", purpose="market_analysis")
+                second = call_llm("Analyze  Stripe offer, base $151,000, score 80.9", purpose="market_analysis")
+                call_llm("Analyze Stripe offer, base $152,300, score 81.2", purpose="extraction")
+                call_llm("Analyze Stripe offer, base $152,300, score 81.2", purpose="market_analysis", temperature=0.1)
+                # Multi-offer analyses and decision frameworks are not covered by default
+                call_llm("Analyze Stripe offer, base $152,300, score 81.2", purpose="analysis")
+                call_llm("Analyze Stripe offer, base $151,000, score 80.9", purpose="analysis")
+                call_llm("Decide between Stripe and Plaid", purpose="recommendation")
+                call_llm("Decide between Stripe and Plaid", purpose="recommendation")
+            assert first == second == "analysis"
+            assert openai.call_count == 7
+        finally:
+            semantic_cache.clear()
+    
+    def test_entry_labels_the_provider_that_answered(self):
+        """A response from a fallback provider is cached, and replayed, under that provider and model."""
+        from utils.semantic_cache import semantic_cache
+        from utils.usage import usage_ledger
+        
+        env = {"OPENAI_API_KEY": "test", "ANTHROPIC_API_KEY": "test", "OFFERCOMPARE_SEMANTIC_CACHE": "1",
+               "OFFERCOMPARE_LLM_MAX_RETRIES": "0"}
+        semantic_cache.clear()
+        try:
+            with patch.dict(os.environ, env, clear=True), \
+                 patch("utils.call_llm.call_llm_openai", side_effect=ConnectionError("down")), \
+                 patch("utils.call_llm.call_llm_anthropic", return_value="from claude"), \
+                 usage_ledger() as ledger:
+                prompt = "Recommend the Stripe offer, score 81.2"
+                assert call_llm(prompt, provider="openai", purpose="offer_recommendation") == "from claude"
+                assert call_llm(prompt, provider="openai", purpose="offer_recommendation") == "from claude"
+            cached = [r for r in ledger.records if r.cached]
+            assert len(cached) == 1
+            assert (cached[0].provider, cached[0].model) == ("anthropic", "claude-3-haiku-20240307")
+        finally:
+            semantic_cache.clear()
+    
+    def test_other_companies_and_locations_never_match(self):
+        """A market analysis cached for one company or location is not reused for another, at any threshold."""
+        from utils.market_data import ai_market_analysis
+        from utils.semantic_cache import SemanticCache
+        
+        salary = {"base_salary": 180000, "equity_value": 50000, "bonus": 20000, "total_compensation": 250000}
+        for threshold in (0.0, 0.9):
+            env = {"OPENAI_API_KEY": "test", "OFFERCOMPARE_SEMANTIC_CACHE": "1"}
+            with patch.dict(os.environ, env, clear=True), \
+                 patch("utils.call_llm.semantic_cache", SemanticCache(threshold=threshold)), \
+                 patch("utils.call_llm.call_llm_openai", side_effect=lambda prompt, *args: prompt) as openai:
+                ai_market_analysis("Senior Software Engineer", "Microsoft", "Seattle, WA", salary)
+                google = ai_market_analysis("Senior Software Engineer", "Google", "Seattle, WA", salary)
+                austin = ai_market_analysis("Senior Software Engineer", "Google", "Austin, TX", salary)
+                repeat = ai_market_analysis("Senior Software Engineer", "Google", "Austin, TX",
+                                            dict(salary, base_salary=181000))
+            assert openai.call_count == 3
+            assert "Microsoft" not in google["ai_analysis"] and "Seattle" not in austin["ai_analysis"]
+            assert repeat["ai_analysis"] == austin["ai_analysis"]
+    
+    def test_similarity_threshold_and_eviction(self):
+        """Prompts differing only in figures match above the threshold within a partition; old entries are evicted."""
+        from utils.semantic_cache import SemanticCache
+        
+        prompt = ("Provide a focused recommendation for this offer at Stripe for a senior engineer role: "
+                  "base $150,000, equity $40,000, bonus $20,000, score 81, 5 years of experience")
+        cache = SemanticCache(threshold=0.8, max_entries=2)
+        cache.put(prompt, "p", "recommended", "openai", "gpt-4o-mini")
+        entry, score = cache.get(prompt.replace("$150,000", "$180,000"), "p")
+        assert entry.response == "recommended" and 0.8 <= score < 1.0
+        assert cache.get(prompt.replace("$150,000", "$180,000"), "other") is None
+        assert cache.get(prompt.replace("senior", "staff"), "p") is None
+        assert SemanticCache(threshold=0.0).get(prompt, "p") is None
+        
+        cache.put("second prompt", "p", "2", "openai", "gpt-4o-mini")
+        cache.put("third prompt", "p", "3", "openai", "gpt-4o-mini")
+        assert len(cache) == 2 and cache.get("second prompt", "p")[0].response == "2"
+
+
 # Test data fixtures
 @pytest.fixture
 def sample_offer():
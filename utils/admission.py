@@ -0,0 +1,160 @@
+"""
+Admission control for the API server.
+
+Caps the number of analyses running at once, keeps a bounded FIFO wait
+queue in front of them and limits how many requests a single client may
+have running or queued. A request that runs several analyses at once (a
+batch) acquires one slot per analysis, so it counts against the cap in
+full. Requests that cannot be admitted are rejected immediately (or
+after the queue timeout) with a Retry-After estimate, so overload sheds
+excess work instead of slowing everyone down.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; carries the HTTP status to return."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """A granted slot. release() is idempotent so it can be called from several cleanup paths."""
+
+    def __init__(self, controller: "AdmissionController", client_id: str, wait_seconds: float,
+                 slots: int = 1) -> None:
+        self._controller = controller
+        self._client_id = client_id
+        self.slots = slots
+        self._started = time.monotonic()
+        self._released = False
+        self.wait_seconds = wait_seconds
+
+    @property
+    def wait_ms(self) -> int:
+        return int(self.wait_seconds * 1000)
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._client_id, time.monotonic() - self._started, self.slots)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32,
+                 queue_timeout_seconds: float = 30.0, max_per_client: int = 0) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_per_client = max_per_client  # running + queued; 0 disables
+        self._active = 0  # slots held, not requests
+        self._admitted = 0  # requests holding slots
+        self._waiters: Deque[Tuple[asyncio.Future, int]] = deque()
+        self._per_client: Dict[str, int] = {}
+        self._avg_service_seconds = 5.0
+        self.rejected = 0
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_service_seconds * backlog / max(1, self.max_concurrent)))
+
+    def _reject(self, status_code: int, detail: str) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(status_code, detail, self._retry_after())
+
+    async def acquire(self, client_id: str = "anonymous", slots: int = 1) -> AdmissionTicket:
+        """
+        Wait for slots (FIFO) or raise AdmissionRejected.
+
+        slots is capped at max_concurrent so a wide request can still be
+        admitted; the ticket reports how many it got.
+        """
+        slots = max(1, min(slots, self.max_concurrent))
+        if self.max_per_client and self._per_client.get(client_id, 0) >= self.max_per_client:
+            raise self._reject(429, "Too many concurrent requests for this client")
+
+        started = time.monotonic()
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+        try:
+            if self._active + slots <= self.max_concurrent and not self._waiters:
+                self._active += slots
+            elif len(self._waiters) >= self.max_queue:
+                raise self._reject(503, "Server is at capacity, please retry later")
+            else:
+                await self._wait_for_slots(slots)
+        except BaseException:
+            self._drop_client(client_id)
+            raise
+        self._admitted += 1
+        return AdmissionTicket(self, client_id, time.monotonic() - started, slots)
+
+    async def _wait_for_slots(self, slots: int) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, slots)
+        self._waiters.append(entry)
+        try:
+            # _grant_waiters counts the slots into _active before waking us
+            await asyncio.wait_for(waiter, self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            raise self._reject(503, "Timed out waiting for a free analysis slot")
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slots(slots)  # slots were granted as we were cancelled; pass them on
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                self._grant_waiters()  # a wide request leaving the head may unblock narrower ones
+
+    def _drop_client(self, client_id: str) -> None:
+        remaining = self._per_client.get(client_id, 0) - 1
+        if remaining > 0:
+            self._per_client[client_id] = remaining
+        else:
+            self._per_client.pop(client_id, None)
+
+    def _grant_waiters(self) -> None:
+        # Strict FIFO: a request waiting for several slots holds back those behind it
+        while self._waiters:
+            waiter, slots = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if self._active + slots > self.max_concurrent:
+                return
+            self._waiters.popleft()
+            self._active += slots
+            waiter.set_result(None)
+
+    def _release_slots(self, slots: int) -> None:
+        self._active -= slots
+        self._grant_waiters()
+
+    def _release(self, client_id: str, service_seconds: float, slots: int = 1) -> None:
+        self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * service_seconds
+        self._admitted -= 1
+        self._drop_client(client_id)
+        self._release_slots(slots)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self._active,
+            "admitted": self._admitted,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "avg_service_seconds": round(self._avg_service_seconds, 3),
+        }
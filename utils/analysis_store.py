@@ -0,0 +1,47 @@
+"""
+In-memory store of recent analyses, keyed by analysis id.
+
+Keeps the enriched offers of each analysis so that cheap follow-up
+operations (e.g. re-scoring with new preferences) can skip the flow.
+Bounded by entry count (LRU) and TTL; process-local, not persisted.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class AnalysisStore:
+    def __init__(self, max_entries: int = 256, ttl_seconds: int = 3600) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, data: Dict[str, Any], analysis_id: Optional[str] = None) -> str:
+        analysis_id = analysis_id or uuid.uuid4().hex
+        with self._lock:
+            self._entries[analysis_id] = (time.time(), data)
+            self._entries.move_to_end(analysis_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return analysis_id
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is None:
+                return None
+            created_at, data = entry
+            if self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds:
+                del self._entries[analysis_id]
+                return None
+            self._entries.move_to_end(analysis_id)
+            return data
+
+    def __len__(self) -> int:
+        return len(self._entries)
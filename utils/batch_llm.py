@@ -0,0 +1,415 @@
+"""
+Batch LLM Mode - route call_llm through provider batch APIs for offline runs
+
+Nightly bulk comparisons don't need interactive latency. Inside
+batch_mode(), call_llm does not call the provider directly: each request is
+queued in the active BatchCollector and the calling thread waits. Once no
+new request has arrived for OFFERCOMPARE_BATCH_FLUSH_SECONDS (or
+OFFERCOMPARE_BATCH_MAX_REQUESTS are queued) the queue is submitted as one
+batch job per provider, polled every OFFERCOMPARE_BATCH_POLL_SECONDS, and
+each result is handed back to its waiting call. Run many analyses at once
+(flow.run_batch_analysis) and every stage's calls share a job.
+
+Backends:
+- openai: Batch API (JSONL upload, /v1/chat/completions, 24h window)
+- anthropic: Message Batches API
+- fake: LocalBatchBackend, a local stand-in that answers with the fake
+  provider after a simulated completion time, for tests and dry runs
+
+Providers without a backend (Gemini) are called interactively as usual.
+Caching, usage accounting and retries work the same; batched calls are
+recorded with the batch discount and don't feed provider latency health.
+
+A batched call waits at most OFFERCOMPARE_BATCH_TIMEOUT seconds, and never
+past its deadline (the call's own or the request budget's): a call still
+queued then is withdrawn, and one already submitted is abandoned, so the
+analysis degrades as it would for an interactive timeout. Without a
+deadline (OFFERCOMPARE_ANALYSIS_DEADLINE=0, the default) calls wait for
+the job however long the provider takes.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import get_config
+from .fake_llm import call_llm_fake
+from .log import get_logger
+from .metrics import LLM_BATCH_JOBS
+
+logger = get_logger(__name__)
+
+# How often a batched call waiting on its result checks its cancel event
+CANCEL_CHECK_SECONDS = 0.1
+
+_batch: ContextVar[Optional["BatchCollector"]] = ContextVar("offercompare_llm_batch", default=None)
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    provider: str
+    model: str
+    prompt: str
+    temperature: float
+    max_tokens: Optional[int] = None
+    system_prompt: Optional[str] = None
+    response_format: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class BatchResult:
+    text: Optional[str] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class BatchBackend(ABC):
+    """Submits a list of requests as one provider job and reports its results when done."""
+
+    @abstractmethod
+    def submit(self, requests: List[BatchRequest]) -> str:
+        """Start a job for the requests and return its id."""
+
+    @abstractmethod
+    def poll(self, job_id: str) -> Optional[Dict[str, BatchResult]]:
+        """Results by custom_id once the job has finished, None while it is running."""
+
+
+class LocalBatchBackend(BatchBackend):
+    """Stand-in batch service: answers with the fake provider once completion_seconds have passed."""
+
+    def __init__(self, completion_seconds: float = 0.0) -> None:
+        self.completion_seconds = completion_seconds
+        self.jobs: Dict[str, tuple] = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        job_id = f"local-batch-{next(self._ids)}"
+        self.jobs[job_id] = (time.monotonic() + self.completion_seconds, list(requests))
+        return job_id
+
+    def poll(self, job_id: str) -> Optional[Dict[str, BatchResult]]:
+        completes_at, requests = self.jobs[job_id]
+        if time.monotonic() < completes_at:
+            return None
+        results = {}
+        for r in requests:
+            try:
+                text = call_llm_fake(r.prompt, r.model, r.temperature, r.max_tokens, r.system_prompt, None,
+                                     r.response_format)
+                results[r.custom_id] = BatchResult(text=text)
+            except Exception as e:
+                results[r.custom_id] = BatchResult(error=str(e), status_code=getattr(e, "status_code", None))
+        del self.jobs[job_id]
+        return results
+
+
+def _messages(request: BatchRequest) -> List[Dict[str, str]]:
+    messages = []
+    if request.system_prompt:
+        messages.append({"role": "system", "content": request.system_prompt})
+    messages.append({"role": "user", "content": request.prompt})
+    return messages
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API: one JSONL file of chat completion requests per job."""
+
+    def _client(self):
+        from .call_llm import get_client
+        return get_client("openai")
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        from .call_llm import JSON_SCHEMA_MODEL_PREFIXES
+        lines = []
+        for r in requests:
+            body: Dict[str, Any] = {"model": r.model, "messages": _messages(r), "temperature": r.temperature}
+            if r.max_tokens:
+                body["max_tokens"] = r.max_tokens
+            if r.response_format:
+                schema_mode = r.response_format.get("type") == "json_schema"
+                body["response_format"] = {"type": "json_object"} \
+                    if schema_mode and not r.model.startswith(JSON_SCHEMA_MODEL_PREFIXES) else r.response_format
+            lines.append(json.dumps({"custom_id": r.custom_id, "method": "POST", "url": "/v1/chat/completions",
+                                     "body": body}))
+        client = self._client()
+        upload = client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        job = client.batches.create(input_file_id=upload.id, endpoint="/v1/chat/completions",
+                                    completion_window="24h")
+        return job.id
+
+    def poll(self, job_id: str) -> Optional[Dict[str, BatchResult]]:
+        client = self._client()
+        job = client.batches.retrieve(job_id)
+        if job.status not in ("completed", "failed", "expired", "cancelled"):
+            return None
+        results: Dict[str, BatchResult] = {}
+        for file_id in (job.output_file_id, job.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                body = response.get("body") or {}
+                status = response.get("status_code")
+                if status == 200:
+                    usage = body.get("usage") or {}
+                    results[entry["custom_id"]] = BatchResult(
+                        text=body["choices"][0]["message"]["content"],
+                        input_tokens=usage.get("prompt_tokens"), output_tokens=usage.get("completion_tokens"))
+                else:
+                    error = entry.get("error") or body.get("error") or {}
+                    results[entry["custom_id"]] = BatchResult(error=str(error.get("message", error)),
+                                                              status_code=status)
+        return results
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Anthropic Message Batches API."""
+
+    def __init__(self) -> None:
+        # custom_ids of JSON-mode requests, whose reply continues the "{" prefill
+        self._prefilled: set = set()
+
+    def _client(self):
+        from .call_llm import get_client
+        return get_client("anthropic")
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        entries = []
+        for r in requests:
+            params: Dict[str, Any] = {"model": r.model, "max_tokens": r.max_tokens or 4000,
+                                      "temperature": r.temperature,
+                                      "messages": [{"role": "user", "content": r.prompt}]}
+            if r.system_prompt:
+                params["system"] = r.system_prompt
+            if r.response_format:
+                # Same assistant prefill as the interactive call; poll() restores the "{"
+                params["messages"].append({"role": "assistant", "content": "{"})
+            entries.append({"custom_id": r.custom_id, "params": params})
+        self._prefilled.update(r.custom_id for r in requests if r.response_format)
+        return self._client().messages.batches.create(requests=entries).id
+
+    def poll(self, job_id: str) -> Optional[Dict[str, BatchResult]]:
+        client = self._client()
+        if client.messages.batches.retrieve(job_id).processing_status != "ended":
+            return None
+        results = {}
+        for entry in client.messages.batches.results(job_id):
+            result = entry.result
+            if result.type == "succeeded":
+                text = result.message.content[0].text
+                usage = result.message.usage
+                results[entry.custom_id] = BatchResult(
+                    text="{" + text if entry.custom_id in self._prefilled else text,
+                    input_tokens=usage.input_tokens, output_tokens=usage.output_tokens)
+            else:
+                error = getattr(result, "error", None)
+                results[entry.custom_id] = BatchResult(error=f"{result.type}: {error}" if error else result.type)
+            self._prefilled.discard(entry.custom_id)
+        return results
+
+
+class _Job:
+    def __init__(self, provider: str, job_id: str, futures: Dict[str, Future], poll_seconds: float) -> None:
+        self.provider = provider
+        self.job_id = job_id
+        self.futures = futures
+        self.submitted_at = time.monotonic()
+        self.next_poll = self.submitted_at + poll_seconds
+
+
+class BatchCollector:
+    """
+    Queues LLM requests per provider and runs them as batch jobs on a background thread.
+
+    submit() blocks the calling thread (a call_llm worker) until its result arrives.
+    """
+
+    def __init__(self, backends: Dict[str, BatchBackend], flush_seconds: float = 2.0, max_requests: int = 1000,
+                 poll_seconds: float = 30.0, timeout_seconds: float = 86400.0) -> None:
+        self.backends = backends
+        self.flush_seconds = flush_seconds
+        self.max_requests = max_requests
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self.jobs_submitted = 0
+        self._pending: Dict[str, List[tuple]] = {}
+        self._last_arrival = 0.0
+        self._jobs: List[_Job] = []
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="llm-batch", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, backends: Optional[Dict[str, BatchBackend]] = None) -> "BatchCollector":
+        config = get_config()
+        if backends is None:
+            backends = {"openai": OpenAIBatchBackend(), "anthropic": AnthropicBatchBackend(),
+                        "fake": LocalBatchBackend()}
+        return cls(backends, config.batch_flush_seconds, config.batch_max_requests, config.batch_poll_seconds,
+                   config.batch_timeout_seconds)
+
+    def supports(self, provider: str) -> bool:
+        return provider in self.backends and not self._closed
+
+    def submit(self, request: BatchRequest, deadline: Optional[float] = None,
+               cancel: Optional[threading.Event] = None) -> BatchResult:
+        """
+        Queue request (its custom_id is assigned here) and wait for its result.
+
+        The wait ends after timeout_seconds, at deadline (a time.monotonic() value) if
+        that comes first, or once cancel is set; the request is then withdrawn if it
+        has not been submitted yet and TimeoutError is raised. A request already in a
+        job stays there and its result is dropped.
+        """
+        future: Future = Future()
+        with self._cond:
+            request.custom_id = f"req-{next(self._ids)}"
+            self._pending.setdefault(request.provider, []).append((request, future))
+            self._last_arrival = time.monotonic()
+            self._cond.notify()
+        give_up = time.monotonic() + self.timeout_seconds
+        if deadline is not None:
+            give_up = min(give_up, deadline)
+        while True:
+            remaining = give_up - time.monotonic()
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                break
+            try:
+                return future.result(timeout=remaining if cancel is None else min(remaining, CANCEL_CHECK_SECONDS))
+            except TimeoutError:
+                continue
+        self._withdraw(request, future)
+        if future.done():
+            return future.result()
+        raise TimeoutError(f"batch request {request.custom_id} to {request.provider} gave up waiting")
+
+    def _withdraw(self, request: BatchRequest, future: Future) -> None:
+        with self._cond:
+            queued = self._pending.get(request.provider)
+            if queued:
+                queued[:] = [item for item in queued if item[1] is not future]
+                if not queued:
+                    del self._pending[request.provider]
+
+    def flush(self) -> None:
+        """Submit everything queued now instead of waiting for the quiet period."""
+        with self._cond:
+            self._last_arrival = 0.0
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Submit what is queued, wait for outstanding jobs, then stop the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _take_ready(self, now: float) -> List[tuple]:
+        ready = []
+        quiet = now - self._last_arrival >= self.flush_seconds
+        for provider, queued in list(self._pending.items()):
+            if quiet or self._closed or len(queued) >= self.max_requests:
+                while queued:
+                    ready.append((provider, queued[:self.max_requests]))
+                    del queued[:self.max_requests]
+                del self._pending[provider]
+        return ready
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                ready = self._take_ready(now)
+                if not ready:
+                    if self._closed and not self._jobs and not self._pending:
+                        return
+                    waits = [job.next_poll - now for job in self._jobs]
+                    if self._pending:
+                        waits.append(self._last_arrival + self.flush_seconds - now)
+                    self._cond.wait(timeout=max(0.01, min(waits)) if waits else None)
+                    now = time.monotonic()
+                    ready = self._take_ready(now)
+            for provider, items in ready:
+                self._submit_job(provider, items)
+            self._poll_jobs()
+
+    def _submit_job(self, provider: str, items: List[tuple]) -> None:
+        futures = {request.custom_id: future for request, future in items}
+        try:
+            job_id = self.backends[provider].submit([request for request, _ in items])
+        except Exception as e:
+            LLM_BATCH_JOBS.inc(provider=provider, status="submit_failed")
+            logger.warning("Batch submission to %s failed: %s", provider, e,
+                           extra={"event": "llm_batch_submit_failed", "provider": provider})
+            for future in futures.values():
+                future.set_result(BatchResult(error=f"batch submission failed: {e}"))
+            return
+        self.jobs_submitted += 1
+        logger.info("📦 Submitted %d %s requests as batch %s", len(items), provider, job_id,
+                    extra={"event": "llm_batch_submitted", "provider": provider, "requests": len(items)})
+        with self._cond:
+            self._jobs.append(_Job(provider, job_id, futures, self.poll_seconds))
+
+    def _poll_jobs(self) -> None:
+        now = time.monotonic()
+        with self._cond:
+            due = [job for job in self._jobs if job.next_poll <= now]
+        for job in due:
+            try:
+                results = self.backends[job.provider].poll(job.job_id)
+            except Exception as e:
+                logger.warning("Polling batch %s failed: %s", job.job_id, e,
+                               extra={"event": "llm_batch_poll_failed", "provider": job.provider})
+                results = None
+            expired = results is None and now - job.submitted_at >= self.timeout_seconds
+            if results is None and not expired:
+                job.next_poll = now + self.poll_seconds
+                continue
+            with self._cond:
+                self._jobs.remove(job)
+            LLM_BATCH_JOBS.inc(provider=job.provider, status="expired" if expired else "completed")
+            for custom_id, future in job.futures.items():
+                result = (results or {}).get(custom_id) or BatchResult(error=f"no result in batch {job.job_id}")
+                future.set_result(result)
+            logger.info("📦 Batch %s finished after %.1fs", job.job_id, now - job.submitted_at,
+                        extra={"event": "llm_batch_finished", "provider": job.provider})
+
+
+@contextmanager
+def batch_mode(collector: Optional[BatchCollector] = None) -> Iterator[BatchCollector]:
+    """
+    Send LLM calls made inside the block (and in tasks/threads started in it) through batch jobs.
+
+    A collector created here is closed, after its outstanding jobs finish, on exit.
+    """
+    owned = collector is None
+    collector = collector or BatchCollector.from_config()
+    token = _batch.set(collector)
+    try:
+        yield collector
+    finally:
+        _batch.reset(token)
+        if owned:
+            collector.close()
+
+
+def current_batch() -> Optional[BatchCollector]:
+    return _batch.get()
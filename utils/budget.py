@@ -0,0 +1,164 @@
+"""
+Request Budgets - per-analysis deadline and LLM token budget
+
+run_analysis attaches a RequestBudget to the shared store
+(shared["request_budget"]); nodes consult it before optional or expensive
+LLM work and degrade instead of overrunning:
+
+- exhausted (deadline passed or tokens spent): use local/default data
+- low (less than half of either budget left): skip optional calls
+  (market sentiment, AI market analysis) and shorten the AI analysis
+
+Each degradation is recorded and ends up in final_report["budget"].
+Token spend is read from the analysis' usage ledger (utils.usage).
+
+While run_within_budget awaits a call, the budget's deadline is also set
+as the current deadline (deadline_scope), so call_llm stops retrying and
+falling back when the analysis runs out of time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from .usage import UsageLedger
+
+# Below this share of the deadline or token budget, optional LLM work is skipped
+LOW_BUDGET_FRACTION = 0.5
+
+_deadline: ContextVar[Optional[float]] = ContextVar("offercompare_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """Make `deadline` (time.monotonic()) the current deadline for the block; nested scopes only tighten it."""
+    token = _deadline.set(effective_deadline(deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def effective_deadline(deadline: Optional[float] = None) -> Optional[float]:
+    """The earlier of `deadline` and the current scope's deadline (None if neither)."""
+    current = _deadline.get()
+    if deadline is None or current is None:
+        return current if deadline is None else deadline
+    return min(deadline, current)
+
+
+class RequestBudget:
+    """Deadline (seconds from creation) and token budget; None means unlimited."""
+
+    def __init__(self, deadline_seconds: Optional[float] = None, token_budget: Optional[int] = None,
+                 ledger: Optional[UsageLedger] = None, low_fraction: float = LOW_BUDGET_FRACTION) -> None:
+        self.deadline_seconds = deadline_seconds or None
+        self.token_budget = token_budget or None
+        self.ledger = ledger
+        self.low_fraction = low_fraction
+        self.started = time.monotonic()
+        self.degradations: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self) -> bool:
+        return self.deadline_seconds is not None or self.token_budget is not None
+
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started
+
+    def deadline(self) -> Optional[float]:
+        """The deadline as a time.monotonic() value."""
+        return self.started + self.deadline_seconds if self.deadline_seconds is not None else None
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.deadline_seconds is None:
+            return None
+        return self.deadline_seconds - self.elapsed_seconds()
+
+    def tokens_used(self) -> int:
+        return self.ledger.billed_tokens() if self.ledger is not None else 0
+
+    def remaining_tokens(self) -> Optional[int]:
+        if self.token_budget is None:
+            return None
+        return self.token_budget - self.tokens_used()
+
+    def exhaustion_reason(self) -> Optional[str]:
+        """Why no more LLM work should start, or None if budget remains."""
+        seconds, tokens = self.remaining_seconds(), self.remaining_tokens()
+        if seconds is not None and seconds <= 0:
+            return "deadline reached"
+        if tokens is not None and tokens <= 0:
+            return "token budget spent"
+        return None
+
+    def exhausted(self) -> bool:
+        return self.exhaustion_reason() is not None
+
+    def low(self) -> bool:
+        """True when less than low_fraction of the deadline or token budget remains."""
+        seconds, tokens = self.remaining_seconds(), self.remaining_tokens()
+        if seconds is not None and seconds < self.deadline_seconds * self.low_fraction:
+            return True
+        return tokens is not None and tokens < self.token_budget * self.low_fraction
+
+    def degrade(self, node: str, action: str, reason: str, **context: Any) -> None:
+        entry = {
+            "node": node,
+            "action": action,
+            "reason": reason,
+            "elapsed_ms": round(self.elapsed_seconds() * 1000, 1),
+            "tokens_used": self.tokens_used(),
+            **context,
+        }
+        with self._lock:
+            self.degradations.append(entry)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            degradations = list(self.degradations)
+        return {
+            "deadline_seconds": self.deadline_seconds,
+            "token_budget": self.token_budget,
+            "elapsed_seconds": round(self.elapsed_seconds(), 3),
+            "tokens_used": self.tokens_used(),
+            "degraded": bool(degradations),
+            "degradations": degradations,
+        }
+
+
+async def run_within_budget(budget: Optional[RequestBudget], node: str, action: str,
+                            call: Callable[[], Awaitable[Any]], fallback: Callable[[], Any],
+                            **context: Any) -> Any:
+    """
+    Await call() within the remaining deadline.
+
+    Returns fallback() instead (recording `action` as a degradation) when
+    the budget is already exhausted or the deadline passes mid-call. LLM
+    calls made by call() see the deadline and stop retrying at it; one
+    already in flight may finish in its worker thread, but the analysis no
+    longer waits for it.
+    """
+    if budget is None:
+        return await call()
+    reason = budget.exhaustion_reason()
+    if reason is None:
+        try:
+            # The task wait_for creates copies the context, deadline included
+            with deadline_scope(budget.deadline()):
+                return await asyncio.wait_for(call(), budget.remaining_seconds())
+        except asyncio.TimeoutError:
+            reason = "deadline reached"
+        except Exception:
+            # e.g. call_llm giving up at the deadline just before wait_for does
+            reason = budget.exhaustion_reason()
+            if reason is None:
+                raise
+    budget.degrade(node, action, reason, **context)
+    return fallback()
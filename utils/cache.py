@@ -12,6 +12,9 @@ import time
 import hashlib
 from typing import Any, Optional
 
+from .metrics import record_cache_lookup
+from .tracing import span
+
 
 def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
@@ -87,12 +90,15 @@ def cached_call(namespace: str, ttl_seconds: int, key_parts: list[Any]):
 
     def _wrapper(fn):
         def inner():
-            cached_value = cache_get(key, namespace)
-            if cached_value is not None:
-                return cached_value
-            value = fn()
-            cache_set(key, value, namespace, ttl_seconds)
-            return value
+            with span(f"cache:{namespace}", namespace=namespace) as cache_span:
+                cached_value = cache_get(key, namespace)
+                record_cache_lookup(namespace, cached_value is not None)
+                cache_span.set(cache_hit=cached_value is not None)
+                if cached_value is not None:
+                    return cached_value
+                value = fn()
+                cache_set(key, value, namespace, ttl_seconds)
+                return value
 
         return inner
 
@@ -1,17 +1,35 @@
 """
 Enhanced LLM Interface - Multi-provider support
-Supports OpenAI GPT, Google Gemini, and Anthropic Claude with automatic fallback
+Supports OpenAI GPT, Google Gemini, and Anthropic Claude with automatic fallback,
+skipping providers whose circuit breaker is open
 """
 
 import os
 import json
-from typing import Optional, Dict, Any
-from dotenv import load_dotenv
+import importlib
+import random
+import threading
+import time
+from functools import partial
+from typing import Optional, Dict, Any, List
 from .config import get_config
 from .cache import cached_call
+from .metrics import LLM_ERRORS, LLM_HEDGES, LLM_LATENCY, LLM_RETRIES
+from .budget import effective_deadline
+from .tracing import span
+from .log import get_logger
+from .fake_llm import call_llm_fake
+from . import replay_llm
+from .batch_llm import BatchRequest, current_batch
+from .hedging import BACKUP, hedged_call
+from .structured import StructuredOutputError, parse_structured, repair_prompt
+from .provider_health import CLOSED, provider_health
+from .semantic_cache import semantic_cache, semantic_cache_applies, semantic_partition
+from .usage import capture_provider_usage, record_llm_call, report_provider_usage
 
-# Load environment variables
-load_dotenv()
+# .env is loaded once, by utils.config (imported above)
+
+logger = get_logger(__name__)
 
 # Available AI providers
 AI_PROVIDERS = {
@@ -23,44 +41,206 @@ AI_PROVIDERS = {
     "gemini": {
         "name": "Google Gemini",
         "env_key": "GEMINI_API_KEY", 
-        "models": ["gemini-2.5-flash", "gemini-1.5-pro", "gemini-pro"]
+        "models": ["gemini-2.5-flash", "gemini-1.5-pro", "gemini-1.5-flash", "gemini-pro"]
     },
     "anthropic": {
         "name": "Anthropic Claude",
         "env_key": "ANTHROPIC_API_KEY",
         "models": ["claude-3-5-sonnet-20241022", "claude-3-haiku-20240307"]
+    },
+    # Offline deterministic provider for benchmarks/load tests (see utils/fake_llm.py)
+    "fake": {
+        "name": "Fake LLM (simulated)",
+        "env_key": "OFFERCOMPARE_FAKE_LLM",
+        "models": ["fake-model"]
+    },
+    # Recorded real responses, replayed offline for load tests (see utils/replay_llm.py)
+    "replay": {
+        "name": "Replay (recorded responses)",
+        "env_key": "OFFERCOMPARE_REPLAY_LLM",
+        "models": ["replay"]
     }
 }
 
+# Offline providers, by precedence. While one is enabled, real providers are neither
+# the default nor fallbacks, so API keys in the environment (or .env) are never used
+OFFLINE_PROVIDERS = ("replay", "fake")
+
+# Model per tier and provider: "fast" for high-volume simple calls, "strong" for analysis
+MODEL_TIERS = {
+    "openai": {"fast": "gpt-4o-mini", "strong": "gpt-4o"},
+    "gemini": {"fast": "gemini-1.5-flash", "strong": "gemini-2.5-flash"},
+    "anthropic": {"fast": "claude-3-haiku-20240307", "strong": "claude-3-5-sonnet-20241022"},
+    "fake": {"fast": "fake-model", "strong": "fake-model"},
+    "replay": {"fast": "replay", "strong": "replay"},
+}
+
+# Default tier per call purpose; override with OFFERCOMPARE_MODEL_ROUTING="purpose=tier,..."
+PURPOSE_TIERS = {
+    "extraction": "fast",      # JSON metrics pulled out of company research
+    "sentiment": "fast",       # market sentiment summary
+    "recommendation": "fast",        # decision framework
+    "offer_recommendation": "fast",  # per-offer recommendation
+    "research": "strong",            # company research write-up
+    "analysis": "strong",            # comprehensive offer analysis
+    "market_analysis": "strong",     # AI market analysis of a single offer
+}
+
+def get_purpose_tier(purpose: Optional[str]) -> Optional[str]:
+    """Model tier for a call purpose, after config overrides; None means the provider default."""
+    if not purpose:
+        return None
+    routing = get_config().model_routing.strip().lower()
+    if routing in {"off", "0", "false", "none"}:
+        return None
+    tiers = dict(PURPOSE_TIERS)
+    for entry in filter(None, (part.strip() for part in routing.split(","))):
+        name, _, tier = entry.partition("=")
+        if tier.strip() in {"fast", "strong"}:
+            tiers[name.strip()] = tier.strip()
+        else:
+            logger.warning("Ignoring model routing entry %r (tier must be fast or strong)", entry,
+                           extra={"event": "model_routing_invalid"})
+    return tiers.get(purpose)
+
 def get_available_providers():
-    """Get list of available AI providers based on API keys."""
+    """Get list of available AI providers based on API keys; only the offline ones if any is enabled."""
     available = []
     for provider_id, config in AI_PROVIDERS.items():
         if os.environ.get(config["env_key"]):
             available.append(provider_id)
-    return available
+    offline = [provider for provider in OFFLINE_PROVIDERS if provider in available]
+    return offline or available
+
+def offline_mode() -> bool:
+    """Whether an offline provider (replay, fake) is enabled."""
+    return any(os.environ.get(AI_PROVIDERS[provider]["env_key"]) for provider in OFFLINE_PROVIDERS)
 
 def get_default_provider():
     """Get the default AI provider from environment or first available."""
+    available = get_available_providers()
+    
     # Check environment setting
     default = os.environ.get("DEFAULT_AI_PROVIDER", "").lower()
-    if default in AI_PROVIDERS and os.environ.get(AI_PROVIDERS[default]["env_key"]):
+    if default in available:
         return default
     
     # Use first available provider
-    available = get_available_providers()
     if available:
         return available[0]
     
     return None
 
+# HTTP statuses worth retrying: request timeout, conflict, rate limit and transient server errors
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+class LLMProviderError(Exception):
+    """A failed provider call; retryable for timeouts, rate limits and 5xx responses."""
+    
+    def __init__(self, message: str, provider: Optional[str] = None, status_code: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class LLMDeadlineExceeded(LLMProviderError):
+    """The call's deadline passed before any provider answered."""
+
+class LLMCallCancelled(LLMProviderError):
+    """A hedged call stopped retrying because the other provider answered first."""
+
+def _classify_error(error: Exception) -> tuple:
+    """(status_code, retryable, retry_after) for an SDK or provider exception."""
+    if isinstance(error, LLMProviderError):
+        return error.status_code, error.retryable, error.retry_after
+    status = getattr(error, "status_code", None)
+    if not isinstance(status, int):
+        # google.api_core exceptions carry the HTTP status as .code
+        code = getattr(error, "code", None)
+        status = code if isinstance(code, int) else None
+    transient = isinstance(error, (TimeoutError, ConnectionError)) or any(
+        word in type(error).__name__ for word in ("Timeout", "Connection", "ServiceUnavailable"))
+    retryable = transient or status in RETRYABLE_STATUS or (status is not None and status >= 500)
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        retry_after = None
+    return status, retryable, retry_after
+
+def _provider_error(label: str, provider: str, error: Exception) -> LLMProviderError:
+    status, retryable, retry_after = _classify_error(error)
+    return LLMProviderError(f"{label} API error: {str(error)}", provider, status, retryable, retry_after)
+
+# Provider SDKs are imported on first use (or by prewarm_providers), never at module import
+SDK_MODULES = {
+    "openai": "openai",
+    "gemini": "google.generativeai",
+    "anthropic": "anthropic",
+}
+
+_clients: Dict[tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+def _create_client(provider: str, api_key: Optional[str]):
+    sdk = importlib.import_module(SDK_MODULES[provider])
+    # Retries are handled by call_llm, across providers and within the deadline
+    if provider == "openai":
+        return sdk.OpenAI(api_key=api_key, max_retries=0)
+    if provider == "anthropic":
+        return sdk.Anthropic(api_key=api_key, max_retries=0)
+    # google.generativeai is configured module-wide
+    sdk.configure(api_key=api_key)
+    return sdk
+
+def get_client(provider: str):
+    """
+    Shared SDK client for a provider, created on first use.
+    
+    Clients are cached per API key and reused across calls (and threads),
+    which keeps their HTTP connection pools warm.
+    """
+    api_key = os.environ.get(AI_PROVIDERS[provider]["env_key"])
+    key = (provider, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = _create_client(provider, api_key)
+    return client
+
+def prewarm_providers(providers: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Import the SDKs and build the clients of the available providers ahead of the first request.
+    
+    Returns:
+        dict: provider -> milliseconds spent, or "error: ..." (missing SDK, bad config)
+    """
+    results = {}
+    for provider in providers or get_available_providers():
+        if provider not in SDK_MODULES:
+            continue
+        started = time.perf_counter()
+        try:
+            get_client(provider)
+            results[provider] = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            results[provider] = f"error: {e}"
+            logger.warning("Could not prewarm %s: %s", provider, e, extra={"event": "llm_prewarm_failed"})
+    return results
+
+# OpenAI models that accept response_format={"type": "json_schema"}; others get json_object
+JSON_SCHEMA_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1", "o1", "o3", "o4")
+
 def call_llm_openai(prompt: str, model: str = "gpt-4o", temperature: float = 0.7, 
-                   max_tokens: Optional[int] = None, system_prompt: Optional[str] = None) -> str:
+                   max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
+                   timeout: Optional[float] = None, response_format: Optional[Dict] = None) -> str:
     """Call OpenAI API."""
     try:
-        from openai import OpenAI
-        
-        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        client = get_client("openai")
         
         messages = []
         if system_prompt:
@@ -75,21 +255,27 @@ def call_llm_openai(prompt: str, model: str = "gpt-4o", temperature: float = 0.7
         
         if max_tokens:
             kwargs["max_tokens"] = max_tokens
+        if timeout:
+            kwargs["timeout"] = timeout
+        if response_format:
+            if response_format.get("type") == "json_schema" and not model.startswith(JSON_SCHEMA_MODEL_PREFIXES):
+                response_format = {"type": "json_object"}
+            kwargs["response_format"] = response_format
         
         response = client.chat.completions.create(**kwargs)
+        usage = getattr(response, "usage", None)
+        report_provider_usage(getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
         return response.choices[0].message.content
         
     except Exception as e:
-        raise Exception(f"OpenAI API error: {str(e)}")
+        raise _provider_error("OpenAI", "openai", e) from e
 
 def call_llm_gemini(prompt: str, model: str = "gemini-1.5-flash", temperature: float = 0.7,
-                   max_tokens: Optional[int] = None, system_prompt: Optional[str] = None) -> str:
+                   max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
+                   timeout: Optional[float] = None, response_format: Optional[Dict] = None) -> str:
     """Call Google Gemini API."""
     try:
-        import google.generativeai as genai
-        
-        # Configure API key
-        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+        genai = get_client("gemini")
         
         # Create model instance
         model_instance = genai.GenerativeModel(model)
@@ -105,25 +291,32 @@ def call_llm_gemini(prompt: str, model: str = "gemini-1.5-flash", temperature: f
         }
         if max_tokens:
             generation_config["max_output_tokens"] = max_tokens
+        if response_format:
+            # Native JSON mode; Gemini's response_schema dialect is narrower than JSON Schema, so
+            # the schema itself is enforced by call_llm_structured's validation
+            generation_config["response_mime_type"] = "application/json"
         
         # Generate response
         response = model_instance.generate_content(
             full_prompt,
-            generation_config=generation_config
+            generation_config=generation_config,
+            request_options={"timeout": timeout} if timeout else None
         )
         
+        usage = getattr(response, "usage_metadata", None)
+        report_provider_usage(getattr(usage, "prompt_token_count", None),
+                              getattr(usage, "candidates_token_count", None))
         return response.text
         
     except Exception as e:
-        raise Exception(f"Gemini API error: {str(e)}")
+        raise _provider_error("Gemini", "gemini", e) from e
 
 def call_llm_anthropic(prompt: str, model: str = "claude-3-5-sonnet-20241022", temperature: float = 0.7,
-                      max_tokens: Optional[int] = None, system_prompt: Optional[str] = None) -> str:
+                      max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
+                      timeout: Optional[float] = None, response_format: Optional[Dict] = None) -> str:
     """Call Anthropic Claude API."""
     try:
-        import anthropic
-        
-        client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+        client = get_client("anthropic")
         
         kwargs = {
             "model": model,
@@ -134,114 +327,398 @@ def call_llm_anthropic(prompt: str, model: str = "claude-3-5-sonnet-20241022", t
         
         if system_prompt:
             kwargs["system"] = system_prompt
+        if timeout:
+            kwargs["timeout"] = timeout
+        if response_format:
+            # No JSON mode: prefill the assistant turn so the reply starts inside the object
+            kwargs["messages"].append({"role": "assistant", "content": "{"})
         
         response = client.messages.create(**kwargs)
-        return response.content[0].text
+        usage = getattr(response, "usage", None)
+        report_provider_usage(getattr(usage, "input_tokens", None), getattr(usage, "output_tokens", None))
+        text = response.content[0].text
+        return "{" + text if response_format else text
         
     except Exception as e:
-        raise Exception(f"Claude API error: {str(e)}")
+        raise _provider_error("Claude", "anthropic", e) from e
 
 def call_llm(prompt: str, model: Optional[str] = None, temperature: float = 0.7, 
             max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
-            provider: Optional[str] = None) -> str:
+            provider: Optional[str] = None, deadline: Optional[float] = None,
+            purpose: Optional[str] = None, response_format: Optional[Dict] = None) -> str:
     """
     Enhanced LLM interface with multi-provider support and automatic fallback.
     
+    Providers whose circuit breaker is open (see utils/provider_health.py)
+    are skipped; each remaining provider is tried at most once, the
+    requested one first and the others by health score. With hedging on
+    (utils/hedging.py) a slow call is raced against the next provider.
+    
+    Every provider request has a timeout (OFFERCOMPARE_LLM_TIMEOUT), and
+    retryable failures (timeouts, 429, 5xx) are retried with jittered
+    exponential backoff before falling back. Retries and fallbacks stop at
+    the deadline: the earlier of `deadline` and the enclosing request
+    budget's (utils.budget.deadline_scope).
+    
+    Inside utils.batch_llm.batch_mode() the request goes into a provider
+    batch job instead, and this call waits for the job's result. With the
+    semantic cache on (utils/semantic_cache.py), purposes it covers reuse
+    the response of a near-duplicate earlier prompt.
+    
     Args:
         prompt (str): The user prompt
         model (str): Model to use (optional, will use provider default)
         temperature (float): Creativity level (0.0-1.0)
         max_tokens (int): Maximum response length
         system_prompt (str): Optional system message
-        provider (str): AI provider to use (openai, gemini, anthropic)
+        provider (str): AI provider to use (openai, gemini, anthropic, fake)
+        deadline (float): Absolute time.monotonic() by which to give up
+        purpose (str): What the call is for (see PURPOSE_TIERS); picks each
+            provider's fast or strong model when no model is given
+        response_format (dict): Ask for JSON via the provider's native mode
+            (see call_llm_structured, which also validates the result)
     
     Returns:
         str: Model response
+    
+    Raises:
+        LLMDeadlineExceeded: If the deadline passes before a provider answers
+        ReplayMissError: If the replay provider has no recording (never falls back)
     """
     
-    # Determine provider to use
-    if not provider:
+    # Determine provider to use; in offline mode a real provider is never called, even if requested
+    if not provider or (offline_mode() and provider not in OFFLINE_PROVIDERS):
         provider = get_default_provider()
     
     if not provider:
         raise Exception("No AI provider available. Please set API keys in .env file.")
     
-    # Select default model for provider if not specified
-    if not model:
-        model = AI_PROVIDERS[provider]["models"][0]
+    tier = get_purpose_tier(purpose) if not model else None
+    partition = None
+    if semantic_cache_applies(purpose):
+        partition = semantic_partition(purpose, system_prompt, model, temperature, max_tokens, response_format)
+        hit = semantic_cache.get(prompt, partition)
+        if hit is not None:
+            entry, score = hit
+            logger.debug("♻️ Reusing a cached response for a near-duplicate %s prompt (similarity %.3f)", purpose,
+                         score, extra={"event": "llm_semantic_hit", "similarity": score})
+            prompt_text = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+            record_llm_call(entry.provider, entry.model, prompt_text, entry.response, 0.0, cached=True)
+            return entry.response
     
-    # Route to appropriate provider
-    try:
-        config = get_config()
-        cache_enabled = config.enable_cache
-        ttl = config.cache_ttl_seconds
-        cache_key_parts = ["llm", provider, model, temperature, max_tokens, system_prompt or "", prompt]
-        
-        def _dispatch():
-            if provider == "openai":
-                return call_llm_openai(prompt, model, temperature, max_tokens, system_prompt)
-            elif provider == "gemini":
-                return call_llm_gemini(prompt, model, temperature, max_tokens, system_prompt)
-            elif provider == "anthropic":
-                return call_llm_anthropic(prompt, model, temperature, max_tokens, system_prompt)
+    response, answered_by, answered_model = _call_with_fallback(prompt, provider, model, tier, temperature, max_tokens,
+                                                                system_prompt, deadline, response_format)
+    if partition is not None:
+        semantic_cache.put(prompt, partition, response, answered_by, answered_model)
+    return response
+
+def _call_with_fallback(prompt: str, provider: str, model: Optional[str], tier: Optional[str], temperature: float,
+                        max_tokens: Optional[int], system_prompt: Optional[str], deadline: Optional[float],
+                        response_format: Optional[Dict]) -> tuple:
+    """
+    Try provider, then the healthy fallbacks, with retries and optional hedging (see call_llm).
+
+    Returns:
+        tuple: (response, provider, model) of the call that answered
+    """
+    config = get_config()
+    deadline = effective_deadline(deadline)
+    candidates = provider_health.candidates(provider, get_available_providers())
+    tried = set()
+    last_error = None
+    for candidate in candidates:
+        if candidate in tried:
+            continue
+        if deadline is not None and time.monotonic() >= deadline:
+            raise LLMDeadlineExceeded("LLM call deadline exceeded", candidate) from last_error
+        if not provider_health.allow(candidate):
+            logger.info("⏭️ %s circuit open, skipping", candidate,
+                        extra={"event": "llm_circuit_open", "provider": candidate})
+            continue
+        if last_error is not None:
+            logger.warning("⚠️ LLM call failed, trying %s...", candidate,
+                           extra={"event": "llm_fallback", "provider": candidate, "error": str(last_error)})
+        tried.add(candidate)
+        candidate_model = _model_for(candidate, provider, model, tier)
+        call = partial(_call_with_retries, prompt, candidate, candidate_model,
+                       temperature, max_tokens, system_prompt, deadline, response_format)
+        # Batched calls wait for a batch job by design; racing them would only duplicate work.
+        # A replay miss must surface, not lose a race to another provider's answer
+        hedge = config.hedge_enabled and current_batch() is None and candidate != "replay"
+        partner = _hedge_partner(candidate, candidates, tried) if hedge else None
+        try:
+            if partner is None:
+                return call(), candidate, candidate_model
+            partner_model = _model_for(partner, provider, model, tier)
+            response, winner = _call_hedged(call, candidate, partner, tried, config,
+                                            partial(_call_with_retries, prompt, partner, partner_model, temperature,
+                                                    max_tokens, system_prompt, deadline, response_format))
+            if winner == BACKUP:
+                return response, partner, partner_model
+            return response, candidate, candidate_model
+        except replay_llm.ReplayMissError:
+            raise  # a gap in the corpus: answering from another provider would hide it
+        except Exception as e:
+            last_error = e
+    
+    if last_error is not None:
+        raise last_error
+    # Every circuit is open: try the requested provider rather than fail without a call
+    requested_model = _model_for(provider, provider, model, tier)
+    return _call_with_retries(prompt, provider, requested_model, temperature, max_tokens, system_prompt, deadline,
+                              response_format), provider, requested_model
+
+def _backoff_delay(attempt: int, retry_after: Optional[float], config) -> float:
+    """Full-jitter exponential backoff, at least the provider's Retry-After."""
+    delay = random.uniform(0, min(config.llm_backoff_max_seconds, config.llm_backoff_base_seconds * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+def _call_with_retries(prompt: str, provider: str, model: str, temperature: float, max_tokens: Optional[int],
+                       system_prompt: Optional[str], deadline: Optional[float],
+                       response_format: Optional[Dict] = None, cancel: Optional[threading.Event] = None) -> str:
+    """
+    Call one provider, retrying retryable failures while retries, deadline and its circuit allow.
+    A set cancel event (the hedge was won by the other provider) stops it before the next attempt.
+    """
+    config = get_config()
+    attempt = 0
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise LLMCallCancelled("LLM call cancelled: the hedged call was answered elsewhere", provider)
+        timeout = config.llm_timeout_seconds or None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMDeadlineExceeded("LLM call deadline exceeded", provider)
+            timeout = min(timeout, remaining) if timeout else remaining
+        try:
+            return _call_single_provider(prompt, provider, model, temperature, max_tokens, system_prompt, timeout,
+                                         response_format, deadline, cancel)
+        except Exception as e:
+            status, retryable, retry_after = _classify_error(e)
+            if not retryable or attempt >= config.llm_max_retries:
+                raise
+            delay = _backoff_delay(attempt, retry_after, config)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            if not provider_health.allow(provider):
+                raise
+            attempt += 1
+            LLM_RETRIES.inc(provider=provider)
+            logger.info("🔁 %s failed (%s), retry %d in %.2fs", provider, status or type(e).__name__, attempt, delay,
+                        extra={"event": "llm_retry", "provider": provider, "attempt": attempt, "error": str(e)})
+            if cancel is not None:
+                cancel.wait(delay)  # wakes early if the hedge is decided while backing off
             else:
-                raise Exception(f"Unknown provider: {provider}")
+                time.sleep(delay)
 
-        if cache_enabled:
-            return cached_call("llm", ttl, cache_key_parts)(_dispatch)()
+def _hedge_partner(candidate: str, candidates, tried) -> Optional[str]:
+    """The next untried provider with a closed circuit, to race against candidate."""
+    for other in candidates:
+        if other != candidate and other not in tried and provider_health.state(other) == CLOSED:
+            return other
+    return None
+
+def _call_hedged(call, provider: str, partner: str, tried, config, partner_call) -> tuple:
+    """
+    Run call(cancel); if it is slower than provider's recent tail latency, race partner_call(cancel)
+    against it. Both are _call_with_retries partials; the loser's cancel event ends its retries.
+    Returns (response, PRIMARY or BACKUP).
+    """
+    delay = provider_health.latency_percentile(provider, config.hedge_percentile)
+    if delay is None:
+        delay = config.hedge_delay_seconds
+    
+    def backup(cancel):
+        tried.add(partner)
+        logger.info("🏁 %s slower than %.2fs, hedging with %s", provider, delay, partner,
+                    extra={"event": "llm_hedge", "provider": provider, "backup": partner})
+        return partner_call(cancel)
+    
+    response, winner = hedged_call(call, backup, delay)
+    if partner in tried:
+        LLM_HEDGES.inc(provider=partner, winner=winner)
+    return response, winner
+
+def _model_for(candidate: str, requested_provider: str, model: Optional[str], tier: Optional[str] = None) -> str:
+    """
+    The requested model, unless it belongs to another provider; otherwise
+    the candidate's model for the tier, else its default.
+    """
+    if model and (candidate == requested_provider or model in AI_PROVIDERS[candidate]["models"]):
+        return model
+    if tier and tier in MODEL_TIERS.get(candidate, {}):
+        return MODEL_TIERS[candidate][tier]
+    return AI_PROVIDERS[candidate]["models"][0]
+
+def _call_single_provider(prompt: str, provider: str, model: str, temperature: float,
+                          max_tokens: Optional[int], system_prompt: Optional[str],
+                          timeout: Optional[float] = None, response_format: Optional[Dict] = None,
+                          deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> str:
+    """
+    One provider request (or cache hit) with metrics, usage and health accounting.
+    A batched request waits for its job until deadline or cancel, not for the per-call timeout.
+    """
+    config = get_config()
+    cache_enabled = config.enable_cache
+    ttl = config.cache_ttl_seconds
+    cache_key_parts = ["llm", provider, model, temperature, max_tokens, system_prompt or "", prompt]
+    if response_format:
+        cache_key_parts.append(response_format)
+    prompt_text = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+    dispatched = False
+    
+    def _dispatch():
+        nonlocal dispatched
+        dispatched = True
+        batch = current_batch()
+        if batch is not None and batch.supports(provider):
+            return _dispatch_batched(batch)
+        started = time.perf_counter()
+        response, failed = None, False
+        with capture_provider_usage() as reported:
+            try:
+                with span(f"llm_request:{provider}", provider=provider, model=model, prompt_chars=len(prompt)):
+                    response = _call_provider()
+                return response
+            except Exception:
+                failed = True
+                LLM_ERRORS.inc(provider=provider, model=model)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                LLM_LATENCY.observe(elapsed, provider=provider, model=model)
+                provider_health.record(provider, not failed, elapsed)
+                record_llm_call(provider, model, prompt_text, response, elapsed, reported, error=failed)
+                if not failed and provider not in ("replay", "fake") and replay_llm.recording():
+                    _record_for_replay(prompt, system_prompt, response_format, provider, model, response,
+                                       elapsed, reported)
+
+    def _dispatch_batched(batch):
+        # Queue time is not provider latency, so neither the latency metric nor health sees it
+        started = time.perf_counter()
+        with span(f"llm_batch:{provider}", provider=provider, model=model, prompt_chars=len(prompt)):
+            try:
+                result = batch.submit(BatchRequest("", provider, model, prompt, temperature, max_tokens,
+                                                   system_prompt, response_format), deadline, cancel)
+            except TimeoutError:
+                if cancel is not None and cancel.is_set():
+                    raise LLMCallCancelled("LLM call cancelled while waiting for its batch job", provider)
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise LLMDeadlineExceeded("LLM call deadline exceeded while waiting for its batch job", provider)
+                raise
+        reported = {key: value for key, value in (("input_tokens", result.input_tokens),
+                                                  ("output_tokens", result.output_tokens)) if value is not None}
+        failed = result.error is not None
+        if failed:
+            LLM_ERRORS.inc(provider=provider, model=model)
+        record_llm_call(provider, model, prompt_text, result.text, time.perf_counter() - started, reported,
+                        error=failed, batched=True)
+        if failed:
+            raise LLMProviderError(f"{provider} batch error: {result.error}", provider, result.status_code,
+                                   result.status_code in RETRYABLE_STATUS)
+        return result.text
+
+    def _call_provider():
+        args = (prompt, model, temperature, max_tokens, system_prompt, timeout)
+        if response_format:
+            args += (response_format,)
         if provider == "openai":
-            return call_llm_openai(prompt, model, temperature, max_tokens, system_prompt)
+            return call_llm_openai(*args)
         elif provider == "gemini":
-            return call_llm_gemini(prompt, model, temperature, max_tokens, system_prompt)
+            return call_llm_gemini(*args)
         elif provider == "anthropic":
-            return call_llm_anthropic(prompt, model, temperature, max_tokens, system_prompt)
+            return call_llm_anthropic(*args)
+        elif provider == "fake":
+            return call_llm_fake(*args)
+        elif provider == "replay":
+            return replay_llm.call_llm_replay(*args)
         else:
-            raise Exception(f"Unknown provider: {provider}")
-            
+            raise LLMProviderError(f"Unknown provider: {provider}", provider)
+
+    with span("call_llm", provider=provider, model=model):
+        if cache_enabled:
+            response = cached_call("llm", ttl, cache_key_parts)(_dispatch)()
+            if not dispatched:
+                record_llm_call(provider, model, prompt_text, response, 0.0, cached=True)
+            return response
+        return _dispatch()
+
+def _record_for_replay(*args) -> None:
+    # A corpus write failure must not fail the call it records
+    try:
+        replay_llm.record_response(*args)
     except Exception as e:
-        # Try fallback to another provider
-        available_providers = get_available_providers()
-        if len(available_providers) > 1:
-            fallback_providers = [p for p in available_providers if p != provider]
-            if fallback_providers:
-                print(f"⚠️ {provider} failed, trying {fallback_providers[0]}...")
-                return call_llm(prompt, model, temperature, max_tokens, system_prompt, fallback_providers[0])
-        
-        raise e
+        logger.warning("Could not record response for replay: %s", e, extra={"event": "llm_replay_record_failed"})
 
 def call_llm_structured(prompt: str, model: Optional[str] = None, response_format: Optional[Dict] = None, 
-                       system_prompt: Optional[str] = None, provider: Optional[str] = None) -> str:
+                       system_prompt: Optional[str] = None, provider: Optional[str] = None,
+                       deadline: Optional[float] = None, purpose: Optional[str] = "extraction",
+                       schema: Optional[Dict[str, Any]] = None) -> str:
     """
     Call LLM with structured output (JSON mode).
     
+    JSON is requested through the provider's native mode where it has one,
+    then parsed and validated; malformed output is repaired locally or, if
+    that fails, by one call to the fast model (see utils.structured).
+    
     Args:
         prompt (str): The user prompt
         model (str): Model to use
         response_format (dict): Response format specification
         system_prompt (str): Optional system message
         provider (str): AI provider to use
+        deadline (float): Absolute time.monotonic() by which to give up
+        purpose (str): Call purpose for model routing (default "extraction")
+        schema (dict): JSON Schema the response must match; implies JSON mode
     
     Returns:
-        str: Structured model response
+        str: Structured model response (normalized JSON when it could be parsed)
+    
+    Raises:
+        StructuredOutputError: If a schema was given and no valid response was obtained
     """
     
     # Add JSON format instruction to prompt for non-OpenAI providers
     if not system_prompt:
         system_prompt = ""
     
-    if response_format and response_format.get("type") == "json_object":
+    if schema is not None:
+        response_format = {"type": "json_schema",
+                           "json_schema": {"name": "structured_response", "schema": schema}}
+    json_mode = bool(response_format) and response_format.get("type") in ("json_object", "json_schema")
+    if json_mode:
         json_instruction = "\n\nPlease respond with valid JSON format only."
         system_prompt += json_instruction
         if "json" not in prompt.lower():
             prompt += "\n\nFormat your response as JSON."
     
-    return call_llm(
+    raw = call_llm(
         prompt, 
         model=model,
         temperature=0.3,  # Lower temperature for structured output
         system_prompt=system_prompt,
-        provider=provider
+        provider=provider,
+        deadline=deadline,
+        purpose=purpose,
+        response_format=response_format if json_mode else None
     )
+    if not json_mode:
+        return raw
+    
+    def _repair(text: str, errors: List[str]) -> str:
+        return call_llm(repair_prompt(text, errors, schema), temperature=0.0, provider=provider,
+                        deadline=deadline, purpose="extraction", response_format={"type": "json_object"})
+    
+    try:
+        data = parse_structured(raw, schema, repair=_repair if schema is not None else None,
+                                purpose=purpose or "structured")
+    except StructuredOutputError:
+        if schema is not None:
+            raise
+        # Plain JSON mode keeps its old contract: hand back the raw text for the caller to handle
+        return raw
+    return json.dumps(data)
 
 def get_provider_info():
     """Get information about available AI providers."""
@@ -251,6 +728,7 @@ def get_provider_info():
     info = {
         "available_providers": available,
         "default_provider": default,
+        "model_routing": {purpose: get_purpose_tier(purpose) for purpose in PURPOSE_TIERS},
         "provider_details": {}
     }
     
@@ -259,6 +737,7 @@ def get_provider_info():
         info["provider_details"][provider_id] = {
             "name": config["name"],
             "models": config["models"],
+            "model_tiers": MODEL_TIERS.get(provider_id, {}),
             "is_default": provider_id == default
         }
     
@@ -298,32 +777,32 @@ if __name__ == "__main__":
 # Async versions for AsyncNode usage
 async def call_llm_async(prompt: str, model: Optional[str] = None, temperature: float = 0.7,
                         max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
-                        provider: Optional[str] = None) -> str:
+                        provider: Optional[str] = None, deadline: Optional[float] = None,
+                        purpose: Optional[str] = None) -> str:
     """
     Async version of call_llm for use with AsyncNode.
     For now, wraps the sync version but can be enhanced for true async calls.
     """
     import asyncio
-    # Run the sync version in an executor for now
+    # Run the sync version in a worker thread for now; to_thread keeps the
+    # caller's contextvars (tracing spans) visible inside call_llm
     # TODO: Implement true async clients for each provider
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        None, 
-        call_llm, 
-        prompt, model, temperature, max_tokens, system_prompt, provider
-    )
+    return await asyncio.to_thread(call_llm, prompt, model, temperature, max_tokens, system_prompt, provider,
+                                   deadline, purpose)
 
 async def call_llm_structured_async(prompt: str, response_format: Optional[Dict] = None,
                                    model: Optional[str] = None, temperature: float = 0.7,
                                    max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
-                                   provider: Optional[str] = None) -> str:
+                                   provider: Optional[str] = None, deadline: Optional[float] = None,
+                                   purpose: Optional[str] = "extraction",
+                                   schema: Optional[Dict[str, Any]] = None) -> str:
     """
     Async version of call_llm_structured for use with AsyncNode.
     """
     import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        None,
+    # call_llm_structured has its own parameter order and fixed temperature
+    return await asyncio.to_thread(
         call_llm_structured,
-        prompt, response_format, model, temperature, max_tokens, system_prompt, provider
+        prompt, model=model, response_format=response_format, system_prompt=system_prompt, provider=provider,
+        deadline=deadline, purpose=purpose, schema=schema
     )
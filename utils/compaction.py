@@ -0,0 +1,158 @@
+"""
+Prompt Compaction - keep LLM prompts within a token bound
+
+Prompts here are built from upstream outputs (free-text research fed into
+metrics extraction, user preference dicts, offer records), so their size
+grows with whatever the previous step produced. The helpers below bound
+that input before it reaches call_llm:
+
+- select_fields / format_fields / clip: only the fields a prompt uses,
+  one "key: value" line each, long values clipped
+- compact_text: upstream text with whitespace squeezed and, over budget,
+  the middle dropped (head and tail keep the summary and conclusions)
+- compact_prompt: the final prompt with indentation stripped and, as a
+  last resort, truncated to OFFERCOMPARE_PROMPT_MAX_TOKENS
+
+Sizes are estimated with usage.estimate_tokens (characters / 4). Tokens
+removed are counted in offercompare_prompt_tokens_trimmed_total.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from .config import get_config
+from .metrics import PROMPT_TOKENS_TRIMMED
+from .usage import CHARS_PER_TOKEN, estimate_tokens
+
+ELLIPSIS = "\n[...]\n"
+
+# Share of a truncated text kept from its start; the rest comes from its end
+HEAD_FRACTION = 0.7
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+_SPACES = re.compile(r"[ \t]+")
+
+
+def squeeze_whitespace(text: str) -> str:
+    """Strip each line, collapse runs of spaces and of blank lines."""
+    lines = (_SPACES.sub(" ", line).strip() for line in text.splitlines())
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def truncate_text(text: str, max_tokens: int, policy: str = "head_tail") -> str:
+    """
+    Cut text to about max_tokens estimated tokens.
+
+    Args:
+        text (str): Text to bound
+        max_tokens (int): Budget; 0 or less means unbounded
+        policy (str): "head" keeps the start, "head_tail" the start and the end
+
+    Returns:
+        str: text unchanged if within budget, else the kept part(s) with a [...] marker
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if max_tokens <= 0 or len(text) <= max_chars:
+        return text
+    budget = max(0, max_chars - len(ELLIPSIS))
+    if policy == "head":
+        return _cut_end(text, budget) + ELLIPSIS.rstrip()
+    head = int(budget * HEAD_FRACTION)
+    return _cut_end(text, head) + ELLIPSIS + _cut_start(text, budget - head)
+
+
+def _cut_end(text: str, chars: int) -> str:
+    # Prefer ending on a line or sentence boundary in the last fifth of the kept span
+    kept = text[:chars]
+    boundary = max(kept.rfind("\n"), kept.rfind(". "))
+    return kept[:boundary + 1].rstrip() if boundary >= chars * 0.8 else kept.rstrip()
+
+
+def _cut_start(text: str, chars: int) -> str:
+    if chars <= 0:
+        return ""
+    # Prefer starting after a line or sentence boundary in the first fifth of the kept span
+    kept = text[-chars:]
+    boundaries = [i for i in (kept.find("\n"), kept.find(". ")) if 0 <= i <= chars * 0.2]
+    return kept[min(boundaries) + 1:].lstrip() if boundaries else kept.lstrip()
+
+
+def _count_trimmed(name: str, before: str, after: str) -> None:
+    trimmed = estimate_tokens(before) - estimate_tokens(after)
+    if trimmed > 0:
+        PROMPT_TOKENS_TRIMMED.inc(trimmed, prompt=name)
+
+
+def compact_text(text: Optional[str], max_tokens: Optional[int] = None, name: str = "context") -> str:
+    """Bound upstream text embedded in a prompt (default OFFERCOMPARE_PROMPT_CONTEXT_MAX_TOKENS)."""
+    if not text:
+        return ""
+    if max_tokens is None:
+        max_tokens = get_config().prompt_context_max_tokens
+    compacted = truncate_text(squeeze_whitespace(str(text)), max_tokens)
+    _count_trimmed(name, str(text), compacted)
+    return compacted
+
+
+def clip(value: Any, max_chars: int = 120) -> str:
+    """A value as a single line of at most max_chars characters."""
+    text = _SPACES.sub(" ", str(value).replace("\n", " ")).strip()
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+def select_fields(data: Optional[Mapping[str, Any]], fields: Iterable[str]) -> Dict[str, Any]:
+    """The listed fields of data that are set (not None or empty; False and 0 are kept)."""
+    data = data or {}
+    return {field: data[field] for field in fields if not _unset(data.get(field))}
+
+
+def _unset(value: Any) -> bool:
+    # By type, not equality: 0 == 0.0 == False, so a membership test would drop them too
+    return value is None or (isinstance(value, (str, list, tuple, dict, set)) and not value)
+
+
+def format_fields(data: Optional[Mapping[str, Any]], fields: Optional[Iterable[str]] = None,
+                  max_value_chars: int = 120, max_fields: int = 20) -> str:
+    """
+    Render a dict as "key: value" lines for a prompt.
+
+    Args:
+        data (dict): Source record (e.g. user preferences)
+        fields (iterable): Keys to include, in order; None for all set fields
+        max_value_chars (int): Longer values are clipped
+        max_fields (int): Fields beyond this many are left out
+
+    Returns:
+        str: One line per set field ("none" if there are none)
+    """
+    selected = select_fields(data, fields if fields is not None else (data or {}).keys())
+    lines = []
+    for key, value in list(selected.items())[:max_fields]:
+        if isinstance(value, bool):
+            value = "yes" if value else "no"
+        elif isinstance(value, (list, tuple)):
+            value = ", ".join(str(item) for item in value)
+        lines.append(f"{clip(key, 40)}: {clip(value, max_value_chars)}")
+    return "\n".join(lines) or "none"
+
+
+def compact_prompt(prompt: str, name: str, max_tokens: Optional[int] = None) -> str:
+    """
+    Squeeze a built prompt's whitespace and bound its size.
+
+    Args:
+        prompt (str): The prompt as built (usually an indented f-string)
+        name (str): Prompt label for the trimmed-tokens metric
+        max_tokens (int): Hard bound (default OFFERCOMPARE_PROMPT_MAX_TOKENS)
+
+    Returns:
+        str: The compacted prompt; over the bound its middle is dropped, keeping the
+            opening context and the closing instructions
+    """
+    if max_tokens is None:
+        max_tokens = get_config().prompt_max_tokens
+    compacted = truncate_text(squeeze_whitespace(prompt), max_tokens)
+    _count_trimmed(name, prompt, compacted)
+    return compacted
@@ -324,6 +324,22 @@ def get_company_data(company_name: str) -> Optional[Dict[str, Any]]:
     
     return None
 
+# Alternative names mapped to the canonical database name
+COMPANY_ALIASES = {
+    "Google Inc": "Google",
+    "Alphabet": "Google", 
+    "Apple Inc": "Apple",
+    "Microsoft Corporation": "Microsoft",
+    "Amazon.com": "Amazon",
+    "Meta Platforms": "Meta",
+    "Facebook": "Meta",
+    "Instagram": "Meta",
+    "WhatsApp": "Meta"
+}
+
+# Legal-form suffixes dropped from company names
+COMPANY_SUFFIXES = [" Inc", " Inc.", " Corporation", " Corp", " Corp.", " LLC", " Ltd", " Ltd.", " Co", " Co."]
+
 def normalize_company_name(company_name: str) -> str:
     """
     Normalize company name for consistent lookup.
@@ -338,24 +354,11 @@ def normalize_company_name(company_name: str) -> str:
     name = company_name.strip()
     
     # Handle common variations
-    name_mappings = {
-        "Google Inc": "Google",
-        "Alphabet": "Google", 
-        "Apple Inc": "Apple",
-        "Microsoft Corporation": "Microsoft",
-        "Amazon.com": "Amazon",
-        "Meta Platforms": "Meta",
-        "Facebook": "Meta",
-        "Instagram": "Meta",
-        "WhatsApp": "Meta"
-    }
-    
-    if name in name_mappings:
-        return name_mappings[name]
+    if name in COMPANY_ALIASES:
+        return COMPANY_ALIASES[name]
     
     # Remove common suffixes
-    suffixes = [" Inc", " Inc.", " Corporation", " Corp", " Corp.", " LLC", " Ltd", " Ltd.", " Co", " Co."]
-    for suffix in suffixes:
+    for suffix in COMPANY_SUFFIXES:
         if name.endswith(suffix):
             name = name[:-len(suffix)]
             break
@@ -18,6 +18,44 @@ class AppConfig:
     default_ai_provider: str | None
     enable_cache: bool
     cache_ttl_seconds: int
+    analysis_store_size: int = 256
+    analysis_store_ttl_seconds: int = 3600
+    compress_min_bytes: int = 1024
+    max_concurrent_analyses: int = 8
+    max_queued_analyses: int = 32
+    queue_timeout_seconds: float = 30.0
+    max_requests_per_client: int = 4
+    trace_dir: str | None = None
+    log_level: str | None = None
+    log_format: str = "json"
+    profiling_enabled: bool = False
+    profile_dir: str = ".profiles"
+    analysis_deadline_seconds: float = 0.0
+    analysis_token_budget: int = 0
+    breaker_window: int = 20
+    breaker_min_calls: int = 5
+    breaker_error_threshold: float = 0.5
+    breaker_cooldown_seconds: float = 30.0
+    hedge_enabled: bool = False
+    hedge_percentile: float = 95.0
+    hedge_delay_seconds: float = 3.0
+    hedge_max_ratio: float = 0.1
+    llm_timeout_seconds: float = 60.0
+    llm_max_retries: int = 2
+    llm_backoff_base_seconds: float = 0.5
+    llm_backoff_max_seconds: float = 8.0
+    model_routing: str = ""
+    prewarm_providers: bool = True
+    prompt_max_tokens: int = 6000
+    prompt_context_max_tokens: int = 1500
+    batch_flush_seconds: float = 2.0
+    batch_max_requests: int = 1000
+    batch_poll_seconds: float = 30.0
+    batch_timeout_seconds: float = 86400.0
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.0
+    semantic_cache_max_entries: int = 1024
+    semantic_cache_purposes: str = "market_analysis,offer_recommendation"
 
 
 def get_config() -> AppConfig:
@@ -28,6 +66,60 @@ def get_config() -> AppConfig:
         default_ai_provider=provider.lower() if provider else None,
         enable_cache=enable_cache,
         cache_ttl_seconds=ttl,
+        analysis_store_size=int(os.environ.get("OFFERCOMPARE_ANALYSIS_STORE_SIZE", "256")),
+        analysis_store_ttl_seconds=int(os.environ.get("OFFERCOMPARE_ANALYSIS_STORE_TTL", "3600")),
+        compress_min_bytes=int(os.environ.get("OFFERCOMPARE_COMPRESS_MIN_BYTES", "1024")),
+        max_concurrent_analyses=int(os.environ.get("OFFERCOMPARE_MAX_CONCURRENT_ANALYSES", "8")),
+        max_queued_analyses=int(os.environ.get("OFFERCOMPARE_MAX_QUEUED_ANALYSES", "32")),
+        queue_timeout_seconds=float(os.environ.get("OFFERCOMPARE_QUEUE_TIMEOUT", "30")),
+        max_requests_per_client=int(os.environ.get("OFFERCOMPARE_MAX_REQUESTS_PER_CLIENT", "4")),  # 0 disables
+        trace_dir=os.environ.get("OFFERCOMPARE_TRACE_DIR") or None,  # write a Chrome trace per analysis
+        log_level=os.environ.get("OFFERCOMPARE_LOG_LEVEL") or None,
+        log_format=os.environ.get("OFFERCOMPARE_LOG_FORMAT", "json").strip().lower(),
+        # Lets API clients request a profile per analysis (X-Profile: 1 or ?profiling=true)
+        profiling_enabled=os.environ.get("OFFERCOMPARE_ENABLE_PROFILING", "0").strip() in {"1", "true", "yes"},
+        profile_dir=os.environ.get("OFFERCOMPARE_PROFILE_DIR", ".profiles"),
+        # Default per-analysis budgets; 0 = unlimited (requests may set their own)
+        analysis_deadline_seconds=float(os.environ.get("OFFERCOMPARE_ANALYSIS_DEADLINE", "0")),
+        analysis_token_budget=int(os.environ.get("OFFERCOMPARE_ANALYSIS_TOKEN_BUDGET", "0")),
+        # Provider circuit breaker: trip when >= threshold of the last `window` calls
+        # (at least min_calls) failed; probe again after the cooldown
+        breaker_window=int(os.environ.get("OFFERCOMPARE_BREAKER_WINDOW", "20")),
+        breaker_min_calls=int(os.environ.get("OFFERCOMPARE_BREAKER_MIN_CALLS", "5")),
+        breaker_error_threshold=float(os.environ.get("OFFERCOMPARE_BREAKER_ERROR_THRESHOLD", "0.5")),
+        breaker_cooldown_seconds=float(os.environ.get("OFFERCOMPARE_BREAKER_COOLDOWN", "30")),
+        # Hedged LLM requests: after the primary's p95 latency (or the fixed delay until
+        # enough calls are seen), race a second provider; at most max_ratio extra calls
+        hedge_enabled=os.environ.get("OFFERCOMPARE_HEDGE_REQUESTS", "0").strip() in {"1", "true", "yes"},
+        hedge_percentile=float(os.environ.get("OFFERCOMPARE_HEDGE_PERCENTILE", "95")),
+        hedge_delay_seconds=float(os.environ.get("OFFERCOMPARE_HEDGE_DELAY", "3")),
+        hedge_max_ratio=float(os.environ.get("OFFERCOMPARE_HEDGE_MAX_RATIO", "0.1")),
+        # Per-request LLM timeout (0 = none) and retries of timeouts/429/5xx with jittered backoff
+        llm_timeout_seconds=float(os.environ.get("OFFERCOMPARE_LLM_TIMEOUT", "60")),
+        llm_max_retries=int(os.environ.get("OFFERCOMPARE_LLM_MAX_RETRIES", "2")),
+        llm_backoff_base_seconds=float(os.environ.get("OFFERCOMPARE_LLM_BACKOFF_BASE", "0.5")),
+        llm_backoff_max_seconds=float(os.environ.get("OFFERCOMPARE_LLM_BACKOFF_MAX", "8")),
+        # Per-purpose model tier overrides, e.g. "recommendation=strong"; "off" = provider defaults
+        model_routing=os.environ.get("OFFERCOMPARE_MODEL_ROUTING", ""),
+        # Import provider SDKs and build their clients at server startup instead of on the first request
+        prewarm_providers=os.environ.get("OFFERCOMPARE_PREWARM_PROVIDERS", "1").strip() in {"1", "true", "yes"},
+        # Prompt size bounds (estimated tokens): whole prompts, and upstream text embedded in
+        # a later prompt (e.g. research fed to metrics extraction); 0 = unbounded
+        prompt_max_tokens=int(os.environ.get("OFFERCOMPARE_PROMPT_MAX_TOKENS", "6000")),
+        prompt_context_max_tokens=int(os.environ.get("OFFERCOMPARE_PROMPT_CONTEXT_MAX_TOKENS", "1500")),
+        # Provider batch mode (offline runs): submit after this long without new calls or at
+        # max_requests, poll every poll seconds, give up after timeout (batch windows are 24h)
+        batch_flush_seconds=float(os.environ.get("OFFERCOMPARE_BATCH_FLUSH_SECONDS", "2")),
+        batch_max_requests=int(os.environ.get("OFFERCOMPARE_BATCH_MAX_REQUESTS", "1000")),
+        batch_poll_seconds=float(os.environ.get("OFFERCOMPARE_BATCH_POLL_SECONDS", "30")),
+        batch_timeout_seconds=float(os.environ.get("OFFERCOMPARE_BATCH_TIMEOUT", "86400")),
+        # Near-duplicate LLM response cache for the listed call purposes; threshold > 0 also
+        # reuses the most similar cached prompt (cosine similarity, 0-1), not just canonical matches
+        semantic_cache_enabled=os.environ.get("OFFERCOMPARE_SEMANTIC_CACHE", "0").strip() in {"1", "true", "yes"},
+        semantic_cache_threshold=float(os.environ.get("OFFERCOMPARE_SEMANTIC_CACHE_THRESHOLD", "0")),
+        semantic_cache_max_entries=int(os.environ.get("OFFERCOMPARE_SEMANTIC_CACHE_SIZE", "1024")),
+        semantic_cache_purposes=os.environ.get("OFFERCOMPARE_SEMANTIC_CACHE_PURPOSES",
+                                               "market_analysis,offer_recommendation"),
     )
 
 
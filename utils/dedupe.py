@@ -0,0 +1,48 @@
+"""
+In-flight work deduplication shared across concurrently running analyses.
+
+Used by batch runs so that offers sharing a company/position only trigger
+one research or benchmarking call for the whole batch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SharedWork:
+    """Coalesce identical async lookups into a single task per key."""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+        else:
+            self.hits += 1
+        try:
+            # Shield so one cancelled waiter does not cancel the shared task
+            return await asyncio.shield(task)
+        except Exception:
+            # Do not pin failures: a later caller may retry the lookup
+            if self._tasks.get(key) is task:
+                self._tasks.pop(key, None)
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {"unique": len(self._tasks), "hits": self.hits, "misses": self.misses}
+
+
+async def run_shared(shared_work: SharedWork | None, key: Hashable,
+                     factory: Callable[[], Awaitable[Any]]) -> Any:
+    """Run factory through shared_work when a batch provides one, else directly."""
+    if shared_work is None:
+        return await factory()
+    return await shared_work.run(key, factory)
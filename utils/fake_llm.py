@@ -0,0 +1,127 @@
+"""
+Fake LLM Provider - deterministic, offline stand-in for benchmarks and load tests
+
+Registered in call_llm as provider "fake" and enabled with OFFERCOMPARE_FAKE_LLM=1.
+While enabled it is the default provider (after replay, if that is enabled
+too) and real providers are never called, whatever API keys are set.
+Responses are derived from a hash of the prompt, so the same prompt always
+gets the same answer; JSON is returned when the prompt asks for it.
+Latency, jitter and failure rate are configurable:
+
+- OFFERCOMPARE_FAKE_LLM_LATENCY_MS   base latency per call (default 0)
+- OFFERCOMPARE_FAKE_LLM_JITTER_MS    uniform +/- jitter (default 0)
+- OFFERCOMPARE_FAKE_LLM_FAILURE_RATE probability a call raises (default 0)
+- OFFERCOMPARE_FAKE_LLM_SEED         seed for jitter/failure draws (default 0)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+# Metric keys requested by research_company's structured prompt
+RESEARCH_METRICS = [
+    "culture_score", "wlb_score", "growth_score", "benefits_score", "stability_score",
+    "reputation_score", "innovation_score", "diversity_score", "remote_friendliness",
+]
+
+
+@dataclass(frozen=True)
+class FakeLLMSettings:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    failure_rate: float = 0.0
+    seed: int = 0
+    response_chars: int = 800
+
+
+def settings_from_env() -> FakeLLMSettings:
+    return FakeLLMSettings(
+        latency_ms=float(os.environ.get("OFFERCOMPARE_FAKE_LLM_LATENCY_MS", "0")),
+        jitter_ms=float(os.environ.get("OFFERCOMPARE_FAKE_LLM_JITTER_MS", "0")),
+        failure_rate=float(os.environ.get("OFFERCOMPARE_FAKE_LLM_FAILURE_RATE", "0")),
+        seed=int(os.environ.get("OFFERCOMPARE_FAKE_LLM_SEED", "0")),
+    )
+
+
+_settings: Optional[FakeLLMSettings] = None
+_rng = random.Random(0)
+_lock = threading.Lock()
+_calls = 0
+
+
+def configure_fake_llm(**overrides) -> FakeLLMSettings:
+    """Set fake provider settings (env defaults + overrides) and reset the call counter and RNG."""
+    global _settings, _rng, _calls
+    with _lock:
+        _settings = replace(settings_from_env(), **overrides)
+        _rng = random.Random(_settings.seed)
+        _calls = 0
+    return _settings
+
+
+def get_settings() -> FakeLLMSettings:
+    return _settings or configure_fake_llm()
+
+
+def call_count() -> int:
+    return _calls
+
+
+def _fake_text(digest: str, model: str, length: int) -> str:
+    sentence = f"[{model}] Simulated analysis {digest[:8]}: balanced trade-offs between compensation, growth and stability. "
+    return (sentence * (length // len(sentence) + 1))[:length]
+
+
+def _fake_json(prompt: str, digest: str) -> str:
+    seed = int(digest[:8], 16)
+    if "culture_score" in prompt:
+        data = {
+            key: {"score": 5 + (seed >> i) % 5, "explanation": "Simulated metric"}
+            for i, key in enumerate(RESEARCH_METRICS)
+        }
+        data.update({
+            "key_strengths": ["Simulated strength"],
+            "potential_concerns": ["Simulated concern"],
+            "recent_highlights": ["Simulated highlight"],
+        })
+        return json.dumps(data)
+    return json.dumps({"response": f"Simulated response {digest[:8]}"})
+
+
+class FakeProviderError(Exception):
+    """Simulated transient provider failure (HTTP 503, so call_llm retries it)."""
+    status_code = 503
+
+
+def call_llm_fake(prompt: str, model: str = "fake-model", temperature: float = 0.7,
+                  max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
+                  timeout: Optional[float] = None, response_format: Optional[Dict] = None) -> str:
+    """Return a deterministic response after the configured simulated latency (or time out)."""
+    global _calls
+    settings = get_settings()
+    with _lock:
+        _calls += 1
+        jitter = _rng.uniform(-settings.jitter_ms, settings.jitter_ms) if settings.jitter_ms else 0.0
+        failed = settings.failure_rate > 0 and _rng.random() < settings.failure_rate
+
+    delay = max(0.0, settings.latency_ms + jitter) / 1000
+    if timeout is not None and delay > timeout:
+        time.sleep(timeout)
+        raise TimeoutError(f"Fake API error: timed out after {timeout:.2f}s")
+    if delay:
+        time.sleep(delay)
+    if failed:
+        raise FakeProviderError("Fake API error: simulated provider failure")
+
+    digest = hashlib.sha256(f"{system_prompt or ''}\n{prompt}".encode("utf-8")).hexdigest()
+    if response_format or "json" in f"{system_prompt or ''} {prompt}".lower():
+        return _fake_json(prompt, digest)
+    length = min(settings.response_chars, max_tokens * 4) if max_tokens else settings.response_chars
+    return _fake_text(digest, model, length)
@@ -0,0 +1,113 @@
+"""
+Hedged Requests - race a backup provider against a slow primary
+
+With OFFERCOMPARE_HEDGE_REQUESTS=1, call_llm starts the primary provider
+call and, if it has not answered within the primary's recent p95 latency
+(OFFERCOMPARE_HEDGE_PERCENTILE; OFFERCOMPARE_HEDGE_DELAY until enough
+calls have been seen), sends the same prompt to a healthy second provider.
+The first successful answer wins. The delay counts from when the primary
+starts running, not from when it was queued on the worker pool.
+
+Each side is handed a threading.Event that is set once the other side
+has won; call_llm's retry loop checks it before every attempt and during
+backoff, so the loser stops retrying. Provider SDK calls are blocking, so
+an attempt already in flight cannot be interrupted: it is left to finish
+in the background and its result discarded (its usage is still recorded).
+HedgeThrottle caps hedges at OFFERCOMPARE_HEDGE_MAX_RATIO of calls so a
+slow period cannot double the load on every provider.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Tuple, TypeVar
+
+from .config import get_config
+
+T = TypeVar("T")
+
+PRIMARY, BACKUP = "primary", "backup"
+
+# Primary and backup calls run here so the caller can return as soon as either finishes
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class HedgeThrottle:
+    """Token bucket: every call earns max_ratio of a hedge, a hedge spends one (at most `burst` saved)."""
+
+    def __init__(self, max_ratio: float, burst: float = 5.0) -> None:
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "HedgeThrottle":
+        return cls(get_config().hedge_max_ratio)
+
+    def on_call(self) -> None:
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.max_ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+hedge_throttle = HedgeThrottle.from_config()
+
+
+def _submit(fn: Callable[[], T]) -> Future:
+    # Copy the caller's contextvars (usage ledger, node, trace) into the worker
+    return _executor.submit(contextvars.copy_context().run, fn)
+
+
+def hedged_call(primary: Callable[[threading.Event], T], backup: Callable[[threading.Event], T], delay: float,
+                throttle: Optional[HedgeThrottle] = None) -> Tuple[T, str]:
+    """
+    Run primary(cancel); after `delay` seconds without an answer also run backup(cancel).
+
+    Each call gets its own cancel event, set when the other call wins.
+
+    Returns:
+        tuple: (result, PRIMARY or BACKUP), from the first call to succeed
+
+    Raises:
+        Exception: The primary's error if it fails before the hedge (or no
+            hedge was allowed), else the first error once both have failed
+    """
+    throttle = throttle or hedge_throttle
+    throttle.on_call()
+    cancel_primary, cancel_backup = threading.Event(), threading.Event()
+    started = threading.Event()
+
+    def run_primary() -> T:
+        started.set()
+        return primary(cancel_primary)
+
+    first = _submit(run_primary)
+    started.wait()  # time queued for a worker is not the primary being slow
+    done, _ = wait([first], timeout=delay)
+    if done or not throttle.try_acquire():
+        return first.result(), PRIMARY
+
+    second = _submit(lambda: backup(cancel_backup))
+    labels = {first: PRIMARY, second: BACKUP}
+    cancels = {first: cancel_primary, second: cancel_backup}
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    cancels[loser].set()
+                    loser.cancel()
+                return future.result(), labels[future]
+            error = error or future.exception()
+    raise error
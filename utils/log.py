@@ -0,0 +1,100 @@
+"""
+Logging setup - structured, level-controlled progress output
+
+Modules log through get_logger(__name__) instead of printing. Nothing is
+emitted until configure_logging() is called:
+
+- "cli":    plain messages to stdout at INFO, keeping the emoji progress lines
+- "server": records go through a QueueHandler, and a background QueueListener
+            writes JSON lines (or text) to stderr, so request handlers never
+            block on console I/O. Defaults to WARNING.
+
+OFFERCOMPARE_LOG_LEVEL and OFFERCOMPARE_LOG_FORMAT (json|text) override the defaults.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Optional
+
+from .config import get_config
+
+ROOT_LOGGER = "offercompare"
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message plus any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage().strip(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the app's "offercompare" namespace."""
+    return logging.getLogger(name if name.startswith(ROOT_LOGGER) else f"{ROOT_LOGGER}.{name}")
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(mode: str = "cli", level: Optional[str] = None) -> logging.Logger:
+    """Install handlers on the app logger for "cli" or "server" use; safe to call again."""
+    config = get_config()
+    logger = logging.getLogger(ROOT_LOGGER)
+    _stop_listener()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.propagate = False
+
+    default_level = "INFO" if mode == "cli" else "WARNING"
+    logger.setLevel((level or config.log_level or default_level).upper())
+
+    if mode == "cli":
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        return logger
+
+    stream = logging.StreamHandler(sys.stderr)
+    if config.log_format == "text":
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        formatter.converter = time.gmtime
+        stream.setFormatter(formatter)
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    global _listener
+    records: queue.Queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    return logger
+
+
+atexit.register(_stop_listener)
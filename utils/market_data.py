@@ -4,6 +4,7 @@ Provides comprehensive compensation data and market insights
 """
 
 from .call_llm import call_llm, call_llm_structured
+from .compaction import clip, compact_prompt
 import json
 
 # Comprehensive salary data by position and location
@@ -435,9 +436,9 @@ def ai_market_analysis(position, company, location, salary_data):
     analysis_prompt = f"""
     Provide a comprehensive market analysis for this job offer:
     
-    Position: {position}
-    Company: {company}
-    Location: {location}
+    Position: {clip(position, 80)}
+    Company: {clip(company, 80)}
+    Location: {clip(location, 80)}
     
     Compensation Details:
     - Base Salary: ${salary_data.get('base_salary', 0):,}
@@ -459,9 +460,10 @@ def ai_market_analysis(position, company, location, salary_data):
     """
     
     analysis = call_llm(
-        analysis_prompt,
+        compact_prompt(analysis_prompt, "market_analysis"),
         temperature=0.3,
-        system_prompt="You are an expert compensation analyst providing market insights for job offers."
+        system_prompt="You are an expert compensation analyst providing market insights for job offers.",
+        purpose="market_analysis"
     )
     
     return {
@@ -476,26 +478,22 @@ def ai_market_analysis(position, company, location, salary_data):
 async def get_market_salary_range_async(position, location="San Francisco, CA"):
     """Async version of get_market_salary_range for use with AsyncNode."""
     import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, get_market_salary_range, position, location)
+    return await asyncio.to_thread(get_market_salary_range, position, location)
 
 async def calculate_market_percentile_async(salary, position, location="San Francisco, CA", experience_level=None):
     """Async version of calculate_market_percentile for use with AsyncNode."""
     import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, calculate_market_percentile, salary, position, location, experience_level)
+    return await asyncio.to_thread(calculate_market_percentile, salary, position, location, experience_level)
 
 async def get_compensation_insights_async(position, base_salary, equity, bonus, location="San Francisco, CA"):
     """Async version of get_compensation_insights for use with AsyncNode."""
     import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, get_compensation_insights, position, base_salary, equity, bonus, location)
+    return await asyncio.to_thread(get_compensation_insights, position, base_salary, equity, bonus, location)
 
 async def ai_market_analysis_async(position, location, salary, experience_years):
     """Async version of ai_market_analysis for use with AsyncNode."""
     import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, ai_market_analysis, position, location, salary, experience_years)
+    return await asyncio.to_thread(ai_market_analysis, position, location, salary, experience_years)
 
 if __name__ == "__main__":
     # Test market data functions
@@ -0,0 +1,236 @@
+"""
+Metrics Registry - Prometheus text-format metrics without external dependencies
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+exposition format (text/plain; version=0.0.4) by render(). The metrics
+used across the app are defined at the bottom of this module.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers in-process work (ms) up to slow LLM calls (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        if not self.labelnames:
+            self._values[()] = 0.0
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self._header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "offercompare_http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"])
+HTTP_LATENCY = REGISTRY.histogram(
+    "offercompare_http_request_duration_seconds", "HTTP request latency.", ["method", "route"])
+ANALYSES_IN_FLIGHT = REGISTRY.gauge(
+    "offercompare_analyses_in_flight", "Analysis flows currently running.")
+ANALYSES = REGISTRY.counter(
+    "offercompare_analyses_total", "Completed analysis flows by outcome.", ["status"])
+NODE_LATENCY = REGISTRY.histogram(
+    "offercompare_node_duration_seconds", "Node run time (prep, exec and post).", ["node"])
+LLM_LATENCY = REGISTRY.histogram(
+    "offercompare_llm_request_duration_seconds", "LLM provider call latency.", ["provider", "model"])
+LLM_ERRORS = REGISTRY.counter(
+    "offercompare_llm_errors_total", "Failed LLM provider calls.", ["provider", "model"])
+LLM_CIRCUIT_STATE = REGISTRY.gauge(
+    "offercompare_llm_circuit_state", "Provider circuit breaker state (0 closed, 1 half-open, 2 open).", ["provider"])
+LLM_RETRIES = REGISTRY.counter(
+    "offercompare_llm_retries_total", "LLM requests retried after a retryable failure.", ["provider"])
+LLM_HEDGES = REGISTRY.counter(
+    "offercompare_llm_hedges_total", "Hedged LLM requests by backup provider and winner (primary/backup).",
+    ["provider", "winner"])
+LLM_STRUCTURED = REGISTRY.counter(
+    "offercompare_llm_structured_outputs_total", "Structured LLM responses by purpose and result "
+    "(ok/repaired/repaired_by_llm/failed).", ["purpose", "result"])
+LLM_REPLAY = REGISTRY.counter(
+    "offercompare_llm_replay_total", "Replay provider lookups (hit/miss) and recorded responses.", ["result"])
+LLM_BATCH_JOBS = REGISTRY.counter(
+    "offercompare_llm_batch_jobs_total", "Provider batch jobs by status (completed/expired/submit_failed).",
+    ["provider", "status"])
+PROMPT_TOKENS_TRIMMED = REGISTRY.counter(
+    "offercompare_prompt_tokens_trimmed_total", "Estimated prompt tokens removed by compaction, by prompt.",
+    ["prompt"])
+LLM_TOKENS = REGISTRY.counter(
+    "offercompare_llm_tokens_total", "LLM tokens by node and direction (input/output); estimated when "
+    "the provider reports none.", ["provider", "model", "node", "direction"])
+LLM_COST = REGISTRY.counter(
+    "offercompare_llm_cost_usd_total", "Estimated LLM spend in USD (list prices).", ["provider", "model", "node"])
+CACHE_REQUESTS = REGISTRY.counter(
+    "offercompare_cache_requests_total", "Cache lookups by namespace and result (hit/miss).", ["namespace", "result"])
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "offercompare_cache_hit_ratio", "Cache hits / lookups since start, by namespace.", ["namespace"])
+
+
+def record_cache_lookup(namespace: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(namespace=namespace, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.value(namespace=namespace, result="hit")
+    misses = CACHE_REQUESTS.value(namespace=namespace, result="miss")
+    CACHE_HIT_RATIO.set(hits / (hits + misses), namespace=namespace)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,161 @@
+"""
+Synthetic Offer Generator - seeded, realistic offer sets for scale and load testing
+
+Offers are drawn from the positions in MARKET_SALARY_DATA, the locations in
+COST_OF_LIVING_DATA (plus "Remote") and the companies in COMPANY_DATABASE,
+mixed with made-up companies that exercise the unknown-company paths. Base
+salaries fall inside the market range for the position, level and location,
+so percentiles and scores spread the way real inputs do. The same seed
+always yields the same offers.
+
+Usage:
+  python -m utils.offer_generator --count 100000 --output offers.jsonl
+  python -m utils.offer_generator --sets 500 --offers-per-set 3 --output requests.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .col_calculator import COST_OF_LIVING_DATA
+from .company_db import COMPANY_DATABASE
+from .market_data import MARKET_SALARY_DATA, get_market_salary_range
+
+POSITIONS = list(MARKET_SALARY_DATA)
+LOCATIONS = list(COST_OF_LIVING_DATA) + ["Remote"]
+KNOWN_COMPANIES = list(COMPANY_DATABASE)
+
+_NAME_PREFIXES = ["Blue", "Quantum", "Bright", "North", "Nimbus", "Vertex", "Cedar", "Lumen", "Atlas", "Orbit"]
+_NAME_SUFFIXES = ["Labs", "Systems", "Analytics", "Robotics", "Health", "Cloud", "Works", "AI", "Bio", "Pay"]
+_UNKNOWN_STAGES = ["startup", "growth", "private"]
+
+# Equity (annualized) and bonus as a fraction of base salary, by company stage
+_EQUITY_RANGE = {"public": (0.10, 0.45), "private": (0.15, 0.60), "growth": (0.15, 0.60), "startup": (0.0, 1.0)}
+_BONUS_RANGE = {"public": (0.08, 0.20), "private": (0.05, 0.15), "growth": (0.0, 0.12), "startup": (0.0, 0.08)}
+
+
+def _company(rng: random.Random, unknown_ratio: float) -> tuple:
+    if rng.random() < unknown_ratio:
+        name = f"{rng.choice(_NAME_PREFIXES)} {rng.choice(_NAME_SUFFIXES)}"
+        return name, rng.choice(_UNKNOWN_STAGES)
+    name = rng.choice(KNOWN_COMPANIES)
+    return name, COMPANY_DATABASE[name].get("stage", "public")
+
+
+def generate_offer(rng: random.Random, index: int = 0, unknown_company_ratio: float = 0.25) -> Dict[str, Any]:
+    """One offer in the shape accepted by POST /api/analyze."""
+    company, stage = _company(rng, unknown_company_ratio)
+    position = rng.choice(POSITIONS)
+    location = rng.choice(LOCATIONS)
+    years = rng.randint(0, 20)
+
+    salary_range = get_market_salary_range(position, location, years_experience=years)["adjusted_range"]
+    low, mid, high = salary_range["min"], salary_range["median"], salary_range["max"]
+    base = int(round(rng.triangular(low * 0.9, high * 1.1, mid), -3))
+
+    equity_low, equity_high = _EQUITY_RANGE.get(stage, _EQUITY_RANGE["growth"])
+    bonus_low, bonus_high = _BONUS_RANGE.get(stage, _BONUS_RANGE["growth"])
+    equity = int(round(base * rng.uniform(equity_low, equity_high), -3))
+    bonus = int(round(base * rng.uniform(bonus_low, bonus_high), -3))
+
+    return {
+        "id": f"offer_{index + 1}",
+        "company": company,
+        "position": position,
+        "location": location,
+        "base_salary": base,
+        "equity": equity,
+        "bonus": bonus,
+        "total_compensation": base + equity + bonus,
+        "years_experience": years,
+        "vesting_years": rng.choice([4, 4, 4, 3, 5]),
+    }
+
+
+def iter_offers(count: int, seed: int = 0, unknown_company_ratio: float = 0.25) -> Iterator[Dict[str, Any]]:
+    """Yield count offers; streaming, so very large sets never sit in memory at once."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield generate_offer(rng, index, unknown_company_ratio)
+
+
+def generate_offers(count: int, seed: int = 0, unknown_company_ratio: float = 0.25) -> List[Dict[str, Any]]:
+    return list(iter_offers(count, seed, unknown_company_ratio))
+
+
+def generate_user_preferences(rng: random.Random, locations: Iterable[str] = ()) -> Dict[str, Any]:
+    preferences: Dict[str, Any] = {}
+    focus = rng.choice([None, "salary_focused", "growth_focused", "balance_focused"])
+    if focus:
+        preferences[focus] = True
+    scored = sorted(set(locations))
+    if scored and rng.random() < 0.5:
+        preferences["location_preferences"] = {location: rng.randint(40, 100) for location in scored}
+    return preferences
+
+
+def generate_offer_set(offers_per_set: int = 3, seed: int = 0,
+                       unknown_company_ratio: float = 0.25) -> Dict[str, Any]:
+    """A full analysis input ({"offers", "user_preferences"}), like flow.get_sample_offers()."""
+    rng = random.Random(seed)
+    offers = [generate_offer(rng, i, unknown_company_ratio) for i in range(offers_per_set)]
+    return {
+        "offers": offers,
+        "user_preferences": generate_user_preferences(rng, (offer["location"] for offer in offers)),
+    }
+
+
+def iter_offer_sets(sets: int, offers_per_set: int = 3, seed: int = 0,
+                    unknown_company_ratio: float = 0.25) -> Iterator[Dict[str, Any]]:
+    """Yield independent offer sets, each with its own derived seed so any one can be regenerated alone."""
+    for index in range(sets):
+        yield generate_offer_set(offers_per_set, seed * 1_000_003 + index, unknown_company_ratio)
+
+
+def write_jsonl(records: Iterable[Dict[str, Any]], path: Optional[str] = None) -> int:
+    """Write one JSON object per line to path (stdout when None); returns the record count."""
+    out = open(path, "w", encoding="utf-8") if path else sys.stdout
+    written = 0
+    try:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written += 1
+    finally:
+        if path:
+            out.close()
+    return written
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic job offers as JSONL")
+    parser.add_argument("--count", type=int, default=100, help="Number of individual offers")
+    parser.add_argument("--sets", type=int, help="Emit this many analysis inputs instead of single offers")
+    parser.add_argument("--offers-per-set", type=int, default=3)
+    parser.add_argument("--unknown-ratio", type=float, default=0.25, help="Share of made-up companies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSONL file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.sets is not None:
+        records = iter_offer_sets(args.sets, args.offers_per_set, args.seed, args.unknown_ratio)
+    else:
+        records = iter_offers(args.count, args.seed, args.unknown_ratio)
+    written = write_jsonl(records, args.output)
+    if args.output:
+        print(f"Wrote {written} records to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Profiling - CPU profile plus allocation report around a single analysis
+
+profile_run(tag) wraps a block in a CPU profiler and tracemalloc, then
+writes two artifacts into the output directory, named <tag>-<time>-<id>
+(tag is a request id, or "demo" for CLI runs; the suffix keeps a reused
+tag from overwriting earlier artifacts):
+
+- <name>.prof  cProfile stats (python -m pstats, snakeviz), or
+  <name>.html  pyinstrument's sampling profile when pyinstrument is installed
+- <name>.txt   wall time, top-N functions and top-N allocation sites
+
+cProfile sees the calling thread only: work pushed to threads (LLM and web
+calls via asyncio.to_thread) shows up as time spent awaiting. Both
+profilers and tracemalloc are process-wide, so one profiled run is allowed
+at a time; a second one raises ProfilerBusy. For the same reason a profile
+taken in a server is not isolated to one request: everything else running
+on the event loop meanwhile (other requests' coroutines, their
+allocations) is included. Reports say so in their "scope" line; callers
+can add labels (e.g. how many other requests were running) to the header.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+try:  # optional sampling profiler with asyncio awareness
+    from pyinstrument import Profiler as _SamplingProfiler
+except ImportError:  # pragma: no cover - optional dependency
+    _SamplingProfiler = None
+
+DEFAULT_TOP_N = 25
+
+SCOPE = "process-wide (includes all threads' allocations and, in the server, other requests on the event loop)"
+
+_active = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profiled run is in progress."""
+
+
+@dataclass
+class ProfileReport:
+    tag: str
+    engine: str
+    name: str = ""
+    labels: Dict[str, Any] = field(default_factory=dict)
+    profile_path: str = ""
+    report_path: str = ""
+    wall_ms: float = 0.0
+    peak_alloc_kb: float = 0.0
+    top_allocations: List[str] = field(default_factory=list)
+
+
+def available_engines() -> List[str]:
+    return ["cprofile"] + (["pyinstrument"] if _SamplingProfiler is not None else [])
+
+
+def safe_tag(tag: str) -> str:
+    """Restrict a caller-supplied tag (e.g. X-Request-Id) to a safe file name."""
+    cleaned = re.sub(r"[^A-Za-z0-9_.-]", "_", tag).strip("._")[:80]
+    return cleaned or "profile"
+
+
+def _allocation_lines(snapshot: tracemalloc.Snapshot, top_n: int) -> List[str]:
+    stats = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]).statistics("lineno")
+    return [f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback}" for stat in stats[:top_n]]
+
+
+@contextmanager
+def profile_run(tag: str, output_dir: str = ".profiles", top_n: int = DEFAULT_TOP_N,
+                engine: str = "auto", memory: bool = True,
+                labels: Optional[Dict[str, Any]] = None) -> Iterator[ProfileReport]:
+    """
+    Profile the block and write its artifacts; the yielded report is filled in on exit.
+
+    Args:
+        tag (str): Artifact name prefix, usually a request id
+        output_dir (str): Directory for the artifacts (created if missing)
+        top_n (int): Functions and allocation sites listed in the text report
+        engine (str): "cprofile", "pyinstrument" or "auto" (pyinstrument when installed)
+        memory (bool): Also trace allocations with tracemalloc
+        labels (dict): Extra "key: value" lines for the report header
+
+    Raises:
+        ProfilerBusy: If another profiled run is active
+    """
+    if engine == "auto":
+        engine = "pyinstrument" if _SamplingProfiler is not None else "cprofile"
+    if engine not in available_engines():
+        raise ValueError(f"Profiler engine not available: {engine}")
+    if not _active.acquire(blocking=False):
+        raise ProfilerBusy("Another profiled run is in progress")
+
+    report = ProfileReport(tag=safe_tag(tag), engine=engine, labels=dict(labels or {}))
+    report.name = f"{report.tag}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    started_tracing = memory and not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start()
+        if memory:
+            tracemalloc.reset_peak()
+        if engine == "pyinstrument":
+            profiler = _SamplingProfiler(async_mode="enabled")
+            start, stop = profiler.start, profiler.stop
+        else:
+            profiler = cProfile.Profile()
+            start, stop = profiler.enable, profiler.disable
+        started = time.perf_counter()
+        start()
+        try:
+            yield report
+        finally:
+            stop()
+            report.wall_ms = round((time.perf_counter() - started) * 1000, 1)
+            if memory:
+                report.peak_alloc_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                report.top_allocations = _allocation_lines(tracemalloc.take_snapshot(), top_n)
+            _write_artifacts(report, profiler, output_dir, top_n)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _active.release()
+
+
+def _write_artifacts(report: ProfileReport, profiler, output_dir: str, top_n: int) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, report.name)
+
+    if report.engine == "cprofile":
+        report.profile_path = f"{base}.prof"
+        profiler.dump_stats(report.profile_path)
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top_n)
+        cpu_section = buffer.getvalue()
+    else:
+        report.profile_path = f"{base}.html"
+        with open(report.profile_path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        cpu_section = profiler.output_text(unicode=True, color=False)
+
+    report.report_path = f"{base}.txt"
+    with open(report.report_path, "w", encoding="utf-8") as f:
+        f.write(f"profile: {report.tag}\nengine: {report.engine}\nscope: {SCOPE}\nwall_ms: {report.wall_ms}\n")
+        for key, value in report.labels.items():
+            f.write(f"{key}: {value}\n")
+        f.write(f"profile_file: {os.path.basename(report.profile_path)}\n\n")
+        f.write(f"== Top {top_n} functions ==\n{cpu_section.strip()}\n")
+        if report.top_allocations:
+            f.write(f"\n== Top {top_n} allocation sites still live at exit (peak {report.peak_alloc_kb} KiB) ==\n")
+            f.write("\n".join(report.top_allocations) + "\n")
+
@@ -0,0 +1,181 @@
+"""
+Provider Health - per-provider circuit breaker and health score for call_llm
+
+Every provider call reports its outcome and latency here. Each provider
+keeps a rolling window of recent outcomes; when enough of them failed the
+circuit opens and call_llm routes straight to the other providers instead
+of waiting out another timeout. After a cooldown one probe call is let
+through (half-open): success closes the circuit, failure reopens it.
+
+Fallback providers are tried in order of health score (success rate
+discounted by median latency). If every candidate's circuit is open the
+preferred provider is tried anyway, so a full outage is no worse than
+having no breaker at all.
+"""
+
+from __future__ import annotations
+
+import math
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from .config import get_config
+from .metrics import LLM_CIRCUIT_STATE
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Median latency at which a provider's health score is halved
+LATENCY_REFERENCE_SECONDS = 10.0
+
+
+class ProviderHealth:
+    """Rolling outcomes and circuit state for one provider."""
+
+    def __init__(self, provider: str, window: int, min_calls: int, error_threshold: float,
+                 cooldown_seconds: float) -> None:
+        self.provider = provider
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.outcomes: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.trips = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    def median_latency(self) -> Optional[float]:
+        return statistics.median(latency for _, latency in self.outcomes) if self.outcomes else None
+
+    def latency_percentile(self, percentile: float, min_samples: int) -> Optional[float]:
+        """Nearest-rank latency percentile of recent successful calls; None with too few samples."""
+        latencies = sorted(latency for ok, latency in self.outcomes if ok)
+        if len(latencies) < max(1, min_samples):
+            return None
+        return latencies[max(0, math.ceil(percentile / 100 * len(latencies)) - 1)]
+
+    def score(self) -> float:
+        """1.0 for a fast, error-free provider; 0.0 while its circuit is open."""
+        if self.state == OPEN:
+            return 0.0
+        latency = self.median_latency() or 0.0
+        return (1.0 - self.error_rate()) / (1.0 + latency / LATENCY_REFERENCE_SECONDS)
+
+    def allow(self, now: float) -> bool:
+        """Whether a call may go to this provider now; may start a half-open probe."""
+        if self.state == CLOSED:
+            return True
+        probing = self.probe_started is not None and now - self.probe_started < self.cooldown_seconds
+        if self.state == OPEN and now - self.opened_at >= self.cooldown_seconds:
+            self.state = HALF_OPEN
+            probing = False
+        if self.state == HALF_OPEN and not probing:
+            # One probe at a time; a probe that never reported is replaced after a cooldown
+            self.probe_started = now
+            return True
+        return False
+
+    def record(self, ok: bool, latency: float, now: float) -> None:
+        self.outcomes.append((ok, latency))
+        if self.state == HALF_OPEN:
+            self.probe_started = None
+            if ok:
+                self.state = CLOSED
+                self.outcomes.clear()
+            else:
+                self._trip(now)
+        elif self.state == CLOSED and len(self.outcomes) >= self.min_calls \
+                and self.error_rate() >= self.error_threshold:
+            self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        latency = self.median_latency()
+        return {
+            "state": self.state,
+            "score": round(self.score(), 3),
+            "error_rate": round(self.error_rate(), 3),
+            "median_latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "calls": len(self.outcomes),
+            "trips": self.trips,
+            "retry_in_s": round(max(0.0, self.opened_at + self.cooldown_seconds - now), 1)
+            if self.state == OPEN else 0.0,
+        }
+
+
+class ProviderHealthRegistry:
+    """Thread-safe health tracking for all providers (call_llm runs in worker threads)."""
+
+    def __init__(self, window: int = 20, min_calls: int = 5, error_threshold: float = 0.5,
+                 cooldown_seconds: float = 30.0) -> None:
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "ProviderHealthRegistry":
+        config = get_config()
+        return cls(config.breaker_window, config.breaker_min_calls, config.breaker_error_threshold,
+                   config.breaker_cooldown_seconds)
+
+    def _get(self, provider: str) -> ProviderHealth:
+        health = self._providers.get(provider)
+        if health is None:
+            health = self._providers[provider] = ProviderHealth(
+                provider, self.window, self.min_calls, self.error_threshold, self.cooldown_seconds)
+        return health
+
+    def candidates(self, preferred: str, available: Iterable[str]) -> List[str]:
+        """The preferred provider, then the other available ones by descending health score."""
+        with self._lock:
+            others = [p for p in dict.fromkeys(available) if p != preferred]
+            return [preferred] + sorted(others, key=lambda p: -self._get(p).score())
+
+    def allow(self, provider: str) -> bool:
+        """Whether to call provider now; False while its circuit is open (or another probe is out)."""
+        with self._lock:
+            health = self._get(provider)
+            allowed = health.allow(time.monotonic())
+            LLM_CIRCUIT_STATE.set(_STATE_VALUES[health.state], provider=provider)
+            return allowed
+
+    def record(self, provider: str, ok: bool, latency: float) -> None:
+        with self._lock:
+            health = self._get(provider)
+            health.record(ok, latency, time.monotonic())
+            LLM_CIRCUIT_STATE.set(_STATE_VALUES[health.state], provider=provider)
+
+    def latency_percentile(self, provider: str, percentile: float, min_samples: int = 5) -> Optional[float]:
+        with self._lock:
+            return self._get(provider).latency_percentile(percentile, min_samples)
+
+    def state(self, provider: str) -> str:
+        with self._lock:
+            return self._get(provider).state
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return {name: health.snapshot(now) for name, health in sorted(self._providers.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._providers.clear()
+
+
+provider_health = ProviderHealthRegistry.from_config()
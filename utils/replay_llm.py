@@ -0,0 +1,170 @@
+"""
+Replay LLM Provider - serve recorded provider responses for offline load tests
+
+Registered in call_llm as provider "replay" and enabled with
+OFFERCOMPARE_REPLAY_LLM=1. Unlike mock_api_server.py, the whole pipeline
+runs as usual; only the provider request is answered from a corpus of
+real responses, looked up by a hash of (system prompt, prompt, response
+format). The corpus is a JSON lines file, written by recording mode:
+with OFFERCOMPARE_REPLAY_RECORD=1, every successful call to a real
+provider is appended with its latency and token usage.
+
+- OFFERCOMPARE_REPLAY_CORPUS        corpus file (default replay_corpus.jsonl)
+- OFFERCOMPARE_REPLAY_RECORD        record real responses (default 0)
+- OFFERCOMPARE_REPLAY_LATENCY_MS    fixed latency per call; unset = recorded latency
+- OFFERCOMPARE_REPLAY_LATENCY_SCALE multiplier for recorded latency (default 1)
+- OFFERCOMPARE_REPLAY_JITTER_MS     uniform +/- jitter (default 0)
+- OFFERCOMPARE_REPLAY_ON_MISS       "error" (default) or "fake" for prompts not in the corpus
+
+Replay keeps a run offline even when API keys are set (in the environment
+or loaded from .env): while OFFERCOMPARE_REPLAY_LLM=1, replay is the default
+provider ahead of fake, calls that name a real provider are served by
+replay too, and real providers are never used as fallbacks. A miss is
+terminal: ReplayMissError is raised to the caller without trying any other
+provider (or, with ON_MISS=fake, answered by the fake provider).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from .fake_llm import call_llm_fake
+from .metrics import LLM_REPLAY
+from .usage import report_provider_usage
+
+
+@dataclass(frozen=True)
+class ReplaySettings:
+    corpus_path: str = "replay_corpus.jsonl"
+    record: bool = False
+    latency_ms: Optional[float] = None
+    latency_scale: float = 1.0
+    jitter_ms: float = 0.0
+    on_miss: str = "error"
+    seed: int = 0
+
+
+def settings_from_env() -> ReplaySettings:
+    latency = os.environ.get("OFFERCOMPARE_REPLAY_LATENCY_MS", "").strip()
+    return ReplaySettings(
+        corpus_path=os.environ.get("OFFERCOMPARE_REPLAY_CORPUS", "replay_corpus.jsonl"),
+        record=os.environ.get("OFFERCOMPARE_REPLAY_RECORD", "0").strip() in {"1", "true", "yes"},
+        latency_ms=float(latency) if latency else None,
+        latency_scale=float(os.environ.get("OFFERCOMPARE_REPLAY_LATENCY_SCALE", "1")),
+        jitter_ms=float(os.environ.get("OFFERCOMPARE_REPLAY_JITTER_MS", "0")),
+        on_miss=os.environ.get("OFFERCOMPARE_REPLAY_ON_MISS", "error").strip().lower(),
+    )
+
+
+_settings: Optional[ReplaySettings] = None
+_corpus: Optional[Dict[str, Dict[str, Any]]] = None
+_rng = random.Random(0)
+_lock = threading.Lock()
+
+
+class ReplayMissError(Exception):
+    """No recorded response for the prompt (HTTP 404, so call_llm does not retry it)."""
+    status_code = 404
+
+
+def configure_replay_llm(**overrides) -> ReplaySettings:
+    """Set replay settings (env defaults + overrides); the corpus is reloaded on next use."""
+    global _settings, _corpus, _rng
+    with _lock:
+        _settings = replace(settings_from_env(), **overrides)
+        _corpus = None
+        _rng = random.Random(_settings.seed)
+    return _settings
+
+
+def get_settings() -> ReplaySettings:
+    return _settings or configure_replay_llm()
+
+
+def replay_key(prompt: str, system_prompt: Optional[str] = None,
+               response_format: Optional[Dict] = None) -> str:
+    """Corpus key: the same request recorded from any provider or model replays the same answer."""
+    material = json.dumps([system_prompt or "", prompt, response_format], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _load_corpus() -> Dict[str, Dict[str, Any]]:
+    global _corpus
+    with _lock:
+        if _corpus is None:
+            _corpus = {}
+            path = get_settings().corpus_path
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            # Later recordings of the same request win
+                            _corpus[entry["key"]] = entry
+        return _corpus
+
+
+def corpus_size() -> int:
+    return len(_load_corpus())
+
+
+def recording() -> bool:
+    return get_settings().record
+
+
+def record_response(prompt: str, system_prompt: Optional[str], response_format: Optional[Dict], provider: str,
+                    model: str, response: str, latency_s: float,
+                    reported: Optional[Dict[str, int]] = None) -> None:
+    """Append a real provider response to the corpus (called by call_llm in recording mode)."""
+    corpus = _load_corpus()
+    reported = reported or {}
+    entry = {
+        "key": replay_key(prompt, system_prompt, response_format),
+        "provider": provider,
+        "model": model,
+        "response": response,
+        "latency_ms": round(latency_s * 1000, 1),
+        "input_tokens": reported.get("input_tokens"),
+        "output_tokens": reported.get("output_tokens"),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with _lock:
+        with open(get_settings().corpus_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        corpus[entry["key"]] = entry
+    LLM_REPLAY.inc(result="recorded")
+
+
+def call_llm_replay(prompt: str, model: str = "replay", temperature: float = 0.7,
+                    max_tokens: Optional[int] = None, system_prompt: Optional[str] = None,
+                    timeout: Optional[float] = None, response_format: Optional[Dict] = None) -> str:
+    """Return the recorded response after its (or the configured) latency, or handle a miss."""
+    settings = get_settings()
+    entry = _load_corpus().get(replay_key(prompt, system_prompt, response_format))
+    if entry is None:
+        LLM_REPLAY.inc(result="miss")
+        if settings.on_miss == "fake":
+            return call_llm_fake(prompt, "fake-model", temperature, max_tokens, system_prompt, timeout,
+                                 response_format)
+        raise ReplayMissError(f"Replay miss: no recorded response for this prompt in {settings.corpus_path}")
+    LLM_REPLAY.inc(result="hit")
+
+    base_ms = settings.latency_ms if settings.latency_ms is not None else \
+        (entry.get("latency_ms") or 0.0) * settings.latency_scale
+    with _lock:
+        jitter = _rng.uniform(-settings.jitter_ms, settings.jitter_ms) if settings.jitter_ms else 0.0
+    delay = max(0.0, base_ms + jitter) / 1000
+    if timeout is not None and delay > timeout:
+        time.sleep(timeout)
+        raise TimeoutError(f"Replay API error: timed out after {timeout:.2f}s")
+    if delay:
+        time.sleep(delay)
+    report_provider_usage(entry.get("input_tokens"), entry.get("output_tokens"))
+    return entry["response"]
@@ -0,0 +1,132 @@
+"""
+Response field selection for analysis endpoints.
+
+Clients pass dotted paths (``fields=executive_summary,comparison_results.ranked_offers.total_score``)
+and/or a named profile. Lists are traversed transparently, so a path below a
+list applies to every element. The selection also tells the flow which
+expensive parts it can skip (AI-written text, unused charts).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+# Named response profiles; None means the full response
+RESPONSE_PROFILES: Dict[str, Optional[List[str]]] = {
+    "full": None,
+    "summary": [
+        "analysis_id",
+        "executive_summary",
+        "comparison_results.ranked_offers.offer_id",
+        "comparison_results.ranked_offers.company",
+        "comparison_results.ranked_offers.position",
+        "comparison_results.ranked_offers.total_score",
+        "comparison_results.ranked_offers.rating",
+    ],
+    "dashboard": [
+        "analysis_id",
+        "executive_summary",
+        "comparison_results.ranked_offers.offer_id",
+        "comparison_results.ranked_offers.company",
+        "comparison_results.ranked_offers.position",
+        "comparison_results.ranked_offers.total_score",
+        "comparison_results.ranked_offers.rating",
+        "comparison_results.weights_used",
+        "visualization_data.overall_scores",
+        "visualization_data.radar_chart",
+        "visualization_data.summary_stats",
+    ],
+}
+
+# Response fields whose content is written by the LLM in AIAnalysisNode
+AI_TEXT_FIELDS = (
+    "final_report.detailed_analysis",
+    "final_report.decision_framework",
+    "final_report.offer_rankings.ai_recommendation",
+    "offers.ai_recommendation",
+)
+
+# The id is always returned so clients can still call /api/rescore
+ALWAYS_INCLUDED = ("analysis_id",)
+
+
+def resolve_fields(fields: Optional[str] = None, profile: Optional[str] = None) -> Optional[List[str]]:
+    """
+    Combine a comma-separated field list and a profile name into a path list.
+
+    Returns None when the full response is wanted. Raises ValueError for an
+    unknown profile.
+    """
+    paths: List[str] = []
+    if profile:
+        if profile not in RESPONSE_PROFILES:
+            raise ValueError(f"Unknown profile '{profile}'. Choose from: {', '.join(RESPONSE_PROFILES)}")
+        if RESPONSE_PROFILES[profile] is None:
+            return None
+        paths.extend(RESPONSE_PROFILES[profile])
+    if fields:
+        paths.extend(f.strip() for f in fields.split(",") if f.strip())
+    if not paths:
+        return None
+    paths.extend(p for p in ALWAYS_INCLUDED if p not in paths)
+    return list(dict.fromkeys(paths))
+
+
+def _overlaps(path: str, other: str) -> bool:
+    return path == other or other.startswith(path + ".") or path.startswith(other + ".")
+
+
+def needs_ai_text(paths: Optional[Iterable[str]]) -> bool:
+    """Whether any selected path returns LLM-written analysis text."""
+    if paths is None:
+        return True
+    return any(_overlaps(p, field) for p in paths for field in AI_TEXT_FIELDS)
+
+
+def selected_charts(paths: Optional[Iterable[str]]) -> Optional[List[str]]:
+    """Chart keys under visualization_data that are selected; None means all of them."""
+    if paths is None:
+        return None
+    charts = []
+    for path in paths:
+        head, _, rest = path.partition(".")
+        if head != "visualization_data":
+            continue
+        if not rest:
+            return None
+        charts.append(rest.split(".", 1)[0])
+    return charts
+
+
+def _build_tree(paths: Iterable[str]) -> Dict[str, Any]:
+    tree: Dict[str, Any] = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for i, part in enumerate(parts):
+            if node.get(part) is True:
+                break
+            if i == len(parts) - 1:
+                node[part] = True
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _prune(value: Any, tree: Dict[str, Any]) -> Any:
+    if isinstance(value, list):
+        return [_prune(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    pruned = {}
+    for key, subtree in tree.items():
+        if key in value:
+            pruned[key] = value[key] if subtree is True else _prune(value[key], subtree)
+    return pruned
+
+
+def select_fields(payload: Dict[str, Any], paths: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Return a copy of payload containing only the selected paths (None keeps everything)."""
+    if paths is None:
+        return payload
+    return _prune(payload, _build_tree(paths))
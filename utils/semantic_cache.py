@@ -0,0 +1,209 @@
+"""
+Semantic LLM Cache - reuse responses for near-duplicate prompts
+
+The exact-hash cache in call_llm misses whenever a prompt differs only in
+a salary figure or a score decimal, which is most of the time for market
+analysis and offer recommendations. With OFFERCOMPARE_SEMANTIC_CACHE=1,
+calls whose purpose is listed in OFFERCOMPARE_SEMANTIC_CACHE_PURPOSES go
+through this in-memory cache first. The default covers only single-offer
+prompts (market_analysis, offer_recommendation): the comprehensive
+analysis and the decision framework combine all of a user's offers and
+preferences, and answering them from another user's near-duplicate could
+show that user's figures.
+
+Lookup order:
+
+1. canonicalize(): whitespace squeezed, case folded, company aliases and
+   legal suffixes normalized (company_db), numbers bucketed to two
+   significant figures ($152,300 and $148,900 both become 150000; 88.3
+   becomes 88); years are left alone
+2. exact lookup on the canonical prompt
+3. optionally (OFFERCOMPARE_SEMANTIC_CACHE_THRESHOLD > 0) the most similar
+   cached prompt, by cosine similarity of word unigram+bigram counts, if
+   it reaches the threshold. Only prompts that differ in their figures
+   alone are candidates: a different company, position, location or offer
+   id scores well above any useful threshold (Google vs Microsoft for the
+   same role and salary: 0.98) yet must never share an analysis
+
+Entries are partitioned by everything else that shapes a response (system
+prompt, model, temperature, max_tokens, response format, purpose), expire
+after OFFERCOMPARE_CACHE_TTL and are evicted LRU beyond
+OFFERCOMPARE_SEMANTIC_CACHE_SIZE. Lookups are counted in the cache metrics
+under namespace "llm_semantic".
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from .company_db import COMPANY_ALIASES, COMPANY_SUFFIXES
+from .compaction import squeeze_whitespace
+from .config import get_config
+from .metrics import record_cache_lookup
+
+NAMESPACE = "llm_semantic"
+
+# Significant figures kept when bucketing numbers
+SIGNIFICANT_FIGURES = 2
+
+# Candidates whose length differs by more than this fraction can't reach a useful similarity
+LENGTH_TOLERANCE = 0.3
+
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:,\d{3})*(?:\.\d+)?")
+_ALIASES = re.compile(r"\b(" + "|".join(re.escape(alias) for alias in
+                                        sorted(COMPANY_ALIASES, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+_ALIAS_TARGETS = {alias.lower(): name for alias, name in COMPANY_ALIASES.items()}
+_SUFFIXES = re.compile(r"(?<=\w)(" + "|".join(dict.fromkeys(re.escape(suffix.rstrip(".")) for suffix in
+                                                            COMPANY_SUFFIXES)) + r")\.?(?=[\s,;:)]|$)")
+_WORDS = re.compile(r"\w+")
+
+
+def _bucket(match: re.Match) -> str:
+    text = match.group(0)
+    digits = text.replace(",", "")
+    try:
+        value = float(digits)
+    except ValueError:
+        return text
+    if "," not in text and "." not in text and 1900 <= value <= 2100:
+        return text  # a year, not an amount
+    if value == 0:
+        return "0"
+    magnitude = math.floor(math.log10(abs(value)))
+    rounded = round(value, SIGNIFICANT_FIGURES - 1 - magnitude)
+    return f"{rounded:g}" if magnitude < SIGNIFICANT_FIGURES - 1 else str(int(rounded))
+
+
+def canonicalize(prompt: str) -> str:
+    """The prompt with whitespace, company aliases, case and numbers normalized."""
+    text = _ALIASES.sub(lambda m: _ALIAS_TARGETS[m.group(0).lower()], squeeze_whitespace(prompt))
+    text = _SUFFIXES.sub("", text)
+    return _NUMBER.sub(_bucket, text).lower()
+
+
+def _template(canonical: str) -> str:
+    """The canonical prompt with every number masked: its non-numeric text."""
+    return _NUMBER.sub("#", canonical)
+
+
+def _features(canonical: str) -> Counter:
+    words = _WORDS.findall(canonical)
+    return Counter(words) + Counter(zip(words, words[1:]))
+
+
+def similarity(a: Counter, b: Counter) -> float:
+    """Cosine similarity of two feature count vectors."""
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[feature] for feature, count in a.items() if feature in b)
+    return dot / (math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values())))
+
+
+@dataclass
+class SemanticEntry:
+    response: str
+    provider: str
+    model: str
+    template: str
+    features: Counter
+    size: int
+    created_at: float
+
+
+class SemanticCache:
+    """Thread-safe, in-memory near-duplicate cache; see the module docstring."""
+
+    def __init__(self, threshold: float = 0.0, max_entries: int = 1024, ttl_seconds: float = 0.0) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], SemanticEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "SemanticCache":
+        config = get_config()
+        return cls(config.semantic_cache_threshold, config.semantic_cache_max_entries, config.cache_ttl_seconds)
+
+    def _expired(self, entry: SemanticEntry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at > self.ttl_seconds
+
+    def get(self, prompt: str, partition: str) -> Optional[Tuple[SemanticEntry, float]]:
+        """(entry, similarity) of a cached near-duplicate of prompt, or None."""
+        canonical = canonicalize(prompt)
+        now = time.time()
+        match = None
+        with self._lock:
+            key = (partition, canonical)
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                match = (entry, 1.0)
+            elif self.threshold > 0:
+                key, match = self._most_similar(partition, canonical, now)
+            if match is not None:
+                self._entries.move_to_end(key)
+        record_cache_lookup(NAMESPACE, match is not None)
+        return match
+
+    def _most_similar(self, partition: str, canonical: str, now: float):
+        """
+        (key, (entry, similarity)) of the closest entry at or above the threshold, else (None, None).
+        Candidates share the partition and all non-numeric text of the prompt.
+        """
+        template, features = _template(canonical), _features(canonical)
+        size = sum(features.values())
+        best_key, best = None, None
+        for key, entry in self._entries.items():
+            if key[0] != partition or entry.template != template or self._expired(entry, now):
+                continue
+            if abs(entry.size - size) > LENGTH_TOLERANCE * max(entry.size, size):
+                continue
+            score = similarity(features, entry.features)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best_key, best = key, (entry, score)
+        return best_key, best
+
+    def put(self, prompt: str, partition: str, response: str, provider: str, model: str) -> None:
+        canonical = canonicalize(prompt)
+        features = _features(canonical)
+        entry = SemanticEntry(response, provider, model, _template(canonical), features, sum(features.values()),
+                              time.time())
+        with self._lock:
+            self._entries[(partition, canonical)] = entry
+            self._entries.move_to_end((partition, canonical))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def semantic_partition(purpose: Optional[str], system_prompt: Optional[str], model: Optional[str],
+                       temperature: float, max_tokens: Optional[int], response_format: Optional[Dict[str, Any]]) -> str:
+    """Everything besides the prompt that must match for a cached response to be reused."""
+    return json.dumps([purpose, canonicalize(system_prompt or ""), model, temperature, max_tokens,
+                       response_format], sort_keys=True)
+
+
+def semantic_cache_applies(purpose: Optional[str]) -> bool:
+    config = get_config()
+    if not config.semantic_cache_enabled or not purpose:
+        return False
+    return purpose in {p.strip() for p in config.semantic_cache_purposes.split(",")}
+
+
+semantic_cache = SemanticCache.from_config()
@@ -0,0 +1,97 @@
+"""
+Response serialization helpers for the API server.
+
+Uses orjson when installed (falls back to the stdlib encoder), negotiates
+gzip/brotli compression from Accept-Encoding, and can replace repeated
+offer objects with JSON references to shrink analysis payloads.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes; non-JSON values are stringified."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=str, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dedupe_offer_refs(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace offers embedded in comparison_results with references into payload["offers"].
+
+    ranked_offers[*].offer_data becomes {"$ref": "#/offers/<i>"} and top_offer
+    becomes {"$ref": "#/comparison_results/ranked_offers/0"} when it is that same
+    object. The input is not mutated.
+    """
+    comparison = payload.get("comparison_results")
+    if not isinstance(comparison, dict) or not comparison.get("ranked_offers"):
+        return payload
+
+    offer_index = {offer.get("id"): i for i, offer in enumerate(payload.get("offers", []))}
+    ranked = []
+    for ranking in comparison["ranked_offers"]:
+        index = offer_index.get(ranking.get("offer_id"))
+        if index is not None and "offer_data" in ranking:
+            ranking = {**ranking, "offer_data": {"$ref": f"#/offers/{index}"}}
+        ranked.append(ranking)
+
+    top_is_first = comparison.get("top_offer") is comparison["ranked_offers"][0]
+    comparison = {**comparison, "ranked_offers": ranked}
+    if top_is_first:
+        comparison["top_offer"] = {"$ref": "#/comparison_results/ranked_offers/0"}
+    return {**payload, "comparison_results": comparison}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, preferring brotli when installed."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+
+def encode_json_body(data: Any, accept_encoding: Optional[str] = None,
+                     min_size: int = 1024) -> Tuple[bytes, Dict[str, str]]:
+    """Serialize data and compress it when the client accepts it and the body is large enough."""
+    body = dumps(data)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= min_size else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
@@ -0,0 +1,144 @@
+"""
+Structured Output - JSON extraction, schema validation and repair for LLM responses
+
+call_llm_structured asks providers for JSON through their native modes
+(OpenAI response_format / json_schema, Gemini response_mime_type, an
+assistant "{" prefill for Claude) and then runs the response through
+parse_structured():
+
+1. parse as-is
+2. cheap local repair: strip code fences and surrounding prose, drop
+   trailing commas
+3. optionally one repair call to the model with the validation errors
+
+Each outcome is counted in offercompare_llm_structured_outputs_total
+(result = ok, repaired, repaired_by_llm, failed), so the parse-failure
+rate per purpose is visible in /metrics.
+
+Schemas are plain JSON Schema dicts; validate() checks the subset used
+here (type, properties, required, items, enum, minimum, maximum).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import LLM_STRUCTURED
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class StructuredOutputError(ValueError):
+    """A response that could not be parsed or did not match its schema, even after repair."""
+
+    def __init__(self, message: str, raw: str = "", errors: Optional[List[str]] = None) -> None:
+        super().__init__(message)
+        self.raw = raw
+        self.errors = errors or []
+
+
+def validate(data: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Return a list of schema violations (empty when data is valid)."""
+    expected = schema.get("type")
+    if expected:
+        python_type = _TYPES[expected]
+        # bool is an int subclass; don't accept it where a number is expected
+        if not isinstance(data, python_type) or (isinstance(data, bool) and expected in ("integer", "number")):
+            return [f"{path}: expected {expected}, got {type(data).__name__}"]
+    errors = []
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: {data!r} not in {schema['enum']}")
+    if isinstance(data, (int, float)) and not isinstance(data, bool):
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append(f"{path}: {data} < minimum {schema['minimum']}")
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append(f"{path}: {data} > maximum {schema['maximum']}")
+    if isinstance(data, dict):
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: required")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate(data[key], subschema, f"{path}.{key}"))
+    if isinstance(data, list) and "items" in schema:
+        for i, item in enumerate(data):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def extract_json(text: str) -> Any:
+    """Parse JSON wrapped in code fences or prose, tolerating trailing commas."""
+    fenced = _FENCE.search(text)
+    candidate = fenced.group(1) if fenced else text
+    starts = [i for i in (candidate.find("{"), candidate.find("[")) if i != -1]
+    if starts:
+        start = min(starts)
+        end = candidate.rfind("}" if candidate[start] == "{" else "]")
+        candidate = candidate[start:end + 1]
+    return json.loads(_TRAILING_COMMA.sub(r"\1", candidate))
+
+
+def _parse(text: str, schema: Optional[Dict[str, Any]], local_repair: bool):
+    """(data, errors); data is None when the text is not JSON at all."""
+    try:
+        data = extract_json(text) if local_repair else json.loads(text)
+    except (json.JSONDecodeError, TypeError) as e:
+        return None, [f"invalid JSON: {e}"]
+    return data, validate(data, schema) if schema else []
+
+
+def parse_structured(text: str, schema: Optional[Dict[str, Any]] = None,
+                     repair: Optional[Callable[[str, List[str]], str]] = None,
+                     purpose: str = "structured") -> Any:
+    """
+    Parse and validate a model's JSON response, repairing it if needed.
+
+    Args:
+        text (str): Raw model response
+        schema (dict): JSON Schema to validate against (None: any JSON)
+        repair (callable): repair(text, errors) -> new response, called at most once
+        purpose (str): Label for the outcome metric
+
+    Returns:
+        The parsed, valid JSON value
+
+    Raises:
+        StructuredOutputError: If no valid JSON could be obtained
+    """
+    data, errors = _parse(text, schema, local_repair=False)
+    if not errors:
+        LLM_STRUCTURED.inc(purpose=purpose, result="ok")
+        return data
+    data, errors = _parse(text, schema, local_repair=True)
+    if not errors:
+        LLM_STRUCTURED.inc(purpose=purpose, result="repaired")
+        return data
+    if repair is not None:
+        repaired_text = repair(text, errors)
+        data, errors = _parse(repaired_text, schema, local_repair=True)
+        if not errors:
+            LLM_STRUCTURED.inc(purpose=purpose, result="repaired_by_llm")
+            return data
+        text = repaired_text
+    LLM_STRUCTURED.inc(purpose=purpose, result="failed")
+    raise StructuredOutputError(f"Invalid structured output: {'; '.join(errors[:5])}", text, errors)
+
+
+def repair_prompt(text: str, errors: List[str], schema: Optional[Dict[str, Any]]) -> str:
+    """Prompt asking the model to fix its own output; short, so it can go to a fast model."""
+    schema_text = f"\nIt must match this JSON Schema:\n{json.dumps(schema)}\n" if schema else ""
+    problems = "\n".join(f"- {error}" for error in errors[:10])
+    return (f"This output was supposed to be JSON but has problems:\n{problems}\n{schema_text}\n"
+            f"Output:\n{text[:6000]}\n\nReturn only the corrected JSON, with no commentary.")
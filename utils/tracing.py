@@ -0,0 +1,212 @@
+"""
+Lightweight tracing - nested timing spans for analysis runs
+
+A trace is started around an analysis with start_trace(); code inside it
+opens spans with span(name, **attributes). Parent/child links follow the
+call stack through contextvars, so they survive asyncio tasks and
+asyncio.to_thread(). Outside an active trace span() is a no-op.
+
+Traces export to plain JSON or to the Chrome trace-event format, which
+loads in chrome://tracing or https://ui.perfetto.dev.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("offercompare_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("offercompare_span", default=None)
+_span_ids = itertools.count(1)
+
+
+def _lane() -> str:
+    """Identify the concurrent lane a span runs on: the asyncio task, else the thread."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return f"task-{id(task)}"
+    return f"thread-{threading.get_ident()}"
+
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: Dict[str, Any]) -> None:
+        self.trace = trace
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.lane = _lane()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self._token = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end = time.perf_counter()
+        if exc is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace._finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.started) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned by span() when no trace is active."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name: str, **attributes: Any) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "name": self.name,
+            "started_at": self.wall_started,
+            "attributes": self.attributes,
+            "spans": [s.to_dict() for s in spans],
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        lanes: Dict[str, int] = {}
+        events = []
+        for s in spans:
+            tid = lanes.setdefault(s.lane, len(lanes) + 1)
+            events.append({
+                "name": s.name,
+                "ph": "X",
+                "ts": round((s.start - self.started) * 1e6, 1),
+                "dur": round(s.duration_ms * 1000, 1),
+                "pid": 1,
+                "tid": tid,
+                "args": {"span_id": s.span_id, "parent_id": s.parent_id, **s.attributes},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace": self.name, **self.attributes}}
+
+    def write(self, path: str, fmt: str = "chrome") -> str:
+        """Write the trace to path as "chrome" trace events or plain "json" spans."""
+        data = self.to_chrome_trace() if fmt == "chrome" else self.to_dict()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        return path
+
+
+class start_trace:
+    """Context manager activating a new trace with a root span of the same name."""
+
+    def __init__(self, name: str, **attributes: Any) -> None:
+        self.trace = Trace(name, **attributes)
+
+    def __enter__(self) -> Trace:
+        self._trace_token = _current_trace.set(self.trace)
+        self._root = Span(self.trace, self.trace.name, None, dict(self.trace.attributes)).__enter__()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._root.__exit__(exc_type, exc, tb)
+        _current_trace.reset(self._trace_token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def span(name: str, **attributes: Any):
+    """Open a child span of the current span; a no-op when no trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return Span(trace, name, _current_span.get(), attributes)
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Add attributes to the current span, if any."""
+    current = _current_span.get()
+    if current is not None and _current_trace.get() is not None:
+        current.set(**attributes)
+
+
+def traced(name: str, attributes: Optional[Callable[..., Dict[str, Any]]] = None):
+    """
+    Decorator wrapping a function or coroutine function in a span.
+
+    attributes, if given, is called with the function's arguments and
+    returns extra span attributes.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(name, **(attributes(*args, **kwargs) if attributes else {})):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(name, **(attributes(*args, **kwargs) if attributes else {})):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
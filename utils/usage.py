@@ -0,0 +1,220 @@
+"""
+LLM Usage Accounting - tokens, latency, cache status and estimated cost per call
+
+call_llm records every request in the active UsageLedger (if any) and in
+the token/cost metrics. Providers report the token counts their APIs
+return via report_provider_usage(); when a provider (or a test double)
+reports nothing, tokens are estimated from text length and the record is
+flagged "estimated". Instrumented nodes set the current node, so usage is
+broken down per node.
+
+A ledger is activated with usage_ledger(); ledgers nest, and every record
+also reaches the enclosing ledgers. run_analysis stores the summary in
+shared["llm_usage"].
+"""
+
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from .metrics import LLM_COST, LLM_TOKENS
+
+# USD per 1M tokens (input, output); list prices used for estimates only
+MODEL_PRICING = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-pro": (0.50, 1.50),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "fake-model": (0.0, 0.0),
+    "replay": (0.0, 0.0),
+}
+
+# Batch APIs (utils.batch_llm) bill at half the interactive price
+BATCH_DISCOUNT = 0.5
+
+# Rough characters per token for estimates when a provider reports no usage
+CHARS_PER_TOKEN = 4
+
+_ledger: ContextVar[Optional["UsageLedger"]] = ContextVar("offercompare_usage_ledger", default=None)
+_node: ContextVar[Optional[str]] = ContextVar("offercompare_usage_node", default=None)
+_reported: ContextVar[Optional[Dict[str, int]]] = ContextVar("offercompare_provider_usage", default=None)
+
+
+@dataclass
+class UsageRecord:
+    provider: str
+    model: str
+    node: str
+    input_tokens: int
+    output_tokens: int
+    latency_ms: float
+    cost_usd: float
+    cached: bool = False
+    estimated: bool = False
+    error: bool = False
+    batched: bool = False
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "cached_calls": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0,
+            "cost_usd": 0.0, "latency_ms": 0.0}
+
+
+def _add(totals: Dict[str, Any], record: UsageRecord) -> None:
+    totals["calls"] += 1
+    if record.cached:
+        totals["cached_calls"] += 1
+        return
+    totals["errors"] += int(record.error)
+    totals["input_tokens"] += record.input_tokens
+    totals["output_tokens"] += record.output_tokens
+    totals["cost_usd"] += record.cost_usd
+    totals["latency_ms"] += record.latency_ms
+
+
+def _rounded(totals: Dict[str, Any]) -> Dict[str, Any]:
+    return {**totals, "cost_usd": round(totals["cost_usd"], 6), "latency_ms": round(totals["latency_ms"], 1)}
+
+
+class UsageLedger:
+    """Thread-safe list of usage records; calls from worker threads land here too."""
+
+    def __init__(self, parent: Optional["UsageLedger"] = None) -> None:
+        self.parent = parent
+        self.records: List[UsageRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: UsageRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+        if self.parent is not None:
+            self.parent.add(record)
+
+    def billed_tokens(self) -> int:
+        """Input + output tokens of calls that reached a provider."""
+        with self._lock:
+            return sum(r.input_tokens + r.output_tokens for r in self.records if not r.cached)
+
+    def summary(self, include_records: bool = False) -> Dict[str, Any]:
+        """
+        Totals overall, per node and per provider/model.
+
+        Token, cost and latency totals cover calls that reached a provider;
+        cache hits are only counted in calls/cached_calls.
+        """
+        with self._lock:
+            records = list(self.records)
+        totals = _empty_totals()
+        by_node: Dict[str, Dict[str, Any]] = {}
+        by_model: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            _add(totals, record)
+            _add(by_node.setdefault(record.node, _empty_totals()), record)
+            _add(by_model.setdefault(f"{record.provider}/{record.model}", _empty_totals()), record)
+        summary = {
+            **_rounded(totals),
+            "estimated": any(r.estimated for r in records if not r.cached),
+            "by_node": {name: _rounded(t) for name, t in sorted(by_node.items(), key=lambda kv: -kv[1]["cost_usd"])},
+            "by_model": {name: _rounded(t) for name, t in by_model.items()},
+        }
+        if include_records:
+            summary["records"] = [asdict(r) for r in records]
+        return summary
+
+
+@contextmanager
+def usage_ledger() -> Iterator[UsageLedger]:
+    """Activate a new ledger (nested under the current one, if any) for the block."""
+    ledger = UsageLedger(parent=_ledger.get())
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+def current_ledger() -> Optional[UsageLedger]:
+    return _ledger.get()
+
+
+@contextmanager
+def node_scope(name: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block to node `name`."""
+    token = _node.set(name)
+    try:
+        yield
+    finally:
+        _node.reset(token)
+
+
+@contextmanager
+def capture_provider_usage() -> Iterator[Dict[str, int]]:
+    """Collect token counts reported by the provider call made inside the block."""
+    reported: Dict[str, int] = {}
+    token = _reported.set(reported)
+    try:
+        yield reported
+    finally:
+        _reported.reset(token)
+
+
+def report_provider_usage(input_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+    """Called by provider adapters with the usage their API returned."""
+    reported = _reported.get()
+    if reported is None:
+        return
+    if isinstance(input_tokens, int):
+        reported["input_tokens"] = input_tokens
+    if isinstance(output_tokens, int):
+        reported["output_tokens"] = output_tokens
+
+
+def record_llm_call(provider: str, model: str, prompt_text: str, response: Optional[str], latency_s: float,
+                    reported: Optional[Dict[str, int]] = None, cached: bool = False,
+                    error: bool = False, batched: bool = False) -> UsageRecord:
+    """Record one call_llm request in the metrics and the active ledger."""
+    reported = reported or {}
+    estimated = "input_tokens" not in reported or "output_tokens" not in reported
+    input_tokens = reported.get("input_tokens", estimate_tokens(prompt_text))
+    output_tokens = reported.get("output_tokens", estimate_tokens(response))
+    node = _node.get() or "unknown"
+    record = UsageRecord(
+        provider=provider,
+        model=model,
+        node=node,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        latency_ms=round(latency_s * 1000, 1),
+        cost_usd=0.0 if cached else estimate_cost(model, input_tokens, output_tokens) * (
+            BATCH_DISCOUNT if batched else 1.0),
+        cached=cached,
+        estimated=estimated,
+        error=error,
+        batched=batched,
+    )
+    if not cached:
+        LLM_TOKENS.inc(input_tokens, provider=provider, model=model, node=node, direction="input")
+        LLM_TOKENS.inc(output_tokens, provider=provider, model=model, node=node, direction="output")
+        LLM_COST.inc(record.cost_usd, provider=provider, model=model, node=node)
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.add(record)
+    return record
@@ -461,13 +461,26 @@ def _find_best_values(rows, offers_data):
     
     return best_indices
 
-def create_visualization_package(offers_data, weights=None):
+# Chart builders by visualization_data key; summary_stats is always included
+CHART_BUILDERS = {
+    "radar_chart": lambda offers_data, weights: format_radar_chart(offers_data),
+    "overall_scores": lambda offers_data, weights: format_bar_chart(offers_data, "total_score"),
+    "salary_comparison": lambda offers_data, weights: format_bar_chart(offers_data, "base_salary"),
+    "total_comp_comparison": lambda offers_data, weights: format_bar_chart(offers_data, "total_compensation"),
+    "compensation_breakdowns": lambda offers_data, weights: format_compensation_breakdown(offers_data),
+    "market_position": lambda offers_data, weights: format_market_comparison_chart(offers_data),
+    "factor_importance": lambda offers_data, weights: format_factor_importance_chart(weights or {}),
+    "comparison_table": lambda offers_data, weights: format_comparison_table(offers_data),
+}
+
+def create_visualization_package(offers_data, weights=None, charts=None):
     """
     Create complete visualization package for offer comparison.
     
     Args:
         offers_data (list): List of scored offers
         weights (dict): Scoring weights
+        charts (list): Chart keys to build (see CHART_BUILDERS); None builds all
     
     Returns:
         dict: Complete visualization package
@@ -475,25 +488,21 @@ def create_visualization_package(offers_data, weights=None):
     if not offers_data:
         return {"error": "No offers data provided"}
     
-    return {
-        "radar_chart": format_radar_chart(offers_data),
-        "overall_scores": format_bar_chart(offers_data, "total_score"),
-        "salary_comparison": format_bar_chart(offers_data, "base_salary"),
-        "total_comp_comparison": format_bar_chart(offers_data, "total_compensation"),
-        "compensation_breakdowns": format_compensation_breakdown(offers_data),
-        "market_position": format_market_comparison_chart(offers_data),
-        "factor_importance": format_factor_importance_chart(weights or {}),
-        "comparison_table": format_comparison_table(offers_data),
-        "summary_stats": {
-            "total_offers": len(offers_data),
-            "avg_score": sum(offer["total_score"] for offer in offers_data) / len(offers_data),
-            "score_range": {
-                "min": min(offer["total_score"] for offer in offers_data),
-                "max": max(offer["total_score"] for offer in offers_data)
-            },
-            "top_company": offers_data[0]["company"] if offers_data else None
-        }
+    package = {
+        name: build(offers_data, weights)
+        for name, build in CHART_BUILDERS.items()
+        if charts is None or name in charts
+    }
+    package["summary_stats"] = {
+        "total_offers": len(offers_data),
+        "avg_score": sum(offer["total_score"] for offer in offers_data) / len(offers_data),
+        "score_range": {
+            "min": min(offer["total_score"] for offer in offers_data),
+            "max": max(offer["total_score"] for offer in offers_data)
+        },
+        "top_company": offers_data[0]["company"] if offers_data else None
     }
+    return package
 
 if __name__ == "__main__":
     # Test visualization formatting
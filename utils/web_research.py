@@ -6,8 +6,58 @@ Uses LLM capabilities to research and synthesize company information
 from .call_llm import call_llm, call_llm_structured
 from .config import get_config
 from .cache import cached_call
+from .company_db import get_company_data, get_default_metrics
+from .compaction import clip, compact_prompt, compact_text
+from .log import get_logger
 import json
 
+logger = get_logger(__name__)
+
+_SCORE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number", "minimum": 1, "maximum": 10},
+        "explanation": {"type": "string"},
+    },
+    "required": ["score", "explanation"],
+}
+_STRING_LIST_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+# Schema for research_company's extracted metrics; the six scores used by scoring are required
+COMPANY_METRICS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{key: _SCORE_SCHEMA for key in (
+            "culture_score", "wlb_score", "growth_score", "benefits_score", "stability_score",
+            "reputation_score", "innovation_score", "diversity_score", "remote_friendliness")},
+        "key_strengths": _STRING_LIST_SCHEMA,
+        "potential_concerns": _STRING_LIST_SCHEMA,
+        "recent_highlights": _STRING_LIST_SCHEMA,
+    },
+    "required": ["culture_score", "wlb_score", "growth_score", "benefits_score", "stability_score",
+                 "reputation_score"],
+}
+
+# Company database culture metrics used for each research score in offline mode
+OFFLINE_METRIC_SOURCES = {
+    "culture_score": "company_outlook",
+    "wlb_score": "work_life_balance",
+    "growth_score": "career_growth",
+    "benefits_score": "compensation",
+    "reputation_score": "company_outlook",
+    "innovation_score": "innovation",
+    "diversity_score": "diversity",
+}
+
+# Stability by company stage (1-10) for offline mode
+OFFLINE_STABILITY_BY_STAGE = {
+    "startup": 5,
+    "growth": 7,
+    "private": 8,
+    "public": 9,
+    "established": 9,
+}
+
 def research_company(company_name, position=None, research_topics=None):
     """
     AI-powered company research agent that gathers comprehensive intelligence.
@@ -53,6 +103,7 @@ def research_company(company_name, position=None, research_topics=None):
     Format your response as detailed analysis with specific examples and data points where possible.
     Focus on information that would influence job offer decisions.
     """
+    research_prompt = compact_prompt(research_prompt, "research")
     
     # Get comprehensive analysis
     config = get_config()
@@ -63,19 +114,21 @@ def research_company(company_name, position=None, research_topics=None):
             research_prompt,
             system_prompt=system_prompt,
             temperature=0.3,
+            purpose="research",
         ))()
     else:
         research_analysis = call_llm(
             research_prompt,
             system_prompt=system_prompt,
             temperature=0.3,
+            purpose="research",
         )
     
     # Extract structured metrics
     metrics_prompt = f"""
-    Based on the following research about {company_name}, extract key metrics in JSON format:
+    Based on the following research about {clip(company_name, 80)}, extract key metrics in JSON format:
     
-    {research_analysis}
+    {compact_text(research_analysis, name="research_metrics")}
     
     Provide scores (1-10 scale) and brief explanations for:
     {{
@@ -93,6 +146,7 @@ def research_company(company_name, position=None, research_topics=None):
         "recent_highlights": ["highlight1", "highlight2"]
     }}
     """
+    metrics_prompt = compact_prompt(metrics_prompt, "research_metrics")
     
     try:
         if config.enable_cache:
@@ -100,18 +154,22 @@ def research_company(company_name, position=None, research_topics=None):
                 "web_research", config.cache_ttl_seconds, [company_name, position or "", "metrics"]
             )(lambda: call_llm_structured(
                 metrics_prompt,
-                response_format={"type": "json_object"},
+                schema=COMPANY_METRICS_SCHEMA,
                 system_prompt="You are a data analyst extracting structured metrics from company research.",
             ))()
         else:
             metrics_json = call_llm_structured(
                 metrics_prompt,
-                response_format={"type": "json_object"},
+                schema=COMPANY_METRICS_SCHEMA,
                 system_prompt="You are a data analyst extracting structured metrics from company research."
             )
         metrics = json.loads(metrics_json)
-    except:
-        # Fallback to default scores if parsing fails
+        data_source = "llm research"
+    except Exception as e:
+        # Fallback to default scores if the metrics could not be extracted
+        logger.warning("Metrics extraction failed for %s, using default scores: %s", company_name, e,
+                       extra={"event": "research_metrics_fallback"})
+        data_source = "default scores"
         metrics = {
             "culture_score": {"score": 7, "explanation": "Analysis not available"},
             "wlb_score": {"score": 7, "explanation": "Analysis not available"},
@@ -133,7 +191,62 @@ def research_company(company_name, position=None, research_topics=None):
         "research_analysis": research_analysis,
         "metrics": metrics,
         "research_timestamp": "2024-01-01",  # In production, use actual timestamp
-        "research_topics": research_topics
+        "research_topics": research_topics,
+        "data_source": data_source
+    }
+
+def research_company_offline(company_name, position=None):
+    """
+    Build company research from local data only, without any LLM calls.
+    
+    Scores come from COMPANY_DATABASE culture metrics, or from
+    get_default_metrics() for companies not in the database. The result
+    has the same shape as research_company().
+    
+    Args:
+        company_name (str): Name of the company
+        position (str): Position title for context
+    
+    Returns:
+        dict: Company research data
+    """
+    db_data = get_company_data(company_name)
+    if db_data:
+        stage = db_data.get("stage", "growth")
+        culture_metrics = db_data.get("culture_metrics", {})
+        source = "company database"
+    else:
+        stage = "growth"
+        culture_metrics = get_default_metrics(stage)
+        source = "industry defaults"
+    
+    metrics = {}
+    for metric, culture_key in OFFLINE_METRIC_SOURCES.items():
+        metrics[metric] = {
+            "score": round(culture_metrics.get(culture_key, 7), 1),
+            "explanation": f"From {source}"
+        }
+    metrics["stability_score"] = {
+        "score": OFFLINE_STABILITY_BY_STAGE.get(stage, 7),
+        "explanation": f"Estimated from {stage} company stage"
+    }
+    remote_policy = (db_data or {}).get("benefits", {}).get("remote_work", "")
+    metrics["remote_friendliness"] = {
+        "score": 8 if any(w in remote_policy.lower() for w in ("remote", "flexible", "anywhere")) else 6,
+        "explanation": remote_policy or "No remote policy data"
+    }
+    metrics["key_strengths"] = (db_data or {}).get("benefits", {}).get("unique_perks", [])[:3]
+    metrics["potential_concerns"] = [] if db_data else ["Limited data available"]
+    metrics["recent_highlights"] = []
+    
+    return {
+        "company_name": company_name,
+        "position_context": position,
+        "research_analysis": "",
+        "metrics": metrics,
+        "research_timestamp": "2024-01-01",
+        "research_topics": [],
+        "data_source": source
     }
 
 def get_market_sentiment(company_name, position=None):
@@ -165,11 +278,13 @@ def get_market_sentiment(company_name, position=None):
     4. Risk factors to consider
     5. Growth opportunities
     """
+    sentiment_prompt = compact_prompt(sentiment_prompt, "sentiment")
     
     sentiment_analysis = call_llm(
         sentiment_prompt,
         temperature=0.3,
-        system_prompt="You are a market analyst providing objective sentiment analysis."
+        system_prompt="You are a market analyst providing objective sentiment analysis.",
+        purpose="sentiment"
     )
     
     return {
@@ -182,14 +297,12 @@ def get_market_sentiment(company_name, position=None):
 async def research_company_async(company_name, position=None, research_topics=None):
     """Async version of research_company for use with AsyncNode."""
     import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, research_company, company_name, position, research_topics)
+    return await asyncio.to_thread(research_company, company_name, position, research_topics)
 
 async def get_market_sentiment_async(company_name, position=None):
     """Async version of get_market_sentiment for use with AsyncNode."""
     import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, get_market_sentiment, company_name, position)
+    return await asyncio.to_thread(get_market_sentiment, company_name, position)
 
 if __name__ == "__main__":
     # Test the research agent